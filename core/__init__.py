@@ -1,4 +1,9 @@
 from .instance import  Instance
+from .instance_arrays import InstanceArrays
+from .instance_cache import InstanceCache
+from .scenario_pack import ScenarioPack, pack_scenario
 from .solution import Solution
+from .evaluator import ScheduleEvaluator
+from .spans import Spans
 from .experiment import Experiment
 from .batch import Batch, ZipBatch
@@ -2,13 +2,15 @@
 
 from . import experiment as exp
 from . import tools as di
+from .results_store import ResultsStore
+from .solver_logs import get_info_solver
 
-import pytups.tuplist as tl
 import pytups.superdict as sd
 
-import orloge as ol
+from orloge import constants as ol
 import os
 import zipfile
+import collections
 import pandas as pd
 import shutil
 import re
@@ -35,14 +37,20 @@ class Batch(object):
     /PATH/TO/BATCH/instanceY/
     """
 
-    def __init__(self, path, no_scenario=False, scenarios=None, exp_obj=None):
+    def __init__(self, path, no_scenario=False, scenarios=None, exp_obj=None, cache_size=None,
+                 instance_cache=None):
         """
 
         :param path: path to results
         :param no_scenario: if True, there is no scenarios, instances directly
         :param scenarios: in order to filter the scenarios to load
+        :param cache_size: maximum number of experiments kept in memory by get_case.
+            None keeps all of them.
+        :param instance_cache: path to the InstanceCache of experiments that refer to it.
+            By default, the one in each reference.
         """
         self.path = path
+        self.paths = None
         self.cases = None
         self.logs = None
         self.errors = None
@@ -50,12 +58,21 @@ class Batch(object):
         self.seeds = None
         self.no_scenario = no_scenario
         self.scenarios = scenarios
+        self.cache_size = cache_size
+        self.instance_cache = instance_cache
+        self._case_cache = collections.OrderedDict()
         if exp_obj is None:
-            self.load_experiment = exp.Experiment.from_json
-        else:
-            self.load_experiment = exp_obj.from_json
+            exp_obj = exp.Experiment
+        self.exp_obj = exp_obj
+        self.load_experiment = exp_obj.from_json
 
     def get_instances_paths(self):
+        if self.paths is not None:
+            return self.paths
+        self.paths = self._get_instances_paths()
+        return self.paths
+
+    def _get_instances_paths(self):
         scenarios = self.scenarios
         if scenarios is None:
             scenarios = os.listdir(self.path)
@@ -72,17 +89,48 @@ class Batch(object):
                            for s, instances in scenario_instances.items()}
         return scenario_paths, instances_paths
 
+    def load_case(self, path):
+        # other experiment classes may not know about instance caches
+        if self.instance_cache is None:
+            return self.load_experiment(path)
+        return self.load_experiment(path, instance_cache=self.instance_cache)
+
+    def get_case(self, key):
+        """
+        Loads the experiment the first time it is asked for.
+        The last cache_size experiments are kept in memory.
+
+        :param key: (scenario, instance) or instance if no_scenario
+        """
+        cache = self._case_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+        case = self.load_case(self.get_instances_paths()[key])
+        cache[key] = case
+        if self.cache_size is not None and len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return case
+
+    def apply_cases(self, func):
+        """
+        Applies func to each experiment, loading them one at a time.
+        Only the results are kept, not the experiments (besides the cache).
+        """
+        return sd.SuperDict({k: func(self.get_case(k)) for k in self.get_instances_paths()})
+
     def get_cases(self):
         if self.cases is not None:
             return self.cases
 
-        load_data = self.load_experiment
-        self.cases = self.get_instances_paths().vapply(load_data)
+        self.cases = self.apply_cases(lambda v: v)
         return self.cases
 
     def get_solver(self):
         opt_info = self.get_options()
-        available_solvers = ['CPLEX', 'GUROBI', 'CBC']
+        available_solvers = ['CPLEX', 'GUROBI', 'CBC', 'CPSAT']
+        # solvers in solvers.get_solver that write their log
+        solver_logs = dict(ortools='CPSAT')
         default = 'CPLEX'
         try:
             el = list(opt_info.keys())[0]
@@ -93,6 +141,8 @@ class Batch(object):
             engine, solver = engine.split('.')
         else:
             solver = engine
+        if solver in solver_logs:
+            return solver_logs[solver]
         if solver in available_solvers:
             return solver
         # one last try
@@ -111,9 +161,22 @@ class Batch(object):
             self.get_instances_paths(). \
             vapply(lambda v: os.path.join(v, 'results.log')).\
             clean(func=os.path.exists). \
-            vapply(lambda v: ol.get_info_solver(v, solver, get_progress=get_progress))
+            vapply(lambda v: get_info_solver(v, solver, get_progress=get_progress))
         return self.logs
 
+    def get_summary(self):
+        """
+        :return: the summary table written while solving the batch (see ResultsStore),
+            None if there is none.
+        """
+        store = ResultsStore.for_batch(self.path)
+        if not store.exists():
+            return None
+        table = store.read()
+        if self.scenarios and 'scenario' in table:
+            table = table[table.scenario.isin(self.scenarios)].reset_index(drop=True)
+        return table
+
     def get_json(self, name):
         load_data = di.load_data
 
@@ -128,11 +191,11 @@ class Batch(object):
         if self.errors is not None:
             return self.errors
 
-        self.errors = self.get_cases().vapply(lambda v: v.check_solution()).to_lendict()
+        self.errors = self.apply_cases(lambda v: v.check_solution()).to_lendict()
         return self.errors
 
     def get_objective_function(self):
-        return self.get_cases().vapply(lambda v: v.get_objective())
+        return self.apply_cases(lambda v: v.get_objective())
 
     def get_options(self):
         if self.options is not None:
@@ -177,7 +240,7 @@ class Batch(object):
     def get_status_df(self):
         table = self.get_log_df()
         vars_extract = ['scenario', 'name', 'sol_code', 'status_code',
-                        'time', 'gap', 'best_bound', 'best_solution']
+                        'time', 'gap', 'best_bound', 'best_solution', 'time_to_incumbent']
 
         master = \
             pd.DataFrame({'sol_code': [ol.LpSolutionIntegerFeasible, ol.LpSolutionOptimal,
@@ -237,6 +300,7 @@ class Batch(object):
 class ZipBatch(Batch):
     """
     Only difference is it's contained inside a zip file.
+    The zip is opened once and experiments are read from it when needed.
     """
     def __init__(self, path, *args, **kwargs):
         name, ext = os.path.splitext(path)
@@ -246,44 +310,59 @@ class ZipBatch(Batch):
         elif ext != zip_ext:
             raise ValueError('Only zip is supported')
         super().__init__(path, *args, **kwargs)
+        self._zipobj = None
 
-    def get_instances_paths(self):
-        num_slashes = 2
-        keys_positions = [1, 2]
+    @property
+    def zipobj(self):
+        if self._zipobj is None:
+            self._zipobj = zipfile.ZipFile(self.path)
+        return self._zipobj
+
+    def close(self):
+        if self._zipobj is not None:
+            self._zipobj.close()
+            self._zipobj = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _get_instances_paths(self):
+        # an experiment is a directory with files inside:
+        # BATCH/scenario/instance/file or BATCH/instance/file
+        depth = 3
         if self.no_scenario:
-            num_slashes = 1
-            keys_positions = 1
-        zipobj = zipfile.ZipFile(self.path)
-        all_files = tl.TupList(di.dirs_in_zip(zipobj))
-        scenario_instances = \
-            all_files.\
-                vfilter(lambda f: f.count("/") == num_slashes)
-        keys = \
-            scenario_instances.\
-            vapply(str.split, '/').\
-            vapply(tuple).\
-            take(keys_positions)
-        result_dict = sd.SuperDict(zip(keys, scenario_instances))
+            depth = 2
+        scenarios = None
         if self.scenarios:
             scenarios = set(self.scenarios)
-            return result_dict.kfilter(lambda k: k[0] in scenarios)
-        else:
-            return result_dict
-
-    def get_cases(self):
-        if self.cases is not None:
-            return self.cases
-
-        zipobj = zipfile.ZipFile(self.path)
-        load_data = lambda e: exp.Experiment.from_zipped_json(zipobj, e)
-        self.cases = self.get_instances_paths().vapply(load_data)
-        return self.cases
+        result_dict = sd.SuperDict()
+        for name in self.zipobj.namelist():
+            parts = name.split('/')
+            if len(parts) <= depth:
+                continue
+            if self.no_scenario:
+                key = parts[1]
+            else:
+                key = parts[1], parts[2]
+                if scenarios is not None and key[0] not in scenarios:
+                    continue
+            if key not in result_dict:
+                result_dict[key] = '/'.join(parts[:depth])
+        return result_dict
+
+    def load_case(self, path):
+        if self.instance_cache is None:
+            return self.exp_obj.from_zipped_json(self.zipobj, path)
+        return self.exp_obj.from_zipped_json(self.zipobj, path, instance_cache=self.instance_cache)
 
     def get_logs(self, get_progress=False, solver=None):
         if self.logs is not None:
             return self.logs
 
-        zipobj = zipfile.ZipFile(self.path)
+        zipobj = self.zipobj
         if not solver:
             solver = self.get_solver()
 
@@ -293,7 +372,7 @@ class ZipBatch(Batch):
             except:
                 return 0
 
-        func_to_get_log = ol.get_info_solver
+        func_to_get_log = get_info_solver
         filename = '/results.log'
 
         self.logs = \
@@ -306,7 +385,7 @@ class ZipBatch(Batch):
         return self.logs
 
     def get_json(self, name):
-        zipobj = zipfile.ZipFile(self.path)
+        zipobj = self.zipobj
         load_data = lambda v: di.load_data_zip(zipobj=zipobj, path=v)
 
         return \
@@ -315,4 +394,3 @@ class ZipBatch(Batch):
             vapply(load_data). \
             clean(). \
             vapply(sd.SuperDict.from_dict)
-
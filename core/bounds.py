@@ -0,0 +1,77 @@
+from . import preprocessing
+import numpy as np
+
+
+def critical_path_bound(arrays, mode_mask=None):
+    """
+    Longest path in the precedence graph with the shortest mode of each job.
+    """
+    durations = preprocessing.min_durations(arrays, mode_mask)
+    starts = preprocessing.earliest_starts(arrays, durations)
+    return int((starts + durations).max(initial=0))
+
+
+def energy_bound(arrays, mode_mask=None):
+    """
+    For each renewable resource, the least energy (duration x need) each job can use
+    divided by the capacity. The makespan cannot be shorter than any of them.
+    """
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    renewable = np.flatnonzero(arrays.renewable)
+    if not len(renewable):
+        return 0
+    energy = arrays.durations[:, :, np.newaxis] * arrays.needs[:, :, renewable]
+    energy = np.where(mode_mask[:, :, np.newaxis], energy, np.iinfo(np.int64).max).min(axis=1).sum(axis=0)
+    capacity = arrays.available[renewable]
+    used = capacity > 0
+    return int((-(-energy[used] // capacity[used])).max(initial=0))
+
+
+def cp_bound(instance, time_limit, options=None):
+    """
+    Best bound of the makespan CP-SAT proves in time_limit seconds (see solvers.CPModel1).
+
+    :param options: other options of CPModel1
+    :return: the bound or None if CP-SAT finds no solution can exist
+    """
+    from solvers import CPModel1
+    algo = CPModel1(instance)
+    algo_options = dict(hint=False, log_search_progress=False)
+    algo_options.update(options or {})
+    algo_options['timeLimit'] = time_limit
+    algo.solve(algo_options)
+    if algo.best_bound is None:
+        return None
+    return int(np.ceil(algo.best_bound - 1e-6))
+
+
+def lower_bounds(instance, cp_time=None, cp_options=None):
+    """
+    Lower bounds of the makespan. The modes that cannot be in a feasible solution
+    (see preprocessing.feasible_mode_mask) are not taken into account.
+
+    :param cp_time: if given, seconds for a CP-SAT run (see cp_bound)
+    :param cp_options: other options of that run, e.g. num_search_workers
+    :return: dictionary with critical_path, energy, cp (with cp_time)
+        and lower_bound, the best of them
+    """
+    arrays = instance.arrays
+    mode_mask = preprocessing.feasible_mode_mask(arrays)
+    if not mode_mask.any(axis=1).all():
+        # there is no feasible solution: we only use the modes that exist
+        mode_mask = arrays.mode_mask
+    bounds = dict(critical_path=critical_path_bound(arrays, mode_mask), energy=energy_bound(arrays, mode_mask))
+    if cp_time:
+        bounds['cp'] = cp_bound(instance, cp_time, cp_options)
+    bounds['lower_bound'] = max(v for v in bounds.values() if v is not None)
+    return bounds
+
+
+def get_gap(objective, lower_bound):
+    """
+    :return: relative distance from the objective to the lower bound, None if one is missing
+    """
+    if objective is None or lower_bound is None:
+        return None
+    return (objective - lower_bound) / max(abs(objective), 1e-10)
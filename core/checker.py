@@ -0,0 +1,156 @@
+import numpy as np
+import pytups as pt
+
+# All functions take an InstanceArrays object and solutions given as two
+# (solution x job) matrices: start periods and modes (mode - 1).
+# Jobs missing in a solution have mode -1. Jobs with a mode they do not have
+# are reported by check_modes. Both are ignored by the other checks.
+MISSING = -1
+
+
+def _known(arrays, modes):
+    # jobs with one of their modes
+    return (modes >= 0) & (modes < arrays.num_modes)
+
+
+def _durations(arrays, modes):
+    jobs = np.arange(arrays.num_jobs)
+    return arrays.durations[jobs, np.where(_known(arrays, modes), modes, 0)]
+
+
+def _needs(arrays, modes):
+    jobs = np.arange(arrays.num_jobs)
+    known = _known(arrays, modes)
+    return arrays.needs[jobs, np.where(known, modes, 0)] * known[..., np.newaxis]
+
+
+def finished_times(arrays, starts, modes):
+    return starts + _durations(arrays, modes)
+
+
+def check_successors(arrays, starts, modes):
+    """
+    :return: for each solution, {(job, successor): overlap} for every violated precedence
+    """
+    src, dst = arrays.edge_src, arrays.edge_dst
+    finished = finished_times(arrays, starts, modes)
+    overlap = finished[:, src] - starts[:, dst]
+    known = _known(arrays, modes)
+    violated = (overlap > 0) & known[:, src] & known[:, dst]
+    jobs = arrays.jobs.tolist()
+    result = []
+    for sol_overlap, sol_violated in zip(overlap, violated):
+        edges = np.flatnonzero(sol_violated).tolist()
+        values = sol_overlap[edges].tolist()
+        result.append(pt.SuperDict(
+            {(jobs[src[e]], jobs[dst[e]]): v for e, v in zip(edges, values)}
+        ))
+    return result
+
+
+def check_resources_nonrenewable(arrays, starts, modes):
+    """
+    :return: for each solution, {resource: available - consumption} for every exceeded resource
+    """
+    consumption = _needs(arrays, modes).sum(axis=1)
+    slack = arrays.available - consumption
+    slack[:, arrays.renewable] = 0
+    resources = arrays.resources
+    result = []
+    for sol_slack in slack:
+        exceeded = np.flatnonzero(sol_slack < 0).tolist()
+        values = sol_slack[exceeded].tolist()
+        result.append(pt.SuperDict({resources[r]: v for r, v in zip(exceeded, values)}))
+    return result
+
+
+def resource_profiles(arrays, starts, modes):
+    """
+    Consumption of each renewable resource in each period, built with a difference array.
+
+    :return: (solution x renewable resource x period) array covering periods 0...makespan
+    """
+    renewable = np.flatnonzero(arrays.renewable)
+    num_sol, num_jobs = starts.shape
+    needs = _needs(arrays, modes)[:, :, renewable]
+    present = _known(arrays, modes)
+    starts = np.where(present, starts, 0)
+    finished = np.where(present, finished_times(arrays, starts, modes), 0)
+    num_periods = int(np.max(finished, where=present, initial=0)) + 2
+    # flat position of (solution, resource, period) in the profile
+    base = (np.arange(num_sol)[:, np.newaxis, np.newaxis] * len(renewable) +
+            np.arange(len(renewable))[np.newaxis, np.newaxis, :]) * num_periods
+    position_start = base + starts[:, :, np.newaxis]
+    position_end = base + finished[:, :, np.newaxis]
+    size = num_sol * len(renewable) * num_periods
+    delta = \
+        np.bincount(position_start.ravel(), weights=needs.ravel(), minlength=size) - \
+        np.bincount(position_end.ravel(), weights=needs.ravel(), minlength=size)
+    profile = delta.reshape(num_sol, len(renewable), num_periods).cumsum(axis=2)
+    return profile[:, :, :-1].astype(np.int64)
+
+
+def check_resources_renewable(arrays, starts, modes):
+    """
+    :return: for each solution, {(resource, period): available - consumption} for every exceeded
+        resource and period
+    """
+    renewable = np.flatnonzero(arrays.renewable)
+    profile = resource_profiles(arrays, starts, modes)
+    slack = arrays.available[renewable][np.newaxis, :, np.newaxis] - profile
+    resources = [arrays.resources[r] for r in renewable]
+    result = []
+    for sol_slack in slack:
+        res_pos, periods = np.nonzero(sol_slack < 0)
+        values = sol_slack[res_pos, periods].tolist()
+        keys = zip(res_pos.tolist(), periods.tolist())
+        result.append(pt.SuperDict({(resources[r], t): v for (r, t), v in zip(keys, values)}))
+    return result
+
+
+def all_jobs_once(arrays, starts, modes):
+    jobs = arrays.jobs.tolist()
+    return [pt.SuperDict({jobs[j]: 1 for j in np.flatnonzero(sol_modes == MISSING).tolist()})
+            for sol_modes in modes]
+
+
+def check_modes(arrays, starts, modes):
+    """
+    :return: for each solution, {job: mode} for every job with a mode it does not have
+    """
+    jobs = arrays.jobs.tolist()
+    wrong = (modes != MISSING) & ~_known(arrays, modes)
+    return [pt.SuperDict({jobs[j]: m + 1 for j, m in zip(np.flatnonzero(sol_wrong).tolist(),
+                                                          sol_modes[sol_wrong].tolist())})
+            for sol_wrong, sol_modes in zip(wrong, modes)]
+
+
+checks = dict(
+    successors=check_successors,
+    resources_nr=check_resources_nonrenewable,
+    resources_r=check_resources_renewable,
+    all_jobs_once=all_jobs_once,
+    modes=check_modes
+)
+
+
+def check_solutions(arrays, starts, modes, list_tests=None):
+    """
+    Checks many solutions of the same instance at once.
+
+    :param arrays: InstanceArrays
+    :param starts: (solution x job) array of start periods
+    :param modes: (solution x job) array of modes (mode - 1), MISSING if the job is missing
+    :param list_tests: checks to do, all by default
+    :return: a list with one SuperDict of errors per solution, as in Experiment.check_solution
+    """
+    starts = np.atleast_2d(np.asarray(starts, dtype=np.int64))
+    modes = np.atleast_2d(np.asarray(modes, dtype=np.int64))
+    if list_tests is None:
+        list_tests = checks.keys()
+    results = [pt.SuperDict() for _ in range(len(starts))]
+    for name in list_tests:
+        for errors, error in zip(results, checks[name](arrays, starts, modes)):
+            if error:
+                errors[name] = error
+    return results
@@ -0,0 +1,231 @@
+import heapq
+import numpy as np
+from .solution import Solution
+
+
+class ScheduleEvaluator(object):
+    """
+    Keeps a schedule and its evaluation up to date while jobs are moved,
+    change mode or are swapped, for local search and repair heuristics.
+
+    Jobs are referred to by their position and modes by (mode - 1), as in InstanceArrays.
+    Every move only updates what the job touches: its periods in the resource profiles,
+    the non-renewable totals of its modes and the precedences with its
+    predecessors and successors.
+
+    Evaluation, as in Experiment.check_solution:
+        makespan: last finish time.
+        precedence_overlap: sum over violated precedences of finish(job) - start(successor).
+        violated_precedences: number of violated precedences.
+        renewable_excess: sum over renewable resources and periods of consumption - capacity.
+        overloaded_periods: number of (renewable resource, period) over the capacity.
+        nonrenewable_excess: sum over non-renewable resources of consumption - capacity.
+    """
+
+    def __init__(self, arrays, starts, modes):
+        """
+        :param arrays: InstanceArrays
+        :param starts: start period of each job position
+        :param modes: mode (mode - 1) of each job position
+        """
+        self.arrays = arrays
+        renewable = np.flatnonzero(arrays.renewable)
+        non_renewable = np.flatnonzero(~arrays.renewable)
+        self.durations = arrays.durations.tolist()
+        # for each job and mode, the (resource, quantity) it needs, if any
+        self.requests = [
+            [[(r, q) for r, q in enumerate(mode_needs) if q] for mode_needs in job_needs]
+            for job_needs in arrays.needs[:, :, renewable].tolist()
+        ]
+        self.nr_requests = [
+            [[(r, q) for r, q in enumerate(mode_needs) if q] for mode_needs in job_needs]
+            for job_needs in arrays.needs[:, :, non_renewable].tolist()
+        ]
+        self.mode_mask = arrays.mode_mask.tolist()
+        self.capacity = arrays.available[renewable].tolist()
+        self.nr_capacity = arrays.available[non_renewable].tolist()
+        self.predecessors = [arrays.predecessors(j).tolist() for j in range(arrays.num_jobs)]
+        self.successors = [arrays.successors(j).tolist() for j in range(arrays.num_jobs)]
+
+        self.starts = [int(s) for s in starts]
+        self.modes = [int(m) for m in modes]
+        for job, mode in enumerate(self.modes):
+            self._check_mode(job, mode)
+        self.finish = [s + self.durations[j][m] for j, (s, m) in enumerate(zip(self.starts, self.modes))]
+        if self.starts and min(self.starts) < 0:
+            raise ValueError('start periods cannot be negative')
+
+        # renewable profiles, extended when a job goes past the end
+        self._horizon = max(self.finish, default=0) + 1
+        self.usage = [[0] * self._horizon for _ in self.capacity]
+        self.renewable_excess = 0
+        self.overloaded_periods = 0
+        self.nr_usage = [0] * len(self.nr_capacity)
+        self.nonrenewable_excess = 0
+        # number of jobs that finish in each period and a heap (of minus the period)
+        # with those periods, to find the makespan when the last job is moved
+        self._finish_count = {}
+        self._finish_heap = []
+        self.makespan = 0
+        for job in range(len(self.starts)):
+            self._add(job, 1)
+            self._add_nonrenewable(job, 1)
+        self.precedence_overlap = 0
+        self.violated_precedences = 0
+        for job, job_succ in enumerate(self.successors):
+            for succ in job_succ:
+                overlap = self.finish[job] - self.starts[succ]
+                if overlap > 0:
+                    self.precedence_overlap += overlap
+                    self.violated_precedences += 1
+
+    @classmethod
+    def from_experiment(cls, experiment):
+        arrays = experiment.instance.arrays
+        starts, modes = experiment.solution.to_arrays(arrays)
+        return cls(arrays, starts, modes)
+
+    def _check_mode(self, job, mode):
+        if mode < 0 or mode >= len(self.mode_mask[job]) or not self.mode_mask[job][mode]:
+            raise ValueError('mode {} of job in position {} does not exist'.format(mode + 1, job))
+
+    def _add(self, job, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) the job from the renewable profiles and the finish times.
+        """
+        start = self.starts[job]
+        end = self.finish[job]
+        if end >= self._horizon:
+            extension = [0] * (end + 1 - self._horizon)
+            for row in self.usage:
+                row.extend(extension)
+            self._horizon = end + 1
+        excess = 0
+        overloaded = 0
+        for r, q in self.requests[job][self.modes[job]]:
+            row = self.usage[r]
+            capacity = self.capacity[r]
+            for t in range(start, end):
+                before = row[t]
+                after = before + sign * q
+                row[t] = after
+                if after > capacity or before > capacity:
+                    excess += max(after - capacity, 0) - max(before - capacity, 0)
+                    overloaded += (after > capacity) - (before > capacity)
+        self.renewable_excess += excess
+        self.overloaded_periods += overloaded
+
+        count = self._finish_count
+        if sign > 0:
+            if end not in count:
+                count[end] = 0
+                self._push_finish(end)
+            count[end] += 1
+            if end > self.makespan:
+                self.makespan = end
+        else:
+            count[end] -= 1
+            if not count[end]:
+                del count[end]
+                if end == self.makespan:
+                    # the makespan goes down to the next finish time
+                    heap = self._finish_heap
+                    while heap and -heap[0] not in count:
+                        heapq.heappop(heap)
+                    self.makespan = -heap[0] if heap else 0
+
+    def _push_finish(self, end):
+        heap = self._finish_heap
+        # periods without jobs are only removed from the heap when they get to the top:
+        # when they are most of it, it is built again
+        if len(heap) > 2 * len(self._finish_count) + 16:
+            heap[:] = [-period for period in self._finish_count if period != end]
+            heapq.heapify(heap)
+        heapq.heappush(heap, -end)
+
+    def _add_nonrenewable(self, job, sign):
+        usage = self.nr_usage
+        capacity = self.nr_capacity
+        for r, q in self.nr_requests[job][self.modes[job]]:
+            before = usage[r]
+            after = before + sign * q
+            usage[r] = after
+            self.nonrenewable_excess += max(after - capacity[r], 0) - max(before - capacity[r], 0)
+
+    def _precedence(self, job, sign):
+        """
+        Adds (sign=1) or removes (sign=-1) the violations of the precedences of the job.
+        """
+        start = self.starts[job]
+        finish = self.finish[job]
+        overlap = 0
+        violated = 0
+        for pred in self.predecessors[job]:
+            value = self.finish[pred] - start
+            if value > 0:
+                overlap += value
+                violated += 1
+        for succ in self.successors[job]:
+            value = finish - self.starts[succ]
+            if value > 0:
+                overlap += value
+                violated += 1
+        self.precedence_overlap += sign * overlap
+        self.violated_precedences += sign * violated
+
+    def move(self, job, start):
+        """
+        Changes the start period of a job.
+        """
+        if start < 0:
+            raise ValueError('start periods cannot be negative')
+        self._precedence(job, -1)
+        self._add(job, -1)
+        self.starts[job] = start
+        self.finish[job] = start + self.durations[job][self.modes[job]]
+        self._add(job, 1)
+        self._precedence(job, 1)
+
+    def change_mode(self, job, mode):
+        """
+        Changes the mode (mode - 1) of a job, keeping its start period.
+        """
+        self._check_mode(job, mode)
+        self._precedence(job, -1)
+        self._add(job, -1)
+        self._add_nonrenewable(job, -1)
+        self.modes[job] = mode
+        self.finish[job] = self.starts[job] + self.durations[job][mode]
+        self._add_nonrenewable(job, 1)
+        self._add(job, 1)
+        self._precedence(job, 1)
+
+    def swap(self, job1, job2):
+        """
+        Exchanges the start periods of two jobs.
+        """
+        start1, start2 = self.starts[job1], self.starts[job2]
+        self.move(job1, start2)
+        self.move(job2, start1)
+
+    @property
+    def num_errors(self):
+        """
+        Number of errors, counted as in Experiment.check_solution
+        """
+        nonrenewable = sum(u > c for u, c in zip(self.nr_usage, self.nr_capacity))
+        return self.violated_precedences + self.overloaded_periods + nonrenewable
+
+    def is_feasible(self):
+        return not (self.precedence_overlap or self.renewable_excess or self.nonrenewable_excess)
+
+    def get_cost(self):
+        """
+        :return: infeasibility first and makespan second, to compare schedules
+        """
+        return self.precedence_overlap + self.renewable_excess + self.nonrenewable_excess, self.makespan
+
+    def to_solution(self):
+        jobs = self.arrays.jobs.tolist()
+        return Solution({job: dict(period=start, mode=mode + 1)
+                         for job, start, mode in zip(jobs, self.starts, self.modes)})
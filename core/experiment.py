@@ -1,8 +1,13 @@
 import pytups as pt
+import numpy as np
 import os
 from .instance import Instance
 from .solution import Solution
+from .evaluator import ScheduleEvaluator
+from .spans import Spans
+from .instance_cache import InstanceCache, REFERENCE_FILE
 from . import tools as di
+from . import checker
 
 
 class Experiment(object):
@@ -10,11 +15,22 @@ class Experiment(object):
     def __init__(self, instance, solution):
         self.instance = instance
         self.solution = solution
+        # time spent in each phase of solve (see Spans)
+        self.spans = Spans()
         return
 
     @classmethod
-    def from_json(cls, path, inst_file='input.json', sol_file='output.json'):
-        instance = Instance.from_json(os.path.join(path, inst_file))
+    def from_json(cls, path, inst_file='input.json', sol_file='output.json', instance_cache=None):
+        """
+        :param instance_cache: path to the InstanceCache for experiments without inst_file
+            (see InstanceCache.reference). By default, the one in the reference.
+        """
+        inst_path = os.path.join(path, inst_file)
+        if os.path.exists(inst_path):
+            instance = Instance.from_json(inst_path)
+        else:
+            reference = di.load_data(os.path.join(path, REFERENCE_FILE), 'json')
+            instance = InstanceCache.from_reference(reference, instance_cache)
         if os.path.exists(os.path.join(path, sol_file)):
             solution = Solution.from_json(os.path.join(path, sol_file))
         else:
@@ -22,9 +38,13 @@ class Experiment(object):
         return cls(instance, solution)
 
     @classmethod
-    def from_zipped_json(cls, zipobj, path, inst_file='input.json', sol_file='output.json'):
+    def from_zipped_json(cls, zipobj, path, inst_file='input.json', sol_file='output.json', instance_cache=None):
         instance = di.load_data_zip(zipobj, os.path.join(path, inst_file))
-        instance = Instance.from_dict(instance)
+        if instance:
+            instance = Instance.from_dict(instance)
+        else:
+            reference = di.load_data_zip(zipobj, os.path.join(path, REFERENCE_FILE))
+            instance = InstanceCache.from_reference(reference, instance_cache)
         try:
             solution = di.load_data_zip(zipobj, os.path.join(path, sol_file))
             solution = Solution.from_dict(solution)
@@ -41,63 +61,49 @@ class Experiment(object):
             resources_nr = self.check_resources_nonrenewable,
             resources_r=self.check_resources_renewable,
             all_jobs_once = self.all_jobs_once,
+            modes=self.check_modes,
         )
         if list_tests is None:
             list_tests = func_list.keys()
         result = {k: func_list[k](**params) for k in list_tests}
         return pt.SuperDict({k: v for k, v in result.items() if v})
 
+    def check_many_solutions(self, solutions, list_tests=None):
+        """
+        Checks many solutions of this experiment's instance in one call.
+
+        :param solutions: list of Solution objects
+        :param list_tests: checks to do, all by default
+        :return: a list of errors, one per solution, as returned by check_solution
+        """
+        arrays = self.instance.arrays
+        starts, modes = zip(*[sol.to_arrays(arrays) for sol in solutions])
+        return checker.check_solutions(arrays, starts, modes, list_tests=list_tests)
+
+    def get_evaluator(self):
+        """
+        :return: a ScheduleEvaluator of the solution, to evaluate changes incrementally
+        """
+        return ScheduleEvaluator.from_experiment(self)
+
+    def _check_arrays(self, func):
+        arrays = self.instance.arrays
+        starts, modes = self.solution.to_arrays(arrays)
+        return func(arrays, starts[np.newaxis], modes[np.newaxis])[0]
+
     def check_successors(self, **params):
-        succ = self.instance.data['jobs'].get_property('successors')
-        durations = self.instance.data['durations']
-        solution = self.solution.data.to_dictup().to_tuplist().\
-            to_dict(result_col=2, indices=[1, 0], is_list=False).\
-            to_dictdict()
-        sol_start = solution['period']
-        sol_mode = solution['mode']
-        sol_finished = sol_start.kvapply(lambda k, v: v + durations[k][sol_mode[k]])
-        errors = pt.SuperDict()
-        for job, post_jobs in succ.items():
-            for job2 in post_jobs:
-                if sol_finished[job] > sol_start[job2]:
-                    errors[job, job2] = sol_finished[job] - sol_start[job2]
-        return errors
+        return self._check_arrays(checker.check_successors)
 
     def check_resources_nonrenewable(self, **params):
         # non renewables are counted once per job
-        sol_mode = self.get_modes()
-        usage = self.instance.data['needs']
-        resource_usage = sol_mode.kvapply(lambda k, v: usage[k][v])
-        avail = self.instance.data['resources'].get_property('available')
-        renewable_res = self.instance.get_renewable_resources()
-        resource_usage_N = resource_usage.to_dictup().to_tuplist().to_dict(result_col=2, indices=[1]).vapply(sum)
-        error_N = \
-            resource_usage_N.kfilter(lambda k: k not in renewable_res).\
-            kvapply(lambda k, v: avail[k] - v).\
-            vfilter(lambda v: v < 0)
-        return error_N
+        return self._check_arrays(checker.check_resources_nonrenewable)
 
     def check_resources_renewable(self, **params):
-        sol_mode = self.get_modes()
-        usage = self.instance.data['needs']
-        resource_usage = sol_mode.kvapply(lambda k, v: usage[k][v])
-        avail = self.instance.data['resources'].get_property('available')
-        renewable_res = self.instance.get_renewable_resources()
-        sol_start = self.get_start_times()
-        sol_finished = self.get_finished_times()
-        job_periods = sol_start.sapply(func=range, other=sol_finished)
-        makespan = self.get_objective()
-        consumption_rt = \
-            pt.SuperDict({(r, t): 0 for r in renewable_res for t in range(makespan+1)})
-        for job, periods in job_periods.items():
-            for period in periods:
-                # print(period)
-                # print(job)
-                for resource, value in resource_usage[job].items():
-                    if resource in renewable_res:
-                        consumption_rt[resource, period] += value
-        errors_R = consumption_rt.kvapply(lambda k, v: avail[k[0]] - v).vfilter(lambda v: v < 0)
-        return errors_R
+        return self._check_arrays(checker.check_resources_renewable)
+
+    def check_modes(self, **params):
+        # modes the jobs do not have, as the other checks ignore them
+        return self._check_arrays(checker.check_modes)
 
     def get_objective(self, **params):
         return max(self.get_finished_times().values())
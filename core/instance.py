@@ -1,15 +1,71 @@
 import pytups as pt
 import re
 import json
+from .instance_arrays import InstanceArrays
+from .mm_parser import parse_mm
 
 
 class Instance(object):
 
-    def __init__(self, data):
-        self.data = pt.SuperDict.from_dict(data)
+    def __init__(self, data=None, arrays=None):
+        # at least one of data or arrays is needed.
+        # the other one is built when first used.
+        if data is not None:
+            data = pt.SuperDict.from_dict(data)
+        self._data = data
+        self._arrays = arrays
+        self._reduced = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = pt.SuperDict.from_dict(self._arrays.to_data())
+        return self._data
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays=arrays)
+
+    def with_arrays(self, arrays):
+        """
+        :param arrays: the InstanceArrays of this instance with some modes masked
+            (see InstanceArrays.with_mode_mask)
+        :return: a new instance with those arrays and the same data:
+            it has all the modes anyway
+        """
+        instance = Instance(arrays=arrays)
+        instance._data = self._data
+        return instance
 
     @classmethod
     def from_mm(cls, path, content=None):
+        """
+        :param path: path to a PSPLIB .mm file
+        :param content: optionally, the content of the file: bytes, str or a list of lines
+        """
+        if content is None:
+            with open(path, 'rb') as f:
+                content = f.read()
+        elif not isinstance(content, (bytes, str)):
+            content = ''.join(content)
+        return cls.from_arrays(parse_mm(content))
+
+    @classmethod
+    def from_pack(cls, path, name):
+        """
+        :param path: path to a scenario pack (see core.scenario_pack)
+        :param name: name of the .mm file inside the pack
+        :return: the instance, with its arrays read from the memory-mapped pack
+        """
+        from .scenario_pack import open_pack
+        return open_pack(path).get_instance(name)
+
+    @classmethod
+    def from_mm_regex(cls, path, content=None):
+        """
+        Original parser, based on regular expressions and TupLists.
+        It is kept as a reference to check and benchmark from_mm.
+        """
         if content is None:
             with open(path, 'r') as f:
                 content = f.readlines()
@@ -77,7 +133,7 @@ class Instance(object):
             data_json = json.load(f)
         return cls.from_dict(data_json)
 
-    def to_json(self, path):
+    def to_dict(self):
         res = self.data['resources'].values_l()
         job = self.data['jobs'].values_l()
         duration =self.data['durations'].to_dictup().to_tuplist().vapply(lambda v: pt.SuperDict(job=v[0], mode=v[1], duration=v[2]))
@@ -87,9 +143,40 @@ class Instance(object):
                                           resource=v[2],
                                           need=v[3]))
 
-        data = pt.SuperDict(jobs=job, resources=res, needs=needs, durations=duration)
+        return pt.SuperDict(jobs=job, resources=res, needs=needs, durations=duration)
+
+    def to_json(self, path):
+        data = self.to_dict()
         with open(path, 'w') as f:
             json.dump(data, f, indent=4, sort_keys=True)
 
+    @property
+    def arrays(self):
+        """
+        index-based numpy representation of the instance, built only once.
+        See InstanceArrays.
+        """
+        if self._arrays is None:
+            self._arrays = InstanceArrays.from_data(self.data)
+        return self._arrays
+
+    def get_reduced(self):
+        """
+        The same instance without the modes that cannot be in a feasible solution
+        or are dominated (see preprocessing.reduced_mode_mask), built only once.
+        Modes keep their numbers, so solutions of both instances are the same.
+        If a job has no modes left (there is no feasible solution), the instance itself.
+        """
+        if self._reduced is None:
+            from .preprocessing import reduced_mode_mask
+            mode_mask = reduced_mode_mask(self.arrays)
+            if mode_mask.any(axis=1).all():
+                reduced = self.with_arrays(self.arrays.with_mode_mask(mode_mask))
+                reduced._reduced = reduced
+                self._reduced = reduced
+            else:
+                self._reduced = self
+        return self._reduced
+
     def get_renewable_resources(self):
         return self.data['resources'].kfilter(lambda k: k[0]=='R').keys()
@@ -0,0 +1,183 @@
+import numpy as np
+import pytups as pt
+import os
+import pickle
+
+
+def _frozen(array, dtype):
+    array = np.ascontiguousarray(array, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+class InstanceArrays(object):
+    """
+    Compact, index-based and read-only representation of an instance.
+
+    Jobs are referred to by their position in `jobs`, modes by (mode - 1)
+    and resources by their position in `resources`:
+
+    durations: (job x mode) matrix.
+    needs: (job x mode x resource) tensor.
+    mode_mask: (job x mode) boolean matrix. Jobs with fewer modes than
+        the maximum are padded with zeros and masked out.
+    succ_ptr, succ_idx: successors in CSR format. The successors of the job in
+        position j are succ_idx[succ_ptr[j]:succ_ptr[j+1]]. Same for pred_*.
+    renewable: boolean mask over resources.
+    available: capacity of each resource.
+
+    pred_ptr, pred_idx and edge_src are computed from the successors unless
+    they are given (e.g. stored next to them in a scenario pack).
+    """
+
+    def __init__(self, jobs, resources, available, durations, needs, num_modes,
+                 succ_ptr, succ_idx, mode_mask=None, pred_ptr=None, pred_idx=None, edge_src=None):
+        jobs = _frozen(jobs, np.int64)
+        num_modes = _frozen(num_modes, np.int64)
+        durations = _frozen(durations, np.int64)
+        needs = _frozen(needs, np.int64)
+        succ_ptr = _frozen(succ_ptr, np.int64)
+        succ_idx = _frozen(succ_idx, np.int64)
+        if mode_mask is None:
+            mode_mask = np.arange(durations.shape[1]) < num_modes[:, np.newaxis]
+        num_jobs = len(jobs)
+
+        if pred_ptr is None or pred_idx is None or edge_src is None:
+            # predecessors are the transposed successor graph
+            edge_src = np.repeat(np.arange(num_jobs), np.diff(succ_ptr))
+            order = np.argsort(succ_idx, kind='stable')
+            pred_idx = edge_src[order]
+            pred_ptr = np.zeros(num_jobs + 1, dtype=np.int64)
+            np.cumsum(np.bincount(succ_idx, minlength=num_jobs), out=pred_ptr[1:])
+
+        values = dict(
+            jobs=jobs,
+            resources=tuple(resources),
+            available=_frozen(available, np.int64),
+            renewable=_frozen([r[0] == 'R' for r in resources], bool),
+            durations=durations,
+            needs=needs,
+            num_modes=num_modes,
+            mode_mask=_frozen(mode_mask, bool),
+            succ_ptr=succ_ptr,
+            succ_idx=succ_idx,
+            pred_ptr=_frozen(pred_ptr, np.int64),
+            pred_idx=_frozen(pred_idx, np.int64),
+            edge_src=_frozen(edge_src, np.int64),
+            edge_dst=succ_idx,
+            job_index={job: pos for pos, job in enumerate(jobs.tolist())},
+            resource_index={res: pos for pos, res in enumerate(resources)}
+        )
+        for k, v in values.items():
+            object.__setattr__(self, k, v)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("InstanceArrays is read-only")
+
+    def __setstate__(self, state):
+        # pickle gives the arrays back writable
+        for k, v in state.items():
+            if isinstance(v, np.ndarray):
+                v.setflags(write=False)
+            object.__setattr__(self, k, v)
+
+    @classmethod
+    def from_data(cls, data):
+        """
+        builds the arrays from the nested dictionaries in Instance.data
+        """
+        jobs = sorted(data['jobs'].keys())
+        resources = list(data['resources'].keys())
+        available = [data['resources'][r]['available'] for r in resources]
+        durations_data = data['durations']
+        needs_data = data['needs']
+        num_modes = [len(durations_data[j]) for j in jobs]
+        max_modes = max(num_modes)
+        durations = np.zeros((len(jobs), max_modes), dtype=np.int64)
+        needs = np.zeros((len(jobs), max_modes, len(resources)), dtype=np.int64)
+        for pos, job in enumerate(jobs):
+            for mode, duration in durations_data[job].items():
+                durations[pos, mode - 1] = duration
+                needs[pos, mode - 1] = [needs_data[job][mode][r] for r in resources]
+
+        job_index = {job: pos for pos, job in enumerate(jobs)}
+        successors = [[job_index[s] for s in data['jobs'][j]['successors']] for j in jobs]
+        succ_ptr = np.zeros(len(jobs) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in successors], out=succ_ptr[1:])
+        succ_idx = [s for job_succ in successors for s in job_succ]
+        return cls(jobs=jobs, resources=resources, available=available, durations=durations,
+                   needs=needs, num_modes=num_modes, succ_ptr=succ_ptr, succ_idx=succ_idx)
+
+    def save(self, path):
+        """
+        Writes the arrays with pickle (protocol 5), the fastest format to read them back.
+        The file is written under another name and then renamed so it is never seen half-written.
+        """
+        temp_path = '{}.{}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=5)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads the arrays written by save. Only load files written by this program:
+        pickle can run code when reading.
+        """
+        with open(path, 'rb') as f:
+            arrays = pickle.load(f)
+        if not isinstance(arrays, cls):
+            raise ValueError('{} does not have an InstanceArrays object'.format(path))
+        return arrays
+
+    def with_mode_mask(self, mode_mask):
+        """
+        :return: a copy of the arrays where only the modes in mode_mask are available.
+            Modes keep their numbers.
+        """
+        return InstanceArrays(jobs=self.jobs, resources=self.resources, available=self.available,
+                              durations=self.durations, needs=self.needs, num_modes=self.num_modes,
+                              succ_ptr=self.succ_ptr, succ_idx=self.succ_idx,
+                              mode_mask=self.mode_mask & mode_mask, pred_ptr=self.pred_ptr,
+                              pred_idx=self.pred_idx, edge_src=self.edge_src)
+
+    @property
+    def num_jobs(self):
+        return len(self.jobs)
+
+    @property
+    def num_resources(self):
+        return len(self.resources)
+
+    def successors(self, pos):
+        return self.succ_idx[self.succ_ptr[pos]:self.succ_ptr[pos + 1]]
+
+    def predecessors(self, pos):
+        return self.pred_idx[self.pred_ptr[pos]:self.pred_ptr[pos + 1]]
+
+    def to_data(self):
+        """
+        builds the nested dictionaries used in Instance.data
+        """
+        jobs = self.jobs.tolist()
+        succ = self.succ_idx.tolist()
+        ptr = self.succ_ptr.tolist()
+        durations = self.durations.tolist()
+        needs = self.needs.tolist()
+        num_modes = self.num_modes.tolist()
+        resources = self.resources
+        data_jobs = pt.SuperDict()
+        data_durations = pt.SuperDict()
+        data_needs = pt.SuperDict()
+        for pos, job in enumerate(jobs):
+            job_succ = pt.TupList(jobs[s] for s in succ[ptr[pos]:ptr[pos + 1]])
+            data_jobs[job] = dict(successors=job_succ, id=job)
+            modes = range(num_modes[pos])
+            data_durations[job] = pt.SuperDict({m + 1: durations[pos][m] for m in modes})
+            data_needs[job] = pt.SuperDict(
+                {m + 1: pt.SuperDict(zip(resources, needs[pos][m])) for m in modes}
+            )
+        data_resources = pt.SuperDict(
+            {r: dict(available=a, id=r) for r, a in zip(resources, self.available.tolist())}
+        )
+        return dict(resources=data_resources, jobs=data_jobs, durations=data_durations, needs=data_needs)
@@ -0,0 +1,112 @@
+from .instance import Instance
+from .instance_arrays import InstanceArrays
+from . import bounds
+from . import tools
+import json
+import os
+
+# file that experiments have instead of input.json when their instance is in a cache
+REFERENCE_FILE = 'input.ref.json'
+# version of the files in the cache, part of their names.
+# It changes with InstanceArrays, so files of other versions are never read.
+FORMAT_VERSION = 1
+
+
+class InstanceCache(object):
+    """
+    Parsed instances stored by the hash of their .mm file (see tools.hash_content),
+    as PATH/<hash>.v<FORMAT_VERSION>.pkl with the arrays of InstanceArrays
+    (see InstanceArrays.save), which are read-only again when loaded.
+
+    Solving the same scenarios again, with any solver, reads the arrays instead of
+    parsing the files. Experiments refer to the instance in the cache with a small
+    input.ref.json instead of a full input.json (see reference and from_reference).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+
+    def path_for(self, content_hash, suffix='.pkl'):
+        return os.path.join(self.path, '{}.v{}{}'.format(content_hash, FORMAT_VERSION, suffix))
+
+    def __contains__(self, content_hash):
+        return os.path.exists(self.path_for(content_hash))
+
+    def get(self, content_hash):
+        """
+        :return: the instance or None if it is not in the cache
+        """
+        path = self.path_for(content_hash)
+        if not os.path.exists(path):
+            return None
+        return Instance.from_arrays(InstanceArrays.load(path))
+
+    def put(self, content_hash, instance):
+        instance.arrays.save(self.path_for(content_hash))
+
+    def get_reduced(self, content_hash, instance):
+        """
+        :param instance: the instance with that hash
+        :return: the reduced instance (see Instance.get_reduced), from the cache
+            if it is there (PATH/<hash>.v<FORMAT_VERSION>.reduced.pkl) or added to it if not.
+        """
+        path = self.path_for(content_hash, '.reduced.pkl')
+        if os.path.exists(path):
+            return instance.with_arrays(InstanceArrays.load(path))
+        reduced = instance.get_reduced()
+        reduced.arrays.save(path)
+        return reduced
+
+    def get_bounds(self, content_hash, instance, cp_time=None, cp_options=None):
+        """
+        :param instance: the instance with that hash
+        :param cp_time: seconds of CP-SAT for the bound, see bounds.lower_bounds
+        :param cp_options: other options of CP-SAT, see bounds.lower_bounds
+        :return: the lower bounds of the instance (see bounds.lower_bounds), from the cache
+            if they are there (PATH/<hash>.v<FORMAT_VERSION>.bounds.json) or added to it if not.
+            Each cp_time has its own bounds.
+        """
+        path = self.path_for(content_hash, '.bounds.json')
+        all_bounds = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                all_bounds = json.load(f)
+        key = str(cp_time or 0)
+        if key not in all_bounds:
+            all_bounds[key] = bounds.lower_bounds(instance, cp_time=cp_time, cp_options=cp_options)
+            tools.write_json_atomic(all_bounds, path, indent=None)
+        return all_bounds[key]
+
+    def from_mm(self, content, content_hash=None):
+        """
+        :param content: content of a .mm file
+        :return: the instance in the cache or, if it is not there, the parsed
+            content, which is added to the cache.
+        """
+        if content_hash is None:
+            content_hash = tools.hash_content(content)
+        instance = self.get(content_hash)
+        if instance is None:
+            instance = Instance.from_mm(path=None, content=content)
+            self.put(content_hash, instance)
+        return instance
+
+    def reference(self, content_hash):
+        """
+        :return: the content of input.ref.json for an instance in the cache
+        """
+        return dict(hash=content_hash, cache=os.path.abspath(self.path))
+
+    @classmethod
+    def from_reference(cls, reference, path=None):
+        """
+        :param reference: the content of input.ref.json
+        :param path: the cache to use, if not the one in the reference
+        """
+        cache = cls(path or reference['cache'])
+        instance = cache.get(reference['hash'])
+        if instance is None:
+            raise ValueError('instance {} is not in the cache {}'.format(reference['hash'], cache.path))
+        return instance
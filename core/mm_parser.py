@@ -0,0 +1,78 @@
+import numpy as np
+from .instance_arrays import InstanceArrays
+
+# states of the parser
+_NONE, _PREC_HEADER, _PREC, _REQ_HEADER, _REQ_SEP, _REQ, _AVAIL_HEADER, _AVAIL = range(8)
+
+_SECTIONS = {
+    b'PRECEDENCE': _PREC_HEADER,
+    b'REQUESTS/DURATIONS:': _REQ_HEADER,
+    b'RESOURCEAVAILABILITIES:': _AVAIL_HEADER
+}
+
+
+def parse_mm(content):
+    """
+    Parses a PSPLIB multi-mode (.mm) file in one pass over its lines.
+
+    :param content: the raw file (bytes, as returned by ZipFile.read, or str)
+    :return: an InstanceArrays object
+    """
+    if isinstance(content, str):
+        content = content.encode()
+    state = _NONE
+    jobs = []
+    num_modes = []
+    successors = []
+    resources = []
+    requests = []
+    available = []
+    job = None
+    for line in content.splitlines():
+        tokens = line.split()
+        if not tokens:
+            continue
+        first = tokens[0]
+        if first[:1] == b'*':
+            state = _NONE
+        elif state == _NONE:
+            state = _SECTIONS.get(first, _NONE)
+        elif state == _PREC:
+            # jobnr. #modes #successors successors
+            jobs.append(int(first))
+            num_modes.append(int(tokens[1]))
+            successors.append(tokens[3:])
+        elif state == _REQ:
+            # jobnr. mode duration needs
+            # the job number is only present in the first mode of each job
+            if len(tokens) > len(resources) + 2:
+                job = int(first)
+                tokens = tokens[1:]
+            requests.append([job, *tokens])
+        elif state == _REQ_HEADER:
+            # jobnr. mode duration R 1 R 2 N 1 N 2
+            names = tokens[3:]
+            resources = [(a + b' ' + b).decode() for a, b in zip(names[::2], names[1::2])]
+            state = _REQ_SEP
+        elif state == _AVAIL:
+            available = [int(v) for v in tokens]
+            state = _NONE
+        elif state in (_PREC_HEADER, _REQ_SEP, _AVAIL_HEADER):
+            # column headers and separators
+            state += 1
+
+    job_index = {j: pos for pos, j in enumerate(jobs)}
+    succ_ptr = np.zeros(len(jobs) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in successors], out=succ_ptr[1:])
+    succ_idx = [job_index[int(s)] for job_succ in successors for s in job_succ]
+
+    # columns: job, mode, duration, needs...
+    requests = np.array(requests, dtype=np.int64).reshape(-1, len(resources) + 3)
+    positions = np.array([job_index[j] for j in requests[:, 0].tolist()], dtype=np.int64)
+    modes = requests[:, 1] - 1
+    durations = np.zeros((len(jobs), max(num_modes)), dtype=np.int64)
+    needs = np.zeros((len(jobs), max(num_modes), len(resources)), dtype=np.int64)
+    durations[positions, modes] = requests[:, 2]
+    needs[positions, modes] = requests[:, 3:]
+    return InstanceArrays(jobs=jobs, resources=resources, available=available, durations=durations,
+                          needs=needs, num_modes=num_modes, succ_ptr=succ_ptr, succ_idx=succ_idx)
@@ -0,0 +1,227 @@
+import heapq
+import numpy as np
+
+
+def topological_order(arrays, rng=None):
+    """
+    :param arrays: InstanceArrays
+    :param rng: a random.Random object. If given, ties are broken at random.
+        If not, jobs go in position order.
+    :return: a precedence-feasible list of job positions
+    """
+    num_preds = np.diff(arrays.pred_ptr).tolist()
+    successors = [arrays.successors(j).tolist() for j in range(arrays.num_jobs)]
+    eligible = [j for j, n in enumerate(num_preds) if not n]
+    order = []
+    while eligible:
+        if rng is None:
+            job = heapq.heappop(eligible)
+        else:
+            pos = rng.randrange(len(eligible))
+            eligible[pos], eligible[-1] = eligible[-1], eligible[pos]
+            job = eligible.pop()
+        order.append(job)
+        for succ in successors[job]:
+            num_preds[succ] -= 1
+            if not num_preds[succ]:
+                if rng is None:
+                    heapq.heappush(eligible, succ)
+                else:
+                    eligible.append(succ)
+    if len(order) != arrays.num_jobs:
+        raise ValueError('the precedence graph has cycles')
+    return order
+
+
+def feasible_mode_mask(arrays):
+    """
+    Removes the modes that can never be part of a feasible solution:
+    modes that need more than the capacity of a renewable resource and
+    modes that, together with the cheapest modes of all other jobs,
+    need more than the capacity of a non-renewable resource.
+    Removing modes makes the cheapest modes more expensive, so it repeats until nothing changes.
+
+    :return: (job x mode) boolean matrix with the modes that are left
+    """
+    renewable = arrays.renewable
+    mask = arrays.mode_mask & (arrays.needs[:, :, renewable] <= arrays.available[renewable]).all(axis=2)
+    needs = arrays.needs[:, :, ~renewable]
+    capacity = arrays.available[~renewable]
+    while True:
+        # cheapest need of each job in each non-renewable resource
+        min_needs = np.where(mask[:, :, np.newaxis], needs, np.iinfo(np.int64).max).min(axis=1)
+        if (~mask.any(axis=1)).any():
+            # a job has no modes left: there is no feasible solution
+            return mask
+        total = min_needs.sum(axis=0)
+        new_mask = mask & (needs - min_needs[:, np.newaxis, :] + total <= capacity).all(axis=2)
+        if (new_mask == mask).all():
+            return mask
+        mask = new_mask
+
+
+def min_durations(arrays, mode_mask=None):
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    return np.where(mode_mask, arrays.durations, np.iinfo(np.int64).max).min(axis=1)
+
+
+def max_durations(arrays, mode_mask=None):
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    return np.where(mode_mask, arrays.durations, 0).max(axis=1)
+
+
+def earliest_starts(arrays, durations, order=None):
+    """
+    Forward pass of the critical path method, ignoring resources.
+
+    :param durations: duration of each job position
+    :param order: a topological order, if already known
+    """
+    if order is None:
+        order = topological_order(arrays)
+    durations = list(durations)
+    starts = [0] * arrays.num_jobs
+    predecessors = [arrays.predecessors(j).tolist() for j in range(arrays.num_jobs)]
+    for job in order:
+        preds = predecessors[job]
+        if preds:
+            starts[job] = max([starts[p] + durations[p] for p in preds])
+    return np.array(starts, dtype=np.int64)
+
+
+def latest_starts(arrays, durations, horizon, order=None):
+    """
+    Backward pass of the critical path method: latest start of each job
+    so that all jobs finish by horizon, ignoring resources.
+    """
+    if order is None:
+        order = topological_order(arrays)
+    durations = list(durations)
+    starts = [0] * arrays.num_jobs
+    successors = [arrays.successors(j).tolist() for j in range(arrays.num_jobs)]
+    for job in reversed(order):
+        finish = min([starts[s] for s in successors[job]], default=horizon)
+        starts[job] = finish - durations[job]
+    return np.array(starts, dtype=np.int64)
+
+
+def greedy_modes(arrays, mode_mask=None):
+    """
+    For each job, the mode that uses the smallest share of the non-renewable resources
+    (the shortest one in case of a tie).
+
+    :return: mode vector (mode - 1 per job position) or None if it does not fit
+        in the non-renewable resources
+    """
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    renewable = arrays.renewable
+    capacity = np.maximum(arrays.available[~renewable], 1)
+    share = (arrays.needs[:, :, ~renewable] / capacity).sum(axis=2)
+    # share first, duration to break ties
+    cost = np.where(mode_mask, share + arrays.durations * 1e-9, np.inf)
+    modes = cost.argmin(axis=1)
+    consumption = arrays.needs[np.arange(arrays.num_jobs), modes][:, ~renewable].sum(axis=0)
+    if (consumption > arrays.available[~renewable]).any() or not mode_mask.any(axis=1).all():
+        return None
+    return modes.tolist()
+
+
+def dominated_mode_mask(arrays, mode_mask=None):
+    """
+    Removes the modes that are dominated by another mode of the same job: one that is
+    not longer and does not need more of any resource. Doing a job in the other mode
+    keeps any schedule feasible and its makespan does not grow, so at least one
+    optimal solution is left. Of two equal modes, the first one is kept.
+
+    :return: (job x mode) boolean matrix with the modes that are left
+    """
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    durations = arrays.durations
+    needs = arrays.needs
+    num_modes = durations.shape[1]
+    # [job, b, a]: mode b is as good as mode a
+    as_good = \
+        (durations[:, :, np.newaxis] <= durations[:, np.newaxis, :]) & \
+        (needs[:, :, np.newaxis, :] <= needs[:, np.newaxis, :, :]).all(axis=3)
+    equal = \
+        (durations[:, :, np.newaxis] == durations[:, np.newaxis, :]) & \
+        (needs[:, :, np.newaxis, :] == needs[:, np.newaxis, :, :]).all(axis=3)
+    first = np.arange(num_modes)[:, np.newaxis] < np.arange(num_modes)[np.newaxis, :]
+    dominates = mode_mask[:, :, np.newaxis] & mode_mask[:, np.newaxis, :] & as_good & (~equal | first)
+    return mode_mask & ~dominates.any(axis=1)
+
+
+def reduced_mode_mask(arrays):
+    """
+    Modes that can be part of a feasible solution (see feasible_mode_mask)
+    and are not dominated (see dominated_mode_mask).
+    """
+    mode_mask = feasible_mode_mask(arrays)
+    if not mode_mask.any(axis=1).all():
+        return mode_mask
+    return dominated_mode_mask(arrays, mode_mask)
+
+
+def feasible_modes(arrays, mode_mask=None, max_states=10000):
+    """
+    A mode vector that fits in the non-renewable resources, as short as possible
+    (by the sum of durations). Dynamic programming over the jobs, as in a knapsack
+    with one dimension per non-renewable resource: the states after each job are the
+    consumptions that still fit with the cheapest modes of the jobs left,
+    each one with the shortest modes that reach it.
+
+    :param max_states: states kept after each job (the ones with the shortest modes).
+        If there are more, a vector that fits could be missed.
+    :return: mode vector (mode - 1 per job position) or None if none is found
+    """
+    if mode_mask is None:
+        mode_mask = arrays.mode_mask
+    if not mode_mask.any(axis=1).all():
+        return None
+    non_renewable = ~arrays.renewable
+    needs = arrays.needs[:, :, non_renewable]
+    capacity = arrays.available[non_renewable]
+    min_needs = np.where(mode_mask[:, :, np.newaxis], needs, np.iinfo(np.int64).max).min(axis=1)
+    # what the jobs after each one need at least
+    rest = np.zeros_like(min_needs)
+    rest[:-1] = np.cumsum(min_needs[::-1], axis=0)[::-1][1:]
+    limits = capacity - rest
+    # each consumption that fits is one number
+    radix = np.cumprod(np.concatenate([[1], capacity[:-1] + 1])).astype(np.int64)
+
+    states = np.zeros((1, len(capacity)), dtype=np.int64)
+    totals = np.zeros(1, dtype=np.int64)
+    # for each job: previous state and mode of each state
+    layers = []
+    for job in range(arrays.num_jobs):
+        modes = np.flatnonzero(mode_mask[job])
+        new_states = (states[:, np.newaxis, :] + needs[job, modes][np.newaxis, :, :]).reshape(-1, len(capacity))
+        new_totals = (totals[:, np.newaxis] + arrays.durations[job, modes][np.newaxis, :]).ravel()
+        previous = np.repeat(np.arange(len(states)), len(modes))
+        state_modes = np.tile(modes, len(states))
+        fits = (new_states <= limits[job]).all(axis=1)
+        if not fits.any():
+            return None
+        new_states, new_totals = new_states[fits], new_totals[fits]
+        previous, state_modes = previous[fits], state_modes[fits]
+        # the shortest of each consumption
+        keys = (new_states * radix).sum(axis=1)
+        order = np.lexsort((new_totals, keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = keys[order][1:] != keys[order][:-1]
+        kept = order[first]
+        if len(kept) > max_states:
+            kept = kept[np.argsort(new_totals[kept], kind='stable')[:max_states]]
+        states, totals = new_states[kept], new_totals[kept]
+        layers.append((previous[kept], state_modes[kept]))
+
+    state = int(totals.argmin())
+    result = []
+    for previous, state_modes in reversed(layers):
+        result.append(int(state_modes[state]))
+        state = previous[state]
+    return result[::-1]
@@ -0,0 +1,86 @@
+from . import tools as di
+import os
+import pandas as pd
+
+KEY_COLUMNS = ['scenario', 'name', 'solver']
+
+
+class ResultsStore(object):
+    """
+    Summary of the experiments of a batch: one row per experiment with
+    its objective, status, time, solver, number of errors and instance size.
+
+    It is stored next to the batch (PATH/TO/BATCH.summary/) as a set of
+    columnar files (parquet or feather) that are only appended to.
+    When an experiment is solved again, its last row is the one that counts.
+    Writing and reading needs pyarrow.
+    """
+    extensions = dict(parquet='.parquet', feather='.feather')
+
+    def __init__(self, path, file_format='parquet', flush_every=100):
+        """
+        :param path: directory with the files
+        :param file_format: parquet or feather
+        :param flush_every: number of rows kept in memory before writing them
+        """
+        if file_format not in self.extensions:
+            raise ValueError('file format not known: {}'.format(file_format))
+        self.path = path
+        self.file_format = file_format
+        self.flush_every = flush_every
+        self.rows = []
+
+    @classmethod
+    def for_batch(cls, path, **kwargs):
+        """
+        :param path: the batch directory or its zip
+        """
+        return cls(di.batch_sibling(path, '.summary'), **kwargs)
+
+    def exists(self):
+        return os.path.isdir(self.path) and len(self._files()) > 0
+
+    def _files(self):
+        extensions = tuple(self.extensions.values())
+        return sorted(f for f in os.listdir(self.path) if f.endswith(extensions))
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        table = pd.DataFrame(self.rows)
+        files = self._files()
+        number = 0
+        if files:
+            number = int(os.path.splitext(files[-1])[0].split('-')[1]) + 1
+        filename = os.path.join(self.path, 'part-{:05d}{}'.format(number, self.extensions[self.file_format]))
+        if self.file_format == 'parquet':
+            table.to_parquet(filename, index=False)
+        else:
+            table.to_feather(filename)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+
+    def read(self):
+        """
+        :return: a DataFrame with the last row of each experiment
+        """
+        tables = []
+        for filename in self._files():
+            path = os.path.join(self.path, filename)
+            if filename.endswith(self.extensions['parquet']):
+                tables.append(pd.read_parquet(path))
+            else:
+                tables.append(pd.read_feather(path))
+        if not tables:
+            return pd.DataFrame(columns=KEY_COLUMNS)
+        table = pd.concat(tables, ignore_index=True)
+        return table.drop_duplicates(KEY_COLUMNS, keep='last').reset_index(drop=True)
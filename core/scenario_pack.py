@@ -0,0 +1,174 @@
+from .instance import Instance
+from .instance_arrays import InstanceArrays
+from . import tools
+import json
+import numpy as np
+import os
+
+# file layout: MAGIC, length of the header (8 bytes, little endian), json header
+# and then the arrays, each one starting at a multiple of ALIGN
+MAGIC = b'RCPSPPK2'
+ALIGN = 64
+
+# arrays of all instances one after the other.
+# *_ptr[i]:*_ptr[i+1] is the part of instance i
+_pointers = dict(
+    jobs='job_ptr', num_modes='job_ptr', succ_ptr='succ_ptr_ptr',
+    succ_idx='edge_ptr', durations='durations_ptr', needs='needs_ptr', available='resource_ptr',
+    pred_ptr='succ_ptr_ptr', pred_idx='edge_ptr', edge_src='edge_ptr'
+)
+
+
+def write_pack(path, instances):
+    """
+    :param path: file to write
+    :param instances: list of (name, content hash, InstanceArrays)
+    """
+    names, hashes, arrays_list = zip(*instances) if instances else ([], [], [])
+    sizes = dict(
+        job_ptr=[a.num_jobs for a in arrays_list],
+        succ_ptr_ptr=[a.num_jobs + 1 for a in arrays_list],
+        edge_ptr=[len(a.succ_idx) for a in arrays_list],
+        durations_ptr=[a.durations.size for a in arrays_list],
+        needs_ptr=[a.needs.size for a in arrays_list],
+        resource_ptr=[a.num_resources for a in arrays_list]
+    )
+    arrays = {name: np.concatenate([[0], np.cumsum(values, dtype=np.int64)]).astype(np.int64)
+              for name, values in sizes.items()}
+    for name in _pointers:
+        parts = [getattr(a, name).ravel() for a in arrays_list]
+        arrays[name] = np.concatenate(parts).astype(np.int64) if parts else np.zeros(0, dtype=np.int64)
+    arrays['max_modes'] = np.array([a.durations.shape[1] for a in arrays_list], dtype=np.int64)
+
+    header = dict(instances=[dict(name=n, hash=h, resources=list(a.resources))
+                             for n, h, a in zip(names, hashes, arrays_list)],
+                  arrays={})
+    # offsets are relative to the end of the header, which is padded
+    position = 0
+    for name, array in arrays.items():
+        header['arrays'][name] = dict(dtype=array.dtype.str, shape=list(array.shape), offset=position)
+        position += -(-array.nbytes // ALIGN) * ALIGN
+    header_bytes = json.dumps(header).encode()
+    start = -(-(len(MAGIC) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+    header_bytes += b' ' * (start - len(MAGIC) - 8 - len(header_bytes))
+
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(temp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            data = array.tobytes()
+            f.write(data)
+            f.write(b'\0' * (-len(data) % ALIGN))
+    os.replace(temp_path, path)
+
+
+def pack_scenario(source, path=None):
+    """
+    Parses all the .mm files of a scenario and writes them in one pack file.
+
+    :param source: a scenario zip or a directory with .mm files
+    :param path: file to write, by default the source with .pack instead of .zip
+    :return: the path of the pack
+    """
+    if path is None:
+        path = tools.batch_sibling(source, '.pack')
+    contents = tools.read_mm_files(source)
+    instances = [(filename, tools.hash_content(content), Instance.from_mm(None, content).arrays)
+                 for filename, content in contents.items()]
+    write_pack(path, instances)
+    return path
+
+
+class ScenarioPack(object):
+    """
+    All the instances of a scenario in one memory-mapped file (see pack_scenario).
+
+    Opening it only reads the header. The arrays of each instance are read-only views
+    of the file, so they are only read from disk when used and never copied.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not a scenario pack'.format(path))
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+        start = len(MAGIC) + 8 + header_length
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            self.arrays[name] = np.frombuffer(buffer, dtype=spec['dtype'], count=count,
+                                              offset=start + spec['offset']).reshape(spec['shape'])
+        self.instances = header['instances']
+        self.names = [i['name'] for i in self.instances]
+        self.index = {name: pos for pos, name in enumerate(self.names)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def get_hash(self, name):
+        """
+        :return: the hash of the .mm file of the instance
+        """
+        return self.instances[self.index[name]]['hash']
+
+    def get_arrays(self, name):
+        """
+        :return: the InstanceArrays of the instance, with views of the file
+        """
+        pos = self.index[name]
+        arrays = self.arrays
+
+        def part(array_name):
+            pointer = arrays[_pointers[array_name]]
+            return arrays[array_name][pointer[pos]:pointer[pos + 1]]
+
+        num_jobs = int(arrays['job_ptr'][pos + 1] - arrays['job_ptr'][pos])
+        max_modes = int(arrays['max_modes'][pos])
+        resources = self.instances[pos]['resources']
+        return InstanceArrays(jobs=part('jobs'), resources=resources, available=part('available'),
+                              durations=part('durations').reshape(num_jobs, max_modes),
+                              needs=part('needs').reshape(num_jobs, max_modes, len(resources)),
+                              num_modes=part('num_modes'), succ_ptr=part('succ_ptr'),
+                              succ_idx=part('succ_idx'), pred_ptr=part('pred_ptr'),
+                              pred_idx=part('pred_idx'), edge_src=part('edge_src'))
+
+    def get_instance(self, name):
+        return Instance.from_arrays(self.get_arrays(name))
+
+
+# packs opened by this process, see open_pack: {path: ((mtime, size), pack)}
+_packs = {}
+
+
+def open_pack(path):
+    """
+    :return: the ScenarioPack in path, opened only once per process
+        (or again if the file changed since)
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    if path not in _packs or _packs[path][0] != stamp:
+        _packs[path] = (stamp, ScenarioPack(path))
+    return _packs[path][1]
+
+
+class PackedInstance(object):
+    """
+    Reference to an instance inside a pack, to send to other processes instead of its content.
+    """
+
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+
+    def load(self):
+        return open_pack(self.path).get_instance(self.name)
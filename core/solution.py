@@ -1,4 +1,5 @@
 import pytups as pt
+import numpy as np
 import json
 from .tools import dict_to_list
 
@@ -25,8 +26,26 @@ class Solution(object):
             data_json = json.load(f)
         return cls.from_dict(data_json)
 
+    def to_arrays(self, arrays):
+        """
+        :param arrays: the InstanceArrays of the instance
+        :return: start periods and modes (mode - 1) per job position.
+            Jobs not in the solution get mode -1 (see checker.MISSING).
+        """
+        starts = np.zeros(arrays.num_jobs, dtype=np.int64)
+        modes = np.full(arrays.num_jobs, -1, dtype=np.int64)
+        job_index = arrays.job_index
+        for job, data in self.data.items():
+            pos = job_index[job]
+            starts[pos] = data['period']
+            modes[pos] = data['mode'] - 1
+        return starts, modes
+
+    def to_dict(self):
+        return dict_to_list(self.data, 'job')
+
     def to_json(self, path):
-        data_json = dict_to_list(self.data, 'job')
+        data_json = self.to_dict()
         with open(path, 'w') as f:
             json.dump(data_json, f, indent=4, sort_keys=True)
         return
@@ -0,0 +1,79 @@
+import orloge as ol
+import pandas as pd
+import re
+
+# progress lines of CP-SAT: #1 0.07s best:540 next:[97,539] main
+# (#Bound lines have the same format)
+_cpsat_progress = re.compile(r'^#(\d+|Bound|Done)\s+(\d+(?:\.\d+)?)s\s+best:(\S+)\s+next:\[([^\]]*)\]',
+                             re.MULTILINE)
+
+
+def _to_number(value):
+    # best:inf means there is no solution yet
+    try:
+        value = float(value)
+    except ValueError:
+        return None
+    if value in (float('inf'), float('-inf')):
+        return None
+    return value
+
+
+def get_cpsat_progress(content):
+    """
+    :param content: CP-SAT log (with log_search_progress)
+    :return: a DataFrame with the columns of orloge's progress: Time, CutsBestBound,
+        BestInteger and Gap (relative, in %). One row per new solution or bound.
+    """
+    rows = []
+    bound = None
+    for event, time, best, next_bounds in _cpsat_progress.findall(content):
+        best = _to_number(best)
+        next_bounds = next_bounds.split(',')
+        if next_bounds[0]:
+            bound = _to_number(next_bounds[0])
+        elif best is not None:
+            # search is over: nothing better than best
+            bound = best
+        gap = None
+        if best is not None and bound is not None:
+            gap = abs(best - bound) / max(abs(best), 1e-10) * 100
+        rows.append((float(time), bound, best, gap))
+    return pd.DataFrame.from_records(rows, columns=['Time', 'CutsBestBound', 'BestInteger', 'Gap'])
+
+
+def get_info_cpsat(content, get_progress=False):
+    """
+    orloge's information on a CP-SAT log with the progress (and what comes from it)
+    parsed here: orloge's CP-SAT progress parser does not work with every
+    version of cpsat-logutils.
+
+    :return: orloge's dictionary with also time_to_incumbent, the time
+        when the final solution was found
+    """
+    info = ol.get_info_solver(content, 'CPSAT', get_progress=False, content=True)
+    progress = get_cpsat_progress(content)
+    solutions = progress[progress.BestInteger.notna()]
+    info['first_solution'] = None
+    info['time_to_incumbent'] = None
+    if len(solutions):
+        info['first_solution'] = solutions.iloc[0].to_dict()
+        best = solutions.BestInteger.iloc[-1]
+        info['time_to_incumbent'] = solutions.Time[solutions.BestInteger == best].iloc[0]
+    if get_progress:
+        info['progress'] = progress
+    return info
+
+
+def get_info_solver(path, solver, get_progress=False, content=False):
+    """
+    Same as orloge.get_info_solver, with CP-SAT logs parsed by get_info_cpsat.
+
+    :param path: path to the log or its content if content is True
+    """
+    if solver != 'CPSAT':
+        return ol.get_info_solver(path, solver, get_progress=get_progress, content=content)
+    if not content:
+        with open(path, 'r') as f:
+            path = f.read()
+    return get_info_cpsat(path, get_progress=get_progress)
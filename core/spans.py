@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from timeit import default_timer as timer
+
+
+class Spans(object):
+    """
+    Time spent in each phase of a run:
+
+        spans = Spans()
+        with spans('parse'):
+            ...
+
+    The time of spans with the same name is added up.
+    """
+
+    def __init__(self):
+        self.times = {}
+
+    @contextmanager
+    def __call__(self, name):
+        start = timer()
+        try:
+            yield
+        finally:
+            self.add(name, timer() - start)
+
+    def add(self, name, seconds):
+        self.times[name] = self.times.get(name, 0) + seconds
+
+    def update(self, other):
+        for name, seconds in other.times.items():
+            self.add(name, seconds)
+
+    def to_dict(self, prefix='time_'):
+        """
+        :return: {prefix + name: seconds}
+        """
+        return {prefix + name: seconds for name, seconds in self.times.items()}
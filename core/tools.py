@@ -4,6 +4,8 @@ except ImportError:
     import json
 import os
 import pickle
+import hashlib
+import zipfile
 
 
 def copy_dict(_dict):
@@ -44,9 +46,62 @@ def load_data_zip(zipobj, path, file_type='json'):
         return json.loads(data)
 
 
-def write_json(data, path):
+def dumps_json(data, indent=4):
+    """
+    :param indent: None gives the compact version
+    """
+    if indent is None:
+        return json.dumps(data, sort_keys=True)
+    return json.dumps(data, indent=indent, sort_keys=True)
+
+
+def write_json(data, path, indent=4):
     with open(path, 'w') as f:
-        json.dump(data, f, indent=4, sort_keys=True)
+        f.write(dumps_json(data, indent))
+
+
+def write_json_atomic(data, path, indent=4):
+    """
+    writes to a temporary file first so path is never left half written.
+    The temporary file has the pid, so processes writing the same path do not mix their files.
+    """
+    temp_path = '{}.{}.tmp'.format(path, os.getpid())
+    write_json(data, temp_path, indent)
+    os.replace(temp_path, path)
+
+
+def read_mm_files(source):
+    """
+    :param source: a scenario zip (e.g. data/c15.mm.zip) or a directory with .mm files
+    :return: {filename: content} sorted by filename
+    """
+    if os.path.isdir(source):
+        contents = {}
+        for filename in sorted(f for f in os.listdir(source) if f.endswith('.mm')):
+            with open(os.path.join(source, filename), 'rb') as f:
+                contents[filename] = f.read()
+        return contents
+    with zipfile.ZipFile(source) as zip_obj:
+        files = sorted(f for f in zip_obj.namelist() if f.endswith('.mm'))
+        return {filename: zip_obj.read(filename) for filename in files}
+
+
+def batch_sibling(path, suffix):
+    """
+    path of a file that goes next to a batch output:
+    /PATH/TO/BATCH/ or /PATH/TO/BATCH.zip -> /PATH/TO/BATCH + suffix
+    """
+    path = path.rstrip('/\\')
+    name, ext = os.path.splitext(path)
+    if ext == '.zip':
+        path = name
+    return path + suffix
+
+
+def hash_content(content):
+    if isinstance(content, str):
+        content = content.encode()
+    return hashlib.sha1(content).hexdigest()
 
 
 def parent_dirs(pathname, subdirs=None):
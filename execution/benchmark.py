@@ -0,0 +1,262 @@
+from core import Instance, Experiment
+from solvers import get_solver, solvers, CPModel1
+import core.tools as tools
+import execution.run_batch as rb
+import numpy as np
+import ortools
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import warnings
+import zipfile
+from timeit import default_timer as timer
+
+
+def time_function(func, args_list, repeat=3):
+    """
+    :return: the best total time (in seconds) of applying func to every element in args_list
+    """
+    best = None
+    for _ in range(repeat):
+        start = timer()
+        for args in args_list:
+            func(*args)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def benchmark_parsers(directory='data/c15.mm', repeat=3):
+    """
+    Compares Instance.from_mm against the regex parser (Instance.from_mm_regex)
+    over all the .mm files in directory. Both parsers are checked to give the same data.
+    """
+    contents = tools.read_mm_files(directory)
+    as_lines = lambda c: c.decode().splitlines(True)
+    for filename, content in contents.items():
+        fast = Instance.from_mm(path=None, content=content).data
+        regex = Instance.from_mm_regex(path=None, content=as_lines(content)).data
+        if fast != regex:
+            raise ValueError('parsers do not match in {}'.format(filename))
+
+    args_list = [(None, c) for c in contents.values()]
+    args_list_lines = [(None, as_lines(c)) for c in contents.values()]
+    result = dict(
+        files=len(contents),
+        regex=time_function(lambda p, c: Instance.from_mm_regex(p, c), args_list_lines, repeat),
+        fast=time_function(lambda p, c: Instance.from_mm(p, c), args_list, repeat),
+        fast_to_data=time_function(lambda p, c: Instance.from_mm(p, c).data, args_list, repeat)
+    )
+    result['speedup'] = result['regex'] / result['fast']
+    return result
+
+
+def time_to_optimal(instance, solver_name, options):
+    """
+    :return: status and seconds taken by the solver
+    """
+    algo = get_solver(solver_name)(instance)
+    start = timer()
+    status = algo.solve(options)
+    return dict(status=int(status), time=timer() - start)
+
+
+def benchmark_cp_options(versions, directory='data/c15.mm', time_limit=10, max_files=None):
+    """
+    Solves every .mm file in directory with CPModel1, once for each version of the options.
+
+    :param versions: dictionary of name => options (timeLimit is added)
+    :return: for each version, the total time, the number of instances solved to
+        optimality and the total time of those solved to optimality by all versions.
+    """
+    contents = tools.read_mm_files(directory)
+    filenames = list(contents)[:max_files]
+    runs = {}
+    for name, version in versions.items():
+        options = dict(version, timeLimit=time_limit)
+        runs[name] = {f: time_to_optimal(Instance.from_mm(None, contents[f]), 'ortools', options)
+                      for f in filenames}
+    optimal = 4
+    all_optimal = [f for f in filenames if all(runs[name][f]['status'] == optimal for name in runs)]
+    return {name: dict(total_time=sum(r['time'] for r in run.values()),
+                       optimal=sum(r['status'] == optimal for r in run.values()),
+                       time_to_optimal=sum(run[f]['time'] for f in all_optimal))
+            for name, run in runs.items()}
+
+
+def benchmark_cp_preprocessing(directory='data/c15.mm', time_limit=10, max_files=None):
+    """
+    CPModel1 with and without preprocessing, see benchmark_cp_options.
+    """
+    versions = dict(before=dict(preprocess=False), after=dict(preprocess=True))
+    return benchmark_cp_options(versions, directory, time_limit, max_files)
+
+
+def benchmark_cp_formulations(directory='data/c15.mm', time_limit=10, max_files=None):
+    """
+    The formulations of CPModel1, see benchmark_cp_options.
+    """
+    versions = {name: dict(formulation=name) for name in CPModel1.formulations}
+    return benchmark_cp_options(versions, directory, time_limit, max_files)
+
+
+def benchmark_cp_builders(directory='data/c15.mm', max_files=None, repeat=3):
+    """
+    Time to build the model of CPModel1 (without solving it) with each builder.
+    Instances are parsed before, so only the building is timed.
+
+    :return: for each builder, the best total time of building all the models
+    """
+    contents = tools.read_mm_files(directory)
+    filenames = list(contents)[:max_files]
+    instances = [Instance.from_mm(None, contents[f]) for f in filenames]
+    for instance in instances:
+        # both builders use the arrays and build_model also uses the data
+        instance.data
+        instance.arrays
+    result = dict(files=len(instances))
+    for name, method in CPModel1.builders.items():
+        args_list = [(getattr(CPModel1(instance), method), ) for instance in instances]
+        result[name] = time_function(lambda build: build({}), args_list, repeat)
+    return result
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def _solver_run(instance, solver_name, options):
+    algo = get_solver(solver_name)(instance)
+    start = timer()
+    algo.solve(options)
+    elapsed = timer() - start
+    if not algo.solution:
+        return elapsed, None, None
+    return elapsed, algo.get_objective(), len(algo.check_solution())
+
+
+def benchmark_suite(directory='data/c15.mm', solver_names=None, time_limit=1, seed=0, repeat=3,
+                    solver_files=20):
+    """
+    Times the main operations over the .mm files in directory (or scenario zip):
+    parsing (Instance.from_mm), Instance.to_json and from_json, Experiment.check_solution
+    on the solutions of the default solver, get_table on a result zip (with and without
+    the summary) and each solver in solver_names (all registered by default)
+    on the first solver_files files.
+
+    Times are the best of repeat runs, except for solvers, which run once with
+    timeLimit=time_limit, seed=seed and one thread, and also report the sum of
+    objectives and errors.
+
+    :return: dictionary with the settings and versions used and the results:
+        {name: dict(time=seconds, ...)}
+    """
+    contents = tools.read_mm_files(directory)
+    filenames = list(contents)
+    instances = [Instance.from_mm(None, contents[f]) for f in filenames]
+    results = {}
+    results['from_mm'] = dict(time=time_function(lambda c: Instance.from_mm(None, c),
+                                                 [(c,) for c in contents.values()], repeat))
+    # the data dictionaries are built once, to time only the conversion
+    [i.data for i in instances]
+
+    work_dir = tempfile.mkdtemp()
+    try:
+        json_paths = [os.path.join(work_dir, os.path.splitext(f)[0] + '.json') for f in filenames]
+        results['to_json'] = dict(time=time_function(lambda i, p: i.to_json(p),
+                                                     list(zip(instances, json_paths)), repeat))
+        results['from_json'] = dict(time=time_function(lambda p: Instance.from_json(p).data,
+                                                       [(p,) for p in json_paths], repeat))
+
+        experiments = []
+        for instance in instances:
+            algo = get_solver('default')(instance)
+            algo.solve({})
+            experiments.append(Experiment(instance, algo.solution))
+        results['check_solution'] = dict(time=time_function(lambda e: e.check_solution(),
+                                                            [(e,) for e in experiments], repeat))
+
+        # a scenario zip with the files, solved with the default solver
+        scenario = os.path.basename(os.path.normpath(directory))
+        if scenario.endswith('.zip'):
+            scenario = scenario[:-len('.zip')]
+        with zipfile.ZipFile(os.path.join(work_dir, scenario + '.zip'), 'w') as zip_obj:
+            for filename, content in contents.items():
+                zip_obj.writestr(filename, content)
+        batch_path = os.path.join(work_dir, 'default')
+        rb.solve_scenarios_and_zip([scenario + '.zip'], batch_path, 'default', path_in=work_dir,
+                                   stream_zip=True)
+        results['get_table'] = dict(time=time_function(rb.get_table, [(batch_path + '.zip',)], repeat))
+        shutil.rmtree(tools.batch_sibling(batch_path, '.summary'))
+        results['get_table_no_summary'] = \
+            dict(time=time_function(rb.get_table, [(batch_path + '.zip',)], repeat))
+    finally:
+        shutil.rmtree(work_dir)
+
+    if solver_names is None:
+        solver_names = list(solvers)
+    options = dict(timeLimit=time_limit, seed=seed, num_search_workers=1)
+    for solver_name in solver_names:
+        runs = [_solver_run(instance, solver_name, options) for instance in instances[:solver_files]]
+        times, objectives, errors = zip(*runs)
+        results['solve_' + solver_name] = \
+            dict(time=sum(times), objective=sum(o for o in objectives if o is not None),
+                 errors=sum(e for e in errors if e is not None),
+                 no_solution=sum(o is None for o in objectives))
+
+    settings = dict(directory=directory, files=len(filenames), solver_files=min(solver_files, len(filenames)),
+                    time_limit=time_limit, seed=seed, repeat=repeat, commit=_git_commit(),
+                    python=platform.python_version(), numpy=np.__version__, ortools=ortools.__version__,
+                    machine=platform.machine(), cpus=os.cpu_count())
+    return dict(settings=settings, results=results)
+
+
+def compare_benchmarks(base, new, threshold=0.1):
+    """
+    Compares two results of benchmark_suite (or the json files they were written to).
+
+    :param threshold: relative change of time above which a benchmark is flagged
+    :return: a DataFrame with one row per benchmark in both: times, ratio new / base,
+        whether it is a regression or an improvement and whether the objective changed
+    """
+    import pandas as pd
+    if isinstance(base, str):
+        base = tools.load_data(base)
+    if isinstance(new, str):
+        new = tools.load_data(new)
+    different = [k for k in ['directory', 'files', 'solver_files', 'time_limit', 'seed']
+                 if base['settings'].get(k) != new['settings'].get(k)]
+    if different:
+        warnings.warn('the benchmarks were run with different settings: {}'.format(', '.join(different)))
+    rows = []
+    for name, base_result in base['results'].items():
+        if name not in new['results']:
+            continue
+        new_result = new['results'][name]
+        ratio = new_result['time'] / base_result['time'] if base_result['time'] else None
+        change = ''
+        if ratio is not None and ratio > 1 + threshold:
+            change = 'slower'
+        elif ratio is not None and ratio < 1 - threshold:
+            change = 'faster'
+        rows.append(dict(name=name, base=base_result['time'], new=new_result['time'], ratio=ratio,
+                         change=change,
+                         objective_changed=base_result.get('objective') != new_result.get('objective')))
+    return pd.DataFrame(rows, columns=['name', 'base', 'new', 'ratio', 'change', 'objective_changed'])
+
+
+if __name__ == '__main__':
+    result = benchmark_parsers('data/c15.mm')
+    for k, v in result.items():
+        print('{}: {}'.format(k, v))
+    for benchmark in [benchmark_cp_preprocessing, benchmark_cp_formulations]:
+        result = benchmark('data/c15.mm')
+        for k, v in result.items():
+            print('{}: {}'.format(k, v))
@@ -0,0 +1,176 @@
+import multiprocessing
+import queue
+import threading
+import time
+import pandas as pd
+
+# kinds of events:
+# scheduled: instances of a scenario to solve (count), sent before solving them.
+#   With budget (seconds), the instances are solved with a budget and only finish at its end.
+# skipped: instances of a scenario scheduled before that are not solved (count),
+#   because they were solved in a previous run
+# started: a worker starts solving an instance (again, if it is solved several times)
+# incumbent: a solver finds a better solution (objective)
+# finished: an instance is solved and written (row, as in the summary table)
+# errored: same as finished, for an instance whose solver failed (error)
+KINDS = ['scheduled', 'skipped', 'started', 'incumbent', 'finished', 'errored']
+
+
+class EventSender(object):
+    """
+    Sends events of a batch run to the queue of a ProgressAggregator.
+    It can be sent to the workers: sending only puts the event in the queue.
+    """
+
+    def __init__(self, queue, scenario=None, name=None):
+        self.queue = queue
+        self.scenario = scenario
+        self.name = name
+
+    def for_instance(self, scenario, name=None):
+        """
+        :return: a sender for the events of an instance (or a scenario if name is None)
+        """
+        return EventSender(self.queue, scenario, name)
+
+    def emit(self, kind, **data):
+        self.queue.put(dict(kind=kind, scenario=self.scenario, name=self.name, time=time.time(), **data))
+
+
+class ProgressAggregator(object):
+    """
+    Consumes the events of a batch run in a thread of the main process, so neither the
+    workers nor the loop that writes the results wait for it. It keeps the summary
+    table of the instances finished so far (get_table) and the progress of the run
+    (get_progress), which is given to on_progress every interval seconds.
+
+    Use it as a context manager and give its sender to the batch runner, e.g.:
+        with ProgressAggregator(processes=True, on_progress=print) as aggregator:
+            solve_zip(..., events=aggregator.sender)
+    """
+
+    def __init__(self, processes=False, on_progress=None, interval=1):
+        """
+        :param processes: if True, the queue can be used by other processes (the workers)
+        :param on_progress: function that gets the progress
+        :param interval: seconds between calls to on_progress
+        """
+        self._manager = None
+        if processes:
+            self._manager = multiprocessing.Manager()
+            self.queue = self._manager.Queue()
+        else:
+            self.queue = queue.Queue()
+        self.sender = EventSender(self.queue)
+        self.on_progress = on_progress
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self.start_time = None
+        self.counts = {kind: 0 for kind in KINDS}
+        self.rows = {}
+        self.incumbents = {}
+        self.started = set()
+        self.budget = False
+
+    def start(self):
+        self.start_time = time.time()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """
+        Waits for the events sent until now and calls on_progress one last time.
+        """
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _run(self):
+        last = time.time()
+        while True:
+            try:
+                event = self.queue.get(timeout=self.interval)
+            except queue.Empty:
+                event = False
+            if event:
+                self.add(event)
+            if self.on_progress is not None and (event is None or time.time() - last >= self.interval):
+                self.on_progress(self.get_progress())
+                last = time.time()
+            if event is None:
+                return
+
+    def add(self, event):
+        kind = event['kind']
+        key = event['scenario'], event['name']
+        with self._lock:
+            if kind == 'started':
+                # instances are counted once, however many times they are solved
+                if key in self.started:
+                    return
+                self.started.add(key)
+            self.counts[kind] += event.get('count', 1)
+            if kind == 'scheduled' and event.get('budget') is not None:
+                self.budget = True
+            if kind == 'incumbent':
+                self.incumbents[key] = event['objective']
+            elif kind in ('finished', 'errored'):
+                self.rows[key] = event['row']
+
+    def get_table(self):
+        """
+        :return: the summary table of the instances finished so far (see run_batch.get_table)
+        """
+        with self._lock:
+            rows = list(self.rows.values())
+        return pd.DataFrame.from_records(rows)
+
+    def get_progress(self):
+        """
+        :return: dictionary with the number of instances scheduled (without the skipped ones),
+            started, finished (with errored) and with an incumbent, the time since the start,
+            instances finished per second, estimated seconds left (eta) and the mean gap of the
+            instances finished with one. There is no eta with a budget: instances only finish
+            at the end of the budget of their scenario.
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            gaps = [row['gap'] for row in self.rows.values() if row.get('gap') is not None]
+            with_incumbent = len(self.incumbents)
+            budget = self.budget
+        elapsed = time.time() - self.start_time
+        done = counts['finished'] + counts['errored']
+        scheduled = counts['scheduled'] - counts['skipped']
+        rate = done / elapsed if elapsed > 0 else 0
+        eta = None
+        if rate > 0 and not budget:
+            eta = max(scheduled - done, 0) / rate
+        mean_gap = sum(gaps) / len(gaps) if gaps else None
+        return dict(scheduled=scheduled, started=counts['started'], finished=done,
+                    errored=counts['errored'], with_incumbent=with_incumbent, elapsed=elapsed,
+                    rate=rate, eta=eta, mean_gap=mean_gap)
+
+
+def format_progress(progress):
+    """
+    :return: one line with the progress of ProgressAggregator.get_progress
+    """
+    line = '{finished}/{scheduled} finished ({errored} errors), {started} started, {rate:.2f} instances/s'.\
+        format(**progress)
+    if progress['eta'] is not None:
+        line += ', ETA {:.0f}s'.format(progress['eta'])
+    if progress['mean_gap'] is not None:
+        line += ', mean gap {:.2%}'.format(progress['mean_gap'])
+    return line
@@ -0,0 +1,91 @@
+import core.tools as tools
+import json
+import os
+
+SOLVED = 'solved'
+FAILED = 'failed'
+NO_SOLUTION = 'no_solution'
+
+
+class Manifest(object):
+    """
+    Keeps track of the experiments in a batch output so interrupted runs can be resumed.
+    It is stored next to the batch output (PATH/TO/BATCH.manifest.jsonl) with one json
+    line per experiment solved:
+    {key: scenario/instance, hash: ..., solver: ..., options: {...}, status: ...}
+    where hash is the hash of the .mm file. The last line of a key is the one that counts.
+    Lines are only appended, so an update costs the same however big the batch is.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if not os.path.exists(path):
+            return
+        lines = 0
+        broken = False
+        with open(path, 'r') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line of a run that was killed while writing it
+                    broken = True
+                    continue
+                self.entries[entry.pop('key')] = entry
+        if broken or lines > 2 * len(self.entries) + 100:
+            self._rewrite()
+
+    @classmethod
+    def for_batch(cls, path_to_dir):
+        manifest = cls(tools.batch_sibling(path_to_dir, '.manifest.jsonl'))
+        old_path = tools.batch_sibling(path_to_dir, '.manifest.json')
+        if not manifest.entries and os.path.exists(old_path):
+            # manifests written before, as one json object
+            manifest.entries = tools.load_data(old_path, 'json')
+            manifest._rewrite()
+        return manifest
+
+    @staticmethod
+    def _line(key, entry):
+        return json.dumps(dict(key=key, **entry), separators=(',', ':')) + '\n'
+
+    def _rewrite(self):
+        """
+        writes one line per entry, without the lines replaced by later ones
+        """
+        temp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(temp_path, 'w') as f:
+            f.writelines(self._line(key, entry) for key, entry in self.entries.items())
+        os.replace(temp_path, self.path)
+
+    def is_solved(self, key, content_hash, solver_name, options):
+        """
+        :return: True if the experiment was already solved with the same input, solver and options
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return False
+        return \
+            entry['status'] == SOLVED and \
+            entry['hash'] == content_hash and \
+            entry['solver'] == solver_name and \
+            entry['options'] == tools.copy_dict(options)
+
+    def update(self, key, content_hash, solver_name, options, status):
+        entry = dict(hash=content_hash, solver=solver_name, options=tools.copy_dict(options), status=status)
+        self.entries[key] = entry
+        with open(self.path, 'a') as f:
+            f.write(self._line(key, entry))
+
+
+def get_status(result):
+    """
+    :param result: the result of run_batch.solve_instance
+    """
+    if result['error'] is not None:
+        return FAILED
+    if result['output'] is None:
+        return NO_SOLUTION
+    return SOLVED
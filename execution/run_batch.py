@@ -1,63 +1,828 @@
-from core import Instance, Experiment, ZipBatch
+from core import Instance, Experiment, ZipBatch, InstanceCache, Solution
+from core import bounds
+from core.instance_cache import REFERENCE_FILE
+from core.results_store import ResultsStore
+from core.scenario_pack import PackedInstance, open_pack
+from core.spans import Spans
 import zipfile
 import os
-from solvers import get_solver
+from solvers import get_solver, CPModel1
+import cProfile
+import heapq
+import math
+import itertools
+import marshal
+import pandas as pd
 import shutil
+import signal
+import sys
+import warnings
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from timeit import default_timer as timer
 import core.tools as tools
+from execution.events import ProgressAggregator, format_progress
+from execution.manifest import Manifest, get_status
+from execution.writers import DirectoryWriter, ZipWriter
 
 
-def solve_zip(zip_name, path_out, path_in='data/', solver_name='default', test=False, instances=None):
-    if not os.path.exists(path_out):
-        os.mkdir(path_out)
-    batch_out_path = os.path.join(path_out, os.path.splitext(zip_name)[0])
+status_conv = {4: "Optimal", 2: "Feasible", 3: "Infeasible", 0: "Unknown"}
+# extra seconds given to a solver after the timeout before interrupting it
+TIMEOUT_GRACE = 1
+# share of the budget for the first pass over all instances, see solve_zip_budget
+FIRST_PASS_SHARE = 0.2
 
-    # we recreate the whole batch output file
-    # if os.path.exists(batch_out_path):
-    #     shutil.rmtree(batch_out_path)
-    if not os.path.exists(batch_out_path):
-        os.mkdir(batch_out_path)
 
+@contextmanager
+def time_limit(seconds):
+    """
+    Raises a TimeoutError inside the block if it runs for more than seconds.
+    Only available where SIGALRM exists; elsewhere it does nothing.
+    The signal is only handled between Python bytecodes: it cannot stop native code
+    (e.g. the search of CP-SAT) or work done in other processes, which must stop
+    by themselves (e.g. with their timeLimit).
+    """
+    if seconds is None or not hasattr(signal, 'SIGALRM'):
+        yield
+        return
+
+    def handler(signum, frame):
+        raise TimeoutError('time limit of {} seconds reached'.format(seconds))
+
+    previous = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def failed_result(solver_name, error):
+    """
+    :param error: the exception (or message) that stopped the instance
+    :return: a result as in solve_instance for an instance that could not be solved,
+        e.g. because its file could not be parsed or the worker solving it crashed.
+    """
+    if isinstance(error, BaseException):
+        error = '{}: {}'.format(type(error).__name__, error)
+    log = dict(time=0, solver=solver_name, status=status_conv[0], lower_bound=None, gap=None)
+    summary = dict(objective=None, errors=None, jobs=None, modes=None, resources=None, reduced_modes=None)
+    return dict(options=log, input=None, output=None, error=error, summary=summary, log=None)
+
+
+def solve_instance(content, solver_name, options, timeout=None, profile=False, instance_cache=None,
+                   content_hash=None, bound_time=None, solution=None, events=None):
+    """
+    Solves one instance from the raw content of its .mm file
+    or from a scenario pack (a PackedInstance, see core.scenario_pack).
+    It runs inside the worker processes when solving in parallel so it
+    only takes and returns picklable objects. It never raises: if any step fails
+    (parsing, bounds, solving...), the result has the error (see failed_result).
+
+    Unless options['reduce_modes'] is False, the solver gets the instance without the modes
+    that cannot be feasible or are dominated (see Instance.get_reduced), also kept in the
+    instance cache if there is one.
+
+    The options of the experiment get the time spent in each phase (see core.spans):
+    time_parse, time_bound, time_reduce, time_check and time_serialize here, the spans of the solver
+    (e.g. time_build and time_search) and time_total.
+
+    Before solving, the lower bounds of the instance are computed (see core.bounds), only once
+    per instance with an instance cache (see InstanceCache.get_bounds). If options has a
+    lower_bound and there is no bound_time, it is a bound already computed for the instance
+    (e.g. in a previous run) and it is used instead. The solver gets the best bound in
+    options['lower_bound'] to stop early and the options of the experiment get lower_bound
+    and the gap of the solution. A feasible solution with the makespan of the bound is Optimal,
+    whatever the solver says. The time of the experiment is the time of the solver plus
+    the time spent in the bounds (time_bound).
+
+    :param timeout: if given, a TimeoutError is raised in the solver TIMEOUT_GRACE seconds
+        after it (see time_limit). It only stops solvers while they run Python code,
+        so solvers must also get it as their timeLimit.
+    :param profile: if True, the run is profiled and the result has the cProfile stats
+        (marshalled, as in the files pstats reads) in profile.
+    :param instance_cache: path to an InstanceCache. If given, the instance is taken from
+        (or added to) the cache and the result has a reference to it in input_ref
+        instead of the instance in input.
+    :param content_hash: hash of content, if already known
+    :param bound_time: if given, seconds of a CP-SAT run to improve the lower bound
+        (see core.bounds.cp_bound), with the num_search_workers of options if there are.
+        The run is not stopped by the timeout but its time is counted in the time of the experiment.
+    :param solution: a solution to start from (as in the output of a result):
+        the hint of CPModel1 and an individual of the first population of GeneticAlgorithm.
+        Algorithm does not use it.
+    :param events: an EventSender for the instance (see execution.events), to send when it
+        starts and the incumbents of the solver (with its option on_solution).
+    :return: dictionary with the options, input (or input_ref), output, error and solver log
+        of the experiment.
+    """
+    total_start = timer()
+    if events is not None:
+        events.emit('started')
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        result = _solve_instance(content, solver_name, options, timeout, instance_cache, content_hash,
+                                 bound_time, solution, events)
+    except Exception as e:
+        result = failed_result(solver_name, e)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    result['options']['time_total'] = timer() - total_start
+    if profiler is not None:
+        profiler.create_stats()
+        result['profile'] = marshal.dumps(profiler.stats)
+    return result
+
+
+def _solve_instance(content, solver_name, options, timeout, instance_cache, content_hash, bound_time,
+                    solution, events):
+    spans = Spans()
+    cache = None
+    with spans('parse'):
+        if isinstance(content, PackedInstance):
+            inst = content.load()
+            if instance_cache is not None:
+                cache = InstanceCache(instance_cache)
+                if content_hash is None:
+                    content_hash = open_pack(content.path).get_hash(content.name)
+                if content_hash not in cache:
+                    cache.put(content_hash, inst)
+        elif instance_cache is None:
+            inst = Instance.from_mm(path=None, content=content)
+        else:
+            cache = InstanceCache(instance_cache)
+            if content_hash is None:
+                content_hash = tools.hash_content(content)
+            inst = cache.from_mm(content, content_hash)
+    lower_bound = options.get('lower_bound')
+    # the CP-SAT run of the bound gets the threads of the solver (see cpu_budget), if any
+    threads = options.get(CPModel1.threads_option)
+    cp_options = None if threads is None else {CPModel1.threads_option: threads}
+    with spans('bound'):
+        if cache is not None:
+            instance_bounds = cache.get_bounds(content_hash, inst, bound_time, cp_options)
+            lower_bound = max(lower_bound or 0, instance_bounds['lower_bound'])
+        elif lower_bound is None or bound_time:
+            instance_bounds = bounds.lower_bounds(inst, cp_time=bound_time, cp_options=cp_options)
+            lower_bound = max(lower_bound or 0, instance_bounds['lower_bound'])
+    with spans('reduce'):
+        reduced = inst
+        if options.get('reduce_modes', True):
+            if cache is None:
+                reduced = inst.get_reduced()
+            else:
+                reduced = cache.get_reduced(content_hash, inst)
+    solver = get_solver(solver_name)
+    if solution is None:
+        algo = solver(reduced)
+    else:
+        algo = solver(reduced, Solution.from_dict(solution))
+    error = None
+    if timeout is not None:
+        timeout += TIMEOUT_GRACE
+    solver_options = dict(options, lower_bound=lower_bound)
+    if events is not None:
+        solver_options['on_solution'] = \
+            lambda objective, seconds: events.emit('incumbent', objective=objective, seconds=seconds)
+    start = timer()
+    try:
+        with time_limit(timeout):
+            status = algo.solve(solver_options)
+    except Exception as e:
+        status = 0
+        error = str(e)
+
+    log = dict(time=timer() - start + spans.times['bound'], solver=solver_name,
+               status=status_conv.get(status, "Unknown"))
+    arrays = inst.arrays
+    summary = dict(objective=None, errors=None, jobs=arrays.num_jobs,
+                   modes=int(arrays.num_modes.sum()), resources=arrays.num_resources,
+                   reduced_modes=int(reduced.arrays.mode_mask.sum()))
+    output = None
+    with spans('check'):
+        if algo.solution is not None:
+            summary['objective'] = algo.get_objective()
+            summary['errors'] = len(algo.check_solution())
+    # the bound the solver proves, if it does
+    best_bound = getattr(algo, 'best_bound', None)
+    if best_bound is not None:
+        lower_bound = max(lower_bound, int(math.ceil(best_bound - 1e-6)))
+    log['lower_bound'] = lower_bound
+    log['gap'] = None
+    if summary['errors'] == 0:
+        log['gap'] = bounds.get_gap(summary['objective'], lower_bound)
+        if log['gap'] == 0:
+            log['status'] = status_conv[4]
+    with spans('serialize'):
+        if algo.solution is not None:
+            output = algo.solution.to_dict()
+        input_data = None
+        if cache is None:
+            input_data = inst.to_dict()
+    spans.update(algo.spans)
+    log.update(spans.to_dict())
+    result = dict(options=log, input=input_data, output=output, error=error, summary=summary,
+                  log=getattr(algo, 'log', None))
+    if cache is not None:
+        result['input_ref'] = cache.reference(content_hash)
+    return result
+
+
+def summary_row(scenario, filename, result):
+    """
+    :return: the row of the experiment in the ResultsStore
+    """
+    return dict(scenario=scenario, name=filename, **result['options'], **result['summary'])
+
+
+class SlowestProfiles(object):
+    """
+    Keeps the cProfile stats of the slowest experiments (by time_total) and writes
+    them in path/scenario/instance.prof, to read with pstats.Stats.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._heap = []
+
+    def add(self, name, result):
+        if 'profile' not in result or self.size <= 0:
+            return
+        item = (result['options']['time_total'], name, result['profile'])
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heappushpop(self._heap, item)
+
+    def close(self):
+        """
+        :return: the names of the experiments written, slowest first
+        """
+        names = []
+        for seconds, name, stats in sorted(self._heap, reverse=True):
+            path = os.path.join(self.path, name + '.prof')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(stats)
+            names.append(name)
+        self._heap = []
+        return names
+
+
+class WorkerPool(object):
+    """
+    Process pool to solve instances that survives the death of a worker (e.g. killed
+    for using too much memory or a crash in native code). Then ProcessPoolExecutor
+    is broken and fails all its tasks, so the pool is replaced. The tasks that may have
+    been running are solved again one at a time, so only the ones that crash again fail,
+    and the rest of the tasks go to the new pool as usual.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def _restart(self):
+        self.executor.shutdown(wait=False)
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def _submit(self, func, task):
+        try:
+            return self.executor.submit(func, task)
+        except BrokenProcessPool as e:
+            # a worker died before all the tasks were submitted
+            future = Future()
+            future.set_exception(e)
+            return future
+
+    def _run_alone(self, func, task, on_crash):
+        try:
+            return self._submit(func, task).result()
+        except BrokenProcessPool as e:
+            self._restart()
+            return on_crash(task, e)
+
+    def map(self, func, tasks, on_crash):
+        """
+        :param on_crash: function that gets a task and the exception and returns
+            its result when the task crashes its worker
+        :return: generator with the result of each task, in order
+        """
+        futures = [self._submit(func, task) for task in tasks]
+        for pos, future in enumerate(futures):
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                break
+        else:
+            return
+        self._restart()
+        left = list(zip(tasks[pos:], futures[pos:]))
+        failed = [i for i, (_, future) in enumerate(left) if future.exception() is not None]
+        # tasks start in order, so the ones running when the worker died are among the
+        # first that failed: one per worker and one more waiting in the queue of the pool
+        suspects = set(failed[:self.workers + 1])
+        others = self.map(func, [left[i][0] for i in failed[self.workers + 1:]], on_crash)
+        for i, (task, future) in enumerate(left):
+            if future.exception() is None:
+                yield future.result()
+            elif i in suspects:
+                yield self._run_alone(func, task, on_crash)
+            else:
+                yield next(others)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+def _crashed_task(task, error):
+    # task: the arguments of solve_many
+    contents, solver_name = task[:2]
+    return [failed_result(solver_name, 'the worker solving the instance crashed ({})'.format(error))
+            for _ in contents]
+
+
+def _run_tasks(executor, tasks):
+    """
+    :param executor: a WorkerPool or None to solve them in this process
+    :param tasks: arguments of solve_many
+    :return: iterator with the results of each task, in order
+    """
+    if executor is None:
+        return map(_solve_many_args, tasks)
+    return executor.map(_solve_many_args, tasks, _crashed_task)
+
+
+def cpu_budget(workers, options, solver_name, cores=None):
+    """
+    Makes sure that instances solved in parallel times the threads of each solver
+    (options['num_search_workers']) are not more than the cores of the machine.
+    If the solver threads are not given, each solver gets an equal share of the cores.
+    If they are, there are fewer workers.
+    Only solvers whose search uses threads (with threads_option, e.g. CPModel1)
+    are taken into account, the options of the rest are not changed.
+
+    :param cores: number of cores, by default all the cores of the machine
+    :return: the workers and the options to use
+    """
+    option = getattr(get_solver(solver_name), 'threads_option', None)
+    if option is None:
+        return workers, options
+    if cores is None:
+        cores = os.cpu_count() or 1
+    threads = options.get(option)
+    if threads is None:
+        if workers > 1:
+            options = dict(options, **{option: max(1, cores // workers)})
+        return workers, options
+    if workers > 1 and workers * threads > cores:
+        new_workers = max(1, cores // threads)
+        warnings.warn('{} workers with {} solver threads each do not fit in {} cores, using {} workers'.
+                      format(workers, threads, cores, new_workers))
+        workers = new_workers
+    return workers, options
+
+
+def solve_many(contents, solver_name, options, timeout=None, profile=False, instance_cache=None,
+               content_hashes=None, bound_time=None, solutions=None, events=None):
+    """
+    Solves several instances one after the other in this process. With many small instances,
+    a worker gets them in one task instead of one task per instance (see solve_zip).
+    Each result has the times of its own instance (e.g. time_build and time_search).
+
+    :param contents: list of contents of .mm files or PackedInstances
+    :param content_hashes: hash of each content, if already known
+    :param solutions: solution to start from for each instance (or None)
+    :param events: EventSender of each instance (or None)
+    :return: list with the result of solve_instance for each instance
+    """
+    if content_hashes is None:
+        content_hashes = [None] * len(contents)
+    if solutions is None:
+        solutions = [None] * len(contents)
+    if events is None:
+        events = [None] * len(contents)
+    return [solve_instance(content, solver_name, options, timeout, profile, instance_cache, content_hash, bound_time,
+                           solution, instance_events)
+            for content, content_hash, solution, instance_events in zip(contents, content_hashes, solutions, events)]
+
+
+def _solve_many_args(args):
+    return solve_many(*args)
+
+
+def _instance_events(events, scenario, filenames, skipped=None, budget=None):
+    """
+    Sends the scheduled event of the scenario or, if it was scheduled before
+    (see solve_scenarios_and_zip), the number of instances skipped.
+
+    :param filenames: the instances to solve
+    :param skipped: if given, the scenario was scheduled and these instances are not solved
+    :param budget: seconds of the scenario, in budget mode
+    :return: the EventSender of each instance (or None if there are no events)
+    """
+    if events is None:
+        return {filename: None for filename in filenames}
+    scenario_events = events.for_instance(scenario)
+    if skipped is None:
+        scenario_events.emit('scheduled', count=len(filenames), budget=budget)
+    elif skipped:
+        scenario_events.emit('skipped', count=skipped)
+    return {filename: events.for_instance(scenario, filename) for filename in filenames}
+
+
+def _emit_result(events, row, result):
+    if events is None:
+        return
+    if result['error'] is not None:
+        events.emit('errored', row=row, error=result['error'])
+    else:
+        events.emit('finished', row=row)
+
+
+def scenario_names(zip_name, path_in='data/', test=False, instances=None):
+    """
+    :return: the names of the instances read_scenario reads, without reading them
+    """
+    if instances is not None:
+        return list(instances)
     path = os.path.join(path_in, zip_name)
-    zip_obj = zipfile.ZipFile(path)
-    all_files = zip_obj.namelist()
+    if zip_name.endswith('.pack'):
+        all_files = list(open_pack(path).names)
+    else:
+        with zipfile.ZipFile(path) as zip_obj:
+            all_files = zip_obj.namelist()
     if test:
         all_files = all_files[:3]
-    if instances is not None:
-        all_files = instances
-    solver = get_solver(solver_name)
-    # for each file:
-    for filename in all_files:
-    # filename = all_files[0]
-        experiment_dir = os.path.join(batch_out_path, filename)
-        if os.path.exists(experiment_dir):
-            shutil.rmtree(experiment_dir)
-        os.mkdir(experiment_dir)
-        data = zip_obj.read(filename)
-        inst = Instance.from_mm(path=None, content=data.decode().splitlines(True))
-        algo = solver(inst)
-        start = timer()
-        try:
-            status = algo.solve({})
-        except Exception as e:
-            status = 0
-            with open(os.path.join(experiment_dir, 'error.txt'), 'w') as f:
-                f.write(str(e))
-
-        # export everything:
-        status_conv = {4: "Optimal", 2: "Feasible", 3: "Infeasible", 0: "Unknown"}
-        log = dict(time=timer() - start, solver=solver_name, status=status_conv.get(status, "Unknown"))
-        tools.write_json(log, os.path.join(experiment_dir, 'options.json'))
-        inst.to_json(os.path.join(experiment_dir, 'input.json'))
-        if algo.solution is not None:
-            algo.solution.to_json(os.path.join(experiment_dir, 'output.json'))
+    return all_files
+
+
+def read_scenario(zip_name, path_in='data/', test=False, instances=None):
+    """
+    :param zip_name: zip of .mm files or scenario pack (see core.scenario_pack) inside path_in
+    :param test: if True, only the first 3 instances
+    :param instances: if given, the names of the instances to read
+    :return: the names of the instances, their contents (or PackedInstances) and their hashes
+    """
+    path = os.path.join(path_in, zip_name)
+    all_files = scenario_names(zip_name, path_in, test, instances)
+    if zip_name.endswith('.pack'):
+        # workers open the pack themselves and only get the name of the instance
+        pack = open_pack(path)
+        contents = {filename: PackedInstance(pack.path, filename) for filename in all_files}
+        hashes = {filename: pack.get_hash(filename) for filename in all_files}
+        return all_files, contents, hashes
+    with zipfile.ZipFile(path) as zip_obj:
+        contents = {filename: zip_obj.read(filename) for filename in all_files}
+    hashes = {filename: tools.hash_content(content) for filename, content in contents.items()}
+    return all_files, contents, hashes
+
+
+def solve_zip(zip_name, path_out, path_in='data/', solver_name='default', test=False, instances=None,
+              workers=1, timeout=None, executor=None, force=False, writer=None, store=None, options=None,
+              profiles=None, instance_cache=None, bound_time=None, chunk_size=1, events=None,
+              solver_options=None, scheduled=False):
+    """
+    Solves the instances inside a zip of .mm files (or a scenario pack, see core.scenario_pack)
+    and writes one experiment per instance.
+    Instances already solved with the same content, solver and options are skipped
+    (see execution.manifest).
+
+    :param workers: number of processes to solve instances in parallel.
+    :param timeout: time limit in seconds for each instance.
+        Solvers get it as timeLimit, see solve_instance.
+    :param executor: optionally, an existing WorkerPool (with workers processes)
+        to use instead of creating one.
+    :param force: if True, solves all instances again.
+    :param writer: where to write the experiments (see execution.writers).
+        By default, a directory per experiment inside path_out.
+    :param store: ResultsStore where the summary of each experiment is added.
+        By default, the one next to path_out.
+    :param options: options for the solver, see cpu_budget for num_search_workers.
+    :param profiles: if given, a SlowestProfiles where the profiles of all runs are added.
+    :param instance_cache: if given, path to the InstanceCache to use (see solve_instance).
+    :param bound_time: if given, seconds of CP-SAT to improve the lower bound of each
+        instance (see solve_instance).
+    :param chunk_size: number of instances each task solves (see solve_many).
+    :param events: if given, an EventSender for the events of the run (see execution.events).
+    :param solver_options: options as the solver gets them, when the caller already applied
+        cpu_budget to workers and options. By default, it is applied here.
+    :param scheduled: if True, the caller already sent the scheduled event of the scenario
+        with all its instances (see scenario_names) and only the skipped ones are sent here.
+    """
+    scenario = os.path.splitext(zip_name)[0]
+    own_writer = writer is None
+    if own_writer:
+        writer = DirectoryWriter(path_out)
+    own_store = store is None
+    if own_store:
+        store = ResultsStore.for_batch(path_out)
+    manifest = Manifest.for_batch(path_out)
+    options = dict(options or {})
+    # the manifest compares the options given, not the threads that come from the budget
+    if solver_options is None:
+        workers, solver_options = cpu_budget(workers, options, solver_name)
+    if timeout is not None:
+        options['timeLimit'] = timeout
+        solver_options = dict(solver_options, timeLimit=timeout)
+    if bound_time:
+        # the bound is in the results so it is solved again if it changes
+        options['bound_time'] = bound_time
+
+    all_files, contents, hashes = read_scenario(zip_name, path_in, test, instances)
+    key = lambda filename: scenario + '/' + filename
+
+    def is_solved(filename):
+        return \
+            writer.has_experiment(key(filename)) and \
+            manifest.is_solved(key(filename), hashes[filename], solver_name, options)
+
+    num_files = len(all_files)
+    if not force:
+        all_files = [filename for filename in all_files if not is_solved(filename)]
+    instance_events = _instance_events(events, scenario, all_files, num_files - len(all_files) if scheduled else None)
+    # workers get the content of the file (or where it is in the pack), not the zip
+    profile = profiles is not None
+    chunks = [all_files[pos:pos + chunk_size] for pos in range(0, len(all_files), chunk_size)]
+    tasks = [([contents[f] for f in chunk], solver_name, solver_options, timeout, profile, instance_cache,
+              [hashes[f] for f in chunk], bound_time, None, [instance_events[f] for f in chunk])
+             for chunk in chunks]
+
+    own_executor = executor is None and workers > 1
+    if own_executor:
+        executor = WorkerPool(workers)
+    try:
+        results = itertools.chain.from_iterable(_run_tasks(executor, tasks))
+        # results come in the same order as the files, whatever the number of workers
+        for filename, result in zip(all_files, results):
+            spans = Spans()
+            with spans('write'):
+                writer.write_experiment(key(filename), result)
+            row = dict(summary_row(scenario, filename, result), **spans.to_dict())
+            store.append(row)
+            if profiles is not None:
+                profiles.add(key(filename), result)
+            manifest.update(key(filename), hashes[filename], solver_name, options, get_status(result))
+            _emit_result(instance_events[filename], row, result)
+    finally:
+        if own_executor:
+            executor.shutdown()
+        if own_writer:
+            writer.close()
+        if own_store:
+            store.close()
+        else:
+            store.flush()
+
+
+def _is_better(result, other):
+    """
+    :return: True if the solution of result is better than the one of other:
+        feasible first, then shorter.
+    """
+    key = lambda r: (r['summary']['errors'] != 0, r['summary']['objective'] is None, r['summary']['objective'] or 0)
+    return key(result) < key(other)
+
+
+def solve_zip_budget(zip_name, path_out, budget, path_in='data/', solver_name='ortools', test=False,
+                     instances=None, workers=1, first_time=None, min_time=0.1, executor=None, force=False,
+                     writer=None, store=None, options=None, instance_cache=None, bound_time=None, events=None,
+                     solver_options=None, scheduled=False):
+    """
+    Solves the instances of a scenario with a total budget of wall-clock seconds,
+    instead of the same time for each one (see solve_zip).
 
+    First, every instance is solved with first_time seconds, workers at a time, while there
+    is time: the instances the first pass does not get to are written as failed. Then, while there is time,
+    the instances that are still open are solved again in rounds, workers at a time and
+    the largest gap first (the ones without a feasible solution before), from their best
+    solution (see solve_instance) and with twice the time of their last run, never more than
+    the time left without TIMEOUT_GRACE and the longest overhead of a run (parsing, bounds...).
+    An instance is closed when its gap is 0 or when the solver stops before half its time
+    without improving it: more time would not help.
+    Only the best result of each instance is written, with the number of runs (runs), the
+    time of all of them (time_runs) and the best lower bound found in its options.
 
-def solve_scenarios_and_zip(scenarios, path_to_dir, solver_name, zip=False, **kwargs):
+    :param budget: seconds for the whole scenario
+    :param first_time: seconds of each instance in the first pass. By default, a fifth of the
+        budget is shared among the instances (with min_time at least). It is never more than
+        an equal share of the budget (without TIMEOUT_GRACE), so every instance gets its run.
+    :param min_time: shortest run, the first pass and the loop end when there is less time left
+    Other parameters as in solve_zip. Instances send started events on each run but only
+    send finished events at the end, when their best result is written, so the scheduled
+    event has the budget (see execution.events).
+    """
+    start = timer()
+    scenario = os.path.splitext(zip_name)[0]
+    own_writer = writer is None
+    if own_writer:
+        writer = DirectoryWriter(path_out)
+    own_store = store is None
+    if own_store:
+        store = ResultsStore.for_batch(path_out)
+    manifest = Manifest.for_batch(path_out)
+    options = dict(options or {})
+    if solver_options is None:
+        workers, solver_options = cpu_budget(workers, options, solver_name)
+    # the results depend on the budget
+    options['budget'] = budget
+    if bound_time:
+        options['bound_time'] = bound_time
+
+    all_files, contents, hashes = read_scenario(zip_name, path_in, test, instances)
+    key = lambda filename: scenario + '/' + filename
+    num_files = len(all_files)
+    if not force:
+        all_files = [filename for filename in all_files
+                     if not (writer.has_experiment(key(filename)) and
+                             manifest.is_solved(key(filename), hashes[filename], solver_name, options))]
+    instance_events = _instance_events(events, scenario, all_files, num_files - len(all_files) if scheduled else None,
+                                       budget)
+    num_runs = max(len(all_files), 1)
+    if first_time is None:
+        first_time = max(budget * FIRST_PASS_SHARE * workers / num_runs, min_time)
+    first_time = min(first_time, max(budget - TIMEOUT_GRACE, 0) * workers / num_runs)
+
+    best = {}
+    runs = {filename: 0 for filename in all_files}
+    time_runs = {filename: 0 for filename in all_files}
+    last_time = {}
+    is_open = {}
+    # longest time of a run outside the solver (parsing, bounds, checks...)
+    overhead = [0]
+
+    def run(filenames, times, bound):
+        tasks = [([contents[f]], solver_name, dict(solver_options, timeLimit=t, lower_bound=best_bound(f)), t,
+                  False, instance_cache, [hashes[f]], bound, [get_output(f)], [instance_events[f]])
+                 for f, t in zip(filenames, times)]
+        results = _run_tasks(executor, tasks)
+        for filename, time_given, (result, ) in zip(filenames, times, results):
+            update(filename, time_given, result)
+
+    def best_bound(filename):
+        if filename not in best:
+            return None
+        return best[filename]['options']['lower_bound']
+
+    def get_output(filename):
+        if filename not in best:
+            return None
+        return best[filename]['output']
+
+    def update(filename, time_given, result):
+        overhead[0] = max(overhead[0], result['options']['time_total'] - result['options']['time'])
+        runs[filename] += 1
+        time_runs[filename] += result['options']['time']
+        last_time[filename] = time_given
+        previous = best.get(filename)
+        improved = previous is None or _is_better(result, previous)
+        lower_bound = max((v for v in [result['options']['lower_bound'], best_bound(filename)] if v is not None),
+                          default=None)
+        if improved:
+            best[filename] = result
+        log = best[filename]['options']
+        log['lower_bound'] = lower_bound
+        if best[filename]['summary']['errors'] == 0:
+            log['gap'] = bounds.get_gap(best[filename]['summary']['objective'], lower_bound)
+            if log['gap'] == 0:
+                log['status'] = status_conv[4]
+        # solvers that end early without improving will not do better with more time
+        gave_up = not improved and result['options']['time'] < time_given / 2
+        is_open[filename] = log['gap'] != 0 and not gave_up
+
+    def priority(filename):
+        gap = best[filename]['options']['gap']
+        return float('inf') if gap is None else gap
+
+    own_executor = executor is None and workers > 1
+    if own_executor:
+        executor = WorkerPool(workers)
+    try:
+        def time_left():
+            # a run can last up to TIMEOUT_GRACE more than its time and it has some overhead
+            return budget - (timer() - start) - TIMEOUT_GRACE - overhead[0]
+
+        remaining = time_left()
+        for pos in range(0, len(all_files), workers):
+            if remaining < min(min_time, first_time):
+                break
+            chosen = all_files[pos:pos + workers]
+            run(chosen, [min(first_time, remaining)] * len(chosen), bound_time)
+            remaining = time_left()
+
+        while remaining >= min_time:
+            # one round: every open instance, workers at a time
+            candidates = sorted((f for f in all_files if is_open.get(f)), key=priority, reverse=True)
+            if not candidates:
+                break
+            for pos in range(0, len(candidates), workers):
+                chosen = candidates[pos:pos + workers]
+                run(chosen, [min(2 * last_time[f], remaining) for f in chosen], None)
+                remaining = time_left()
+                if remaining < min_time:
+                    break
+
+        for filename in all_files:
+            result = best.get(filename)
+            if result is None:
+                result = failed_result(solver_name, 'the budget was spent before solving the instance')
+            result['options'].update(runs=runs[filename], time_runs=time_runs[filename])
+            spans = Spans()
+            with spans('write'):
+                writer.write_experiment(key(filename), result)
+            row = dict(summary_row(scenario, filename, result), **spans.to_dict())
+            store.append(row)
+            manifest.update(key(filename), hashes[filename], solver_name, options, get_status(result))
+            _emit_result(instance_events[filename], row, result)
+    finally:
+        if own_executor:
+            executor.shutdown()
+        if own_writer:
+            writer.close()
+        if own_store:
+            store.close()
+        else:
+            store.flush()
+
+
+def solve_scenarios_and_zip(scenarios, path_to_dir, solver_name, zip=False, workers=1,
+                            stream_zip=False, compact=False, summary_format='parquet', profile=0, budget=None,
+                            progress=False, **kwargs):
+    """
+    Solves all instances in several scenarios.
+
+    :param zip: if True, zips the result directory at the end.
+    :param stream_zip: if True, writes the results straight into path_to_dir.zip
+        and no directory is created.
+    :param compact: if True, json files are written without indentation.
+    :param summary_format: parquet or feather, for the summary in path_to_dir.summary
+    :param profile: number of slowest experiments whose cProfile stats are written
+        in path_to_dir.profile (see SlowestProfiles)
+    :param budget: if given, seconds for each scenario, shared among its instances
+        (see solve_zip_budget). Then timeout, chunk_size and profile are not used.
+    :param progress: if True, the progress of the run (see execution.events) is printed
+        to stderr every second. All scenarios are scheduled before solving the first one.
+    """
+    if budget is not None:
+        profile = 0
+        kwargs.pop('timeout', None)
+        kwargs.pop('chunk_size', None)
+    # once for all scenarios
+    workers, solver_options = cpu_budget(workers, kwargs.get('options') or {}, solver_name)
+    store = ResultsStore.for_batch(path_to_dir, file_format=summary_format)
     zipfile_name = path_to_dir + '.zip'
-    for scenario in scenarios:
-        solve_zip(scenario, path_to_dir + '/', solver_name=solver_name, **kwargs)
-    if not zip:
+    indent = None if compact else 4
+    if stream_zip:
+        writer = ZipWriter(zipfile_name, base_dir=os.path.basename(path_to_dir), indent=indent)
+    else:
+        writer = DirectoryWriter(path_to_dir, indent=indent)
+    profiles = None
+    if profile:
+        profiles = SlowestProfiles(tools.batch_sibling(path_to_dir, '.profile'), profile)
+    # one pool for all scenarios, so workers do not wait for the end of each scenario
+    executor = None
+    if workers > 1:
+        executor = WorkerPool(workers)
+    aggregator = None
+    if progress:
+        on_progress = lambda values: print(format_progress(values), file=sys.stderr, flush=True)
+        aggregator = ProgressAggregator(processes=executor is not None, on_progress=on_progress).start()
+        kwargs['events'] = aggregator.sender
+        kwargs['scheduled'] = True
+    try:
+        if aggregator is not None:
+            # so the progress has all the instances from the start
+            for scenario in scenarios:
+                names = scenario_names(scenario, kwargs.get('path_in', 'data/'), kwargs.get('test', False),
+                                       kwargs.get('instances'))
+                scenario_events = aggregator.sender.for_instance(os.path.splitext(scenario)[0])
+                scenario_events.emit('scheduled', count=len(names), budget=budget)
+        for scenario in scenarios:
+            if budget is not None:
+                solve_zip_budget(scenario, path_to_dir + '/', budget, solver_name=solver_name, workers=workers,
+                                 executor=executor, writer=writer, store=store, solver_options=solver_options,
+                                 **kwargs)
+                continue
+            solve_zip(scenario, path_to_dir + '/', solver_name=solver_name, workers=workers,
+                      executor=executor, writer=writer, store=store, profiles=profiles,
+                      solver_options=solver_options, **kwargs)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if aggregator is not None:
+            aggregator.close()
+        writer.close()
+        store.close()
+        if profiles is not None:
+            profiles.close()
+    if not zip or stream_zip:
         return
     root_dir = 'data'
     base_dir = solver_name
@@ -67,17 +832,79 @@ def solve_scenarios_and_zip(scenarios, path_to_dir, solver_name, zip=False, **kw
     # shutil.rmtree(path_to_dir)
 
 
-def get_table(zipfile_name):
-    batch = ZipBatch(zipfile_name)
-    objs = batch.get_objective_function()
-    opts = batch.get_options()
-    errors = batch.get_errors().vapply(lambda v: dict(errors=v))
-    opts.update(errors)
-    opts_df = batch.format_df(opts).drop(['instance'], axis=1)
-    table = batch.format_df(objs).rename(columns={0: 'objective'}).drop(['instance'], axis=1)
-    result = \
-        table.merge(opts_df, on=['scenario', 'name'], how='left')
-    return result
+TABLE_COLUMNS = ['scenario', 'name', 'objective', 'solver', 'status', 'time', 'errors', 'lower_bound', 'gap']
+# columns of the summary that are not in options.json (see summary_row)
+SUMMARY_COLUMNS = ['jobs', 'modes', 'resources', 'reduced_modes', 'time_write']
+
+
+def get_table(zipfile_name, cache_size=100):
+    """
+    Uses the summary written while solving if it has the same experiments as the zip
+    (see _summary_matches). If not (there is none, the run was interrupted or experiments
+    were added to the zip in another way), it reads all the experiments in the zip.
+    Both give the same columns: TABLE_COLUMNS, SUMMARY_COLUMNS and then the rest
+    of the options of the experiments, sorted.
+
+    :param cache_size: maximum number of experiments in memory at the same time
+    """
+    batch = ZipBatch(zipfile_name, cache_size=cache_size)
+    try:
+        summary = batch.get_summary()
+        if summary is not None and _summary_matches(summary, batch):
+            table = summary
+        else:
+            table = _read_table(batch)
+    finally:
+        batch.close()
+    first = TABLE_COLUMNS + SUMMARY_COLUMNS
+    return table.reindex(columns=first + sorted(c for c in table.columns if c not in first))
+
+
+# options of an experiment that change every time it is solved
+SUMMARY_CHECK = ['time', 'time_total']
+
+
+def _summary_matches(summary, batch):
+    """
+    :return: True if the summary has one row per experiment in the zip, from the same run.
+        A run solving experiments again (e.g. with force) that is killed leaves the rows
+        of the previous run in the summary for the experiments it already replaced,
+        so the times of each row are compared with the options.json of the experiment.
+    """
+    if set(zip(summary['scenario'], summary['name'])) != set(batch.get_instances_paths().keys()):
+        return False
+    options = batch.get_options()
+    for row in summary.to_dict('records'):
+        experiment = options.get((row['scenario'], row['name']), {})
+        for column in SUMMARY_CHECK:
+            value = row.get(column)
+            if pd.isna(value):
+                value = None
+            if value != experiment.get(column):
+                return False
+    return True
+
+
+def _read_table(batch):
+    """
+    :return: the rows of get_table, from the experiments in the zip of the batch.
+        Columns only the summary knows (e.g. time_write) are empty.
+    """
+    names = set(batch.zipobj.namelist())
+    has_input = lambda path: path + '/input.json' in names or path + '/' + REFERENCE_FILE in names
+    options = batch.get_options()
+    rows = []
+    for key, path in batch.get_instances_paths().items():
+        row = dict(scenario=key[0], name=key[1], **options.get(key, {}))
+        if has_input(path):
+            # objective and errors in one pass over the experiments
+            experiment = batch.get_case(key)
+            arrays = experiment.instance.arrays
+            row.update(jobs=arrays.num_jobs, modes=int(arrays.num_modes.sum()), resources=arrays.num_resources)
+            if experiment.solution is not None:
+                row.update(objective=experiment.get_objective(), errors=len(experiment.check_solution()))
+        rows.append(row)
+    return pd.DataFrame(rows, columns=['scenario', 'name'] if not rows else None)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,148 @@
+import core.tools as tools
+from core.instance_cache import REFERENCE_FILE
+import os
+import shutil
+import warnings
+import zipfile
+from timeit import default_timer as timer
+
+
+def experiment_files(result, indent=4):
+    """
+    :param result: the result of run_batch.solve_instance
+    :param indent: indentation of the json files. None writes them compact
+    :return: the name and content of each file of the experiment
+    """
+    files = []
+    if result['error'] is not None:
+        files.append(('error.txt', result['error']))
+    files.append(('options.json', tools.dumps_json(result['options'], indent)))
+    if result['input'] is not None:
+        files.append(('input.json', tools.dumps_json(result['input'], indent)))
+    elif result.get('input_ref') is not None:
+        files.append((REFERENCE_FILE, tools.dumps_json(result['input_ref'], indent)))
+    if result['output'] is not None:
+        files.append(('output.json', tools.dumps_json(result['output'], indent)))
+    if result.get('log') is not None:
+        files.append(('results.log', result['log']))
+    return files
+
+
+class DirectoryWriter(object):
+    """
+    Writes each experiment in its own directory: /PATH/TO/BATCH/scenario/instance/
+    """
+
+    def __init__(self, path, indent=4):
+        self.path = path
+        self.indent = indent
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def has_experiment(self, name):
+        return os.path.exists(os.path.join(self.path, name, 'options.json'))
+
+    def write_experiment(self, name, result):
+        """
+        :param name: scenario/instance
+        :param result: the result of run_batch.solve_instance
+        """
+        experiment_dir = os.path.join(self.path, name)
+        if os.path.exists(experiment_dir):
+            shutil.rmtree(experiment_dir)
+        os.makedirs(experiment_dir)
+        for filename, content in experiment_files(result, self.indent):
+            with open(os.path.join(experiment_dir, filename), 'w') as f:
+                f.write(content)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ZipWriter(DirectoryWriter):
+    """
+    Writes each experiment straight into a zip file, as base_dir/scenario/instance/file,
+    the same layout shutil.make_archive gives to a DirectoryWriter output.
+
+    Entries are appended to the zip in place. Readers (e.g. ZipBatch) only see them once
+    the central directory is written, which happens every commit_interval seconds
+    (see commit) and when closing. A run that is killed (instead of interrupted, which
+    closes the writer) while appending can leave the zip unreadable.
+    Experiments written again are appended too, readers take the last version,
+    and the previous versions are removed when closing.
+    """
+
+    def __init__(self, path, base_dir, indent=4, commit_interval=10):
+        """
+        :param commit_interval: seconds between commits. Each commit writes the whole
+            central directory, so it takes longer as the zip grows.
+        """
+        self.path = path
+        self.base_dir = base_dir
+        self.indent = indent
+        self.commit_interval = commit_interval
+        mode = 'a' if os.path.exists(path) else 'w'
+        self.zip_obj = zipfile.ZipFile(path, mode, compression=zipfile.ZIP_DEFLATED)
+        self.num_initial = len(self.zip_obj.infolist())
+        self.existing = set()
+        for filename in self.zip_obj.namelist():
+            name = self._experiment_name(filename)
+            if name is not None:
+                self.existing.add(name)
+        self.written = set()
+        self.replaced = set()
+        self._last_commit = timer()
+
+    def _experiment_name(self, filename):
+        parts = filename.split('/')
+        if len(parts) != 4 or parts[0] != self.base_dir:
+            return None
+        return parts[1] + '/' + parts[2]
+
+    def has_experiment(self, name):
+        return name in self.existing or name in self.written
+
+    def write_experiment(self, name, result):
+        files = experiment_files(result, self.indent)
+        if name in self.existing:
+            self.replaced.add(name)
+        with warnings.catch_warnings():
+            # names that already exist in the zip are cleaned when closing
+            warnings.simplefilter('ignore', UserWarning)
+            for filename, content in files:
+                self.zip_obj.writestr('/'.join([self.base_dir, name, filename]), content)
+        self.written.add(name)
+        if timer() - self._last_commit >= self.commit_interval:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the central directory, so the experiments written until now can be read.
+        """
+        self.zip_obj.close()
+        self.zip_obj = zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_DEFLATED)
+        self._last_commit = timer()
+
+    def _remove_replaced(self):
+        compact_path = self.path + '.compact'
+        with zipfile.ZipFile(self.path) as zip_in, \
+                zipfile.ZipFile(compact_path, 'w', compression=zipfile.ZIP_DEFLATED) as zip_out:
+            for position, info in enumerate(zip_in.infolist()):
+                if position < self.num_initial and self._experiment_name(info.filename) in self.replaced:
+                    continue
+                zip_out.writestr(info, zip_in.read(info))
+        os.replace(compact_path, self.path)
+
+    def close(self):
+        if self.zip_obj is None:
+            return
+        self.zip_obj.close()
+        self.zip_obj = None
+        if self.replaced:
+            self._remove_replaced()
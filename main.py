@@ -25,7 +25,34 @@ def cli():
 @click.option('--solver', default='default', help='solver to use.')
 @click.option('--test/--no-test', default=True, help='if given only solves 3 instances of each scenario.')
 @click.option('--zip/--no-zip', default=False, help='if given it zips all the results into one file.')
-def solve_scenarios(directory, scenarios, scenario, solver, test, instances, instance, zip):
+@click.option('--workers', default=1, type=int, help='number of processes to solve instances in parallel.')
+@click.option('--timeout', default=None, type=float, help='time limit in seconds for each instance.')
+@click.option('--force/--no-force', default=False, help='if given it solves again instances already solved.')
+@click.option('--stream-zip/--no-stream-zip', default=False,
+              help='if given it writes the results straight into the zip, without a directory per instance.')
+@click.option('--compact/--no-compact', default=False, help='if given it writes json files without indentation.')
+@click.option('--summary-format', default='parquet', type=click.Choice(['parquet', 'feather']),
+              help='file format of the summary table written next to the results.')
+@click.option('--options', default='{}', cls=PythonLiteralOption,
+              help='dictionary of options for the solver, e.g. "{\'num_search_workers\': 2, \'seed\': 1}".')
+@click.option('--profile', default=0, type=int,
+              help='number of slowest instances whose cProfile stats are written next to the results.')
+@click.option('--instance-cache', default=None,
+              help='directory where parsed instances are kept to be reused. '
+                   'Results refer to them instead of having their own input.json.')
+@click.option('--bound-time', default=None, type=float,
+              help='seconds of CP-SAT to improve the lower bound of each instance, before solving it.')
+@click.option('--chunk-size', default=1, type=int, help='number of instances each worker solves in one task.')
+@click.option('--budget', default=None, type=float,
+              help='seconds for each scenario: a quick pass over all instances and then '
+                   'more time for the ones with the largest gaps. It replaces --timeout.')
+@click.option('--progress/--no-progress', default=False,
+              help='if given it prints the progress of the run: instances per second, ETA and mean gap.')
+@click.option('--logs/--no-logs', default=False,
+              help='if given the solvers that can (ortools) write their search log in results.log.')
+def solve_scenarios(directory, scenarios, scenario, solver, test, instances, instance, zip, workers, timeout, force,
+                    stream_zip, compact, summary_format, options, profile, instance_cache, bound_time, chunk_size,
+                    budget, progress, logs):
     """Solves a batch of instances inside a zip with a solver and zips the results"""
     # print(scenarios)
     # print(test)
@@ -35,18 +62,67 @@ def solve_scenarios(directory, scenarios, scenario, solver, test, instances, ins
         instances = [instance]
     if scenario is not None:
         scenarios = [scenario]
+    if logs:
+        options = dict(options, log_search_progress=True)
     rb.solve_scenarios_and_zip(scenarios, os.path.join(directory, solver),
-                               solver, test=test, instances=instances, zip=zip)
+                               solver, test=test, instances=instances, zip=zip,
+                               workers=workers, timeout=timeout, force=force,
+                               stream_zip=stream_zip, compact=compact, summary_format=summary_format,
+                               options=options, profile=profile, instance_cache=instance_cache,
+                               bound_time=bound_time, chunk_size=chunk_size, budget=budget, progress=progress)
 
 @cli.command()
 @click.option('--path', default='default', help='the path to the zipfile to analyse.')
-@click.option('--path_out', help='the path for the output csv.')
+@click.option('--path_out', help='the path for the output csv, parquet or feather file.')
 def export_table(path, path_out):
-    """Reads a result zip and exports the table in a csv"""
+    """Reads a result zip and exports the table in a csv, parquet or feather file (by extension)"""
     table = rb.get_table(path)
-    table.to_csv(path_out, index=False)
+    ext = os.path.splitext(path_out)[1]
+    if ext == '.parquet':
+        table.to_parquet(path_out, index=False)
+    elif ext == '.feather':
+        table.to_feather(path_out)
+    else:
+        table.to_csv(path_out, index=False)
     return
 
+@cli.command()
+@click.option('--directory', default='data/c15.mm', help='directory or scenario zip with the .mm files to use.')
+@click.option('--output', default='benchmark.json', help='json file to write the results to.')
+@click.option('--solvers', default='None', cls=PythonLiteralOption,
+              help='list of solvers to time, all by default.')
+@click.option('--time-limit', default=1, type=float, help='time limit in seconds of each solver run.')
+@click.option('--seed', default=0, type=int, help='seed for the solvers.')
+@click.option('--repeat', default=3, type=int, help='runs of each operation, the best one is kept.')
+@click.option('--solver-files', default=20, type=int, help='number of files to solve with each solver.')
+def benchmark(directory, output, solvers, time_limit, seed, repeat, solver_files):
+    """Times parsing, checking, get_table and the solvers and writes the results in a json file"""
+    import execution.benchmark as bm
+    import core.tools as tools
+    result = bm.benchmark_suite(directory, solver_names=solvers, time_limit=time_limit, seed=seed,
+                                repeat=repeat, solver_files=solver_files)
+    tools.write_json(result, output)
+    for name, values in result['results'].items():
+        print('{}: {}'.format(name, values))
+
+@cli.command()
+@click.option('--base', help='json file with the results of the base benchmark.')
+@click.option('--new', help='json file with the results of the new benchmark.')
+@click.option('--threshold', default=0.1, type=float, help='relative change of time that is reported.')
+def compare_benchmarks(base, new, threshold):
+    """Compares the results of two benchmarks, e.g. from two commits"""
+    import execution.benchmark as bm
+    table = bm.compare_benchmarks(base, new, threshold=threshold)
+    print(table.to_markdown(index=False))
+
+@cli.command()
+@click.option('--path', help='scenario zip or directory with the .mm files to pack.')
+@click.option('--output', default=None, help='pack file to write, by default the zip with .pack instead of .zip.')
+def pack_scenario(path, output):
+    """Parses all the instances of a scenario and writes them in one memory-mappable file"""
+    from core.scenario_pack import pack_scenario as pack
+    print(pack(path, output))
+
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
     cli()
@@ -55,4 +131,8 @@ if __name__ == '__main__':
 # python main.py solve-scenarios --directory=data --scenarios='["c15.mm.zip"]' --solver=default --test=1
 # python main.py solve-scenarios --directory=data --scenarios='["c15.mm.zip", "c21.mm.zip", "j10.mm.zip", "j30.mm.zip", "m1.mm.zip", "m5.mm.zip", "n0.mm.zip", "n1.mm.zip", "n3.mm.zip", "r1.mm.zip", "r4.mm.zip", "r5.mm.zip"]' --solver=default
 # python main.py solve-scenarios --directory=data --scenario=j30.mm.zip --solver=ortools --instance=j301_1.mm --no-test
-# python main.py export-table --path=data/default.zip --path_out=data_default.csv
\ No newline at end of file
+# python main.py export-table --path=data/default.zip --path_out=data_default.csv
+# python main.py pack-scenario --path=data/c15.mm.zip
+# python main.py solve-scenarios --directory=data --scenario=c15.mm.pack --solver=default
+# python main.py benchmark --output=benchmark.json
+# python main.py compare-benchmarks --base=benchmark_base.json --new=benchmark.json
\ No newline at end of file
@@ -1,9 +1,11 @@
 from .algorithm1 import Algorithm
 from .cp_ortools import CPModel1
+from .genetic import GeneticAlgorithm
 
 solvers = \
     dict(default=Algorithm,
-         ortools=CPModel1)
+         ortools=CPModel1,
+         genetic=GeneticAlgorithm)
 
 # factory of solvers
 def get_solver(name='default'):
@@ -1,6 +1,7 @@
-from core import Experiment, Solution
-import copy
-import pytups as pt
+from core import Experiment
+from core import preprocessing
+from .sgs import ScheduleGenerator, topological_order
+import numpy as np
 
 
 class Algorithm(Experiment):
@@ -12,28 +13,23 @@ class Algorithm(Experiment):
         return
 
     def solve(self, options):
-        # takes into account successors
-        jobs = copy.deepcopy(self.instance.data['jobs'])
-        all_jobs = set(jobs.keys())
-        solution = pt.SuperDict()
-        succ = jobs.get_property('successors')
-        durations = self.instance.data['durations']
-        needs = self.instance.data['needs']
-
-        # algorithm
-        period = 0
-        job = 1
-        succ.pop(job)
-        mode = 1  # we always chose the first mode
-        solution[job] = dict(period=period, mode=mode)
-        period = period + durations[job][mode]
-
-        while len(succ):
-            reverse = succ.list_reverse()
-            possible = all_jobs - reverse.keys() - solution.keys()
-            for job in possible:
-                succ.pop(job)
-                solution[job] = dict(period=period, mode=mode)
-                period = period + durations[job][mode]
-        self.solution = Solution(solution)
-        return self.solution
+        # takes into account successors and renewable resources:
+        # serial schedule generation over the jobs in topological order
+        arrays = self.instance.arrays
+        generator = ScheduleGenerator(arrays)
+        if not all(any(job_fits) for job_fits in generator.fits):
+            # a job needs more than the capacity of a renewable resource in all its modes
+            self.solution = None
+            return 3
+        activity_list = topological_order(arrays)
+        # the shortest modes that fit in the non-renewable resources if we find them.
+        # If not, the first mode that fits in the renewable resources.
+        # The modes are the ones of the instance, which is usually reduced already (see Instance.get_reduced)
+        modes = preprocessing.feasible_modes(arrays, np.array(generator.fits, dtype=bool))
+        if modes is None:
+            modes = [job_fits.index(True) for job_fits in generator.fits]
+        starts, _ = generator.serial(activity_list, modes)
+        self.solution = generator.to_solution(starts, modes)
+        if generator.nonrenewable_excess(modes):
+            return 0
+        return 2
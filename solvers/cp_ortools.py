@@ -1,34 +1,370 @@
 from ortools.sat.python import cp_model
 from core.experiment import Experiment, Solution
+from core import preprocessing
+from .sgs import ScheduleGenerator
+from timeit import default_timer as timer
+import numpy as np
 import pytups as pt
 
 
+class SolutionCallback(cp_model.CpSolverSolutionCallback):
+    """
+    Calls on_solution(makespan, seconds) for every solution CP-SAT finds.
+    """
+
+    def __init__(self, on_solution):
+        super().__init__()
+        self.on_solution = on_solution
+
+    def on_solution_callback(self):
+        self.on_solution(self.ObjectiveValue(), self.WallTime())
+
+
 class CPModel1(Experiment):
+    """
+    options:
+        timeLimit: seconds (default 10)
+        preprocess: if True (default), variables are created over the time windows
+            and modes given by get_domains. If False, over the whole horizon.
+        formulation: how modes are modelled, 'optional' (default, see add_modes_optional)
+            or 'element' (see add_modes_element).
+        builder: how the model is built, 'arrays' (default, see build_model_arrays)
+            or 'data' (see build_model). Only 'data' has the element formulation.
+        hint: if True (default), the solution of the experiment (if any) is given to
+            CP-SAT as a hint and, if it is feasible, its makespan bounds the objective
+            and it is the solution returned when CP-SAT finds none in time.
+        warm_start: name of a solver to run first when the experiment has no solution,
+            to get the hint (default 'default', the serial SGS). None to start cold.
+        warm_start_options: options of that solver (default: a tenth of timeLimit).
+        num_search_workers: CP-SAT threads (default 0, one per core)
+        seed: CP-SAT random seed (default 1)
+        log_search_progress: if True, CP-SAT logs the search in self.log (default False,
+            logging slows down short searches)
+        parameters: dictionary with any other CP-SAT parameter
+        lower_bound: a known lower bound of the makespan (see core.bounds).
+            The search stops as soon as it finds a solution with that makespan.
+        on_solution: function called with the makespan and the seconds of search
+            every time CP-SAT finds a better solution.
+    """
+
+    # name of the option and method that builds the model
+    builders = dict(arrays='build_model_arrays', data='build_model')
+
+    # option with the threads of the search, see run_batch.cpu_budget
+    threads_option = 'num_search_workers'
+
+    # option => CP-SAT parameter
+    solver_parameters = dict(num_search_workers='num_workers', seed='random_seed',
+                             log_search_progress='log_search_progress')
 
     def __init__(self, instance, solution=None):
         super().__init__(instance, solution)
+        # CP-SAT log and best bound of the makespan of the last solve
+        self.log = None
+        self.best_bound = None
         return
 
-    def solve(self, options):
+    def get_warm_start(self, options):
+        """
+        The solution to use as a hint: the one in the experiment or, if there is none,
+        the one found by the solver in options['warm_start'].
+
+        :return: the solution (or None) and its makespan if it is feasible (or None)
+        """
+        if not options.get('hint', True):
+            return None, None
+        solution = self.solution
+        if not solution and options.get('warm_start', 'default'):
+            from . import get_solver
+            default_options = dict(timeLimit=options.get('timeLimit', 10) / 10)
+            algo = get_solver(options.get('warm_start', 'default'))(self.instance)
+            algo.solve(options.get('warm_start_options', default_options))
+            solution = algo.solution
+        if not solution:
+            return None, None
+        experiment = Experiment(self.instance, solution)
+        errors = experiment.check_solution()
+        if 'modes' in errors:
+            # jobs with modes they do not have cannot be hinted
+            return None, None
+        if errors:
+            return solution, None
+        return solution, experiment.get_objective()
+
+    def get_domains(self, preprocess=True, upper_bound=None):
+        """
+        Time windows and modes of each job.
+
+        With preprocess, modes that cannot be feasible or are dominated are removed (see
+        preprocessing.reduced_mode_mask), the horizon is the makespan of a quick
+        serial SGS schedule (if it finds modes that fit in the non-renewable resources,
+        see preprocessing.greedy_modes and feasible_modes)
+        and the start of each job goes from its earliest to its latest start in the
+        critical path method with the shortest modes.
+
+        :param upper_bound: makespan of a known solution, the horizon is never longer.
+            It is never shorter than the critical path either, so the domains are never empty.
+        :return: dictionary with, per job: earliest start, latest start and the list
+            of modes (starting in 0) and the horizon
+        """
+        jobs = self.instance.arrays.jobs.tolist()
+        earliest, latest, mode_mask, horizon = self.get_domains_arrays(preprocess, upper_bound)
+        modes = [np.flatnonzero(job_mask).tolist() for job_mask in mode_mask]
+        return dict(earliest=pt.SuperDict(zip(jobs, earliest)), latest=pt.SuperDict(zip(jobs, latest)),
+                    modes=pt.SuperDict(zip(jobs, modes)), horizon=horizon)
+
+    def get_domains_arrays(self, preprocess=True, upper_bound=None):
+        """
+        Same as get_domains, by job position.
+
+        :return: earliest and latest start of each job, (job x mode) mask of the modes and horizon
+        """
+        arrays = self.instance.arrays
+        mode_mask = arrays.mode_mask
+        # all jobs one after the other with their longest mode
+        horizon = int(preprocessing.max_durations(arrays).sum())
+        if not preprocess:
+            horizon += 1
+            if upper_bound is not None:
+                shortest = np.where(mode_mask.any(axis=1), preprocessing.min_durations(arrays), 0)
+                critical_path = preprocessing.earliest_starts(arrays, shortest) + shortest
+                horizon = max(min(horizon, upper_bound), int(critical_path.max(initial=0)))
+            earliest = [0] * arrays.num_jobs
+            latest = [horizon] * arrays.num_jobs
+            return earliest, latest, mode_mask, horizon
+        mode_mask = preprocessing.reduced_mode_mask(arrays)
+        reduced = arrays.with_mode_mask(mode_mask)
+        order = preprocessing.topological_order(arrays)
+        horizon = int(preprocessing.max_durations(reduced).sum())
+        # the greedy modes are much faster to find, when they fit
+        modes = preprocessing.greedy_modes(reduced)
+        if modes is None:
+            modes = preprocessing.feasible_modes(reduced)
+        if modes is not None:
+            _, makespan = ScheduleGenerator(reduced).serial(order, modes)
+            horizon = min(horizon, makespan)
+        durations = preprocessing.min_durations(reduced)
+        earliest = preprocessing.earliest_starts(reduced, durations, order)
+        if upper_bound is not None:
+            horizon = max(min(horizon, upper_bound), int((earliest + durations).max(initial=0)))
+        latest = preprocessing.latest_starts(reduced, durations, horizon, order).tolist()
+        return earliest.tolist(), latest, mode_mask, horizon
+
+    def build_model(self, options, hint=None, upper_bound=None):
+        """
+        :param hint: solution to give as a hint
+        :param upper_bound: makespan of a feasible solution
+        :return: the model, the start variable and the mode expression of each job
+        """
         model = cp_model.CpModel()
         input_data = pt.SuperDict.from_dict(self.instance.data)
-        max_dur_job = input_data['durations'].vapply(lambda v: max(v.values()))
-        horizon = sum(max_dur_job) + 1
+        domains = self.get_domains(options.get('preprocess', True), upper_bound)
+        horizon = domains['horizon']
+        earliest = domains['earliest']
+        latest = domains['latest']
+        # modes start in 0
+        modes_job = domains['modes']
+        jobs_data = input_data['jobs']
+        durations_data = pt.SuperDict.from_dict(input_data['durations'])
+        mode_durations = durations_data.kvapply(lambda k, v: [v[m + 1] for m in modes_job[k]])
+
+        # variable declaration:
+        starts = pt.SuperDict({job: model.NewIntVar(earliest[job], latest[job], 'start_{}'.format(job))
+                               for job in jobs_data})
+        ends = pt.SuperDict({job: model.NewIntVar(earliest[job] + min(mode_durations[job], default=0), horizon,
+                                                  'end_{}'.format(job))
+                             for job in jobs_data})
+
+        formulation = options.get('formulation', 'optional')
+        if formulation not in self.formulations:
+            raise ValueError('unknown formulation {}, available: {}'.
+                             format(formulation, ', '.join(self.formulations)))
+        add_modes = getattr(self, self.formulations[formulation])
+        mode_hints = None
+        if hint:
+            # modes start in 0
+            mode_hints = hint.data.get_property('mode').vapply(lambda v: v - 1)
+            for job, period in hint.data.get_property('period').items():
+                model.AddHint(starts[job], period)
+                model.AddHint(ends[job], period + durations_data[job][mode_hints[job] + 1])
+        job_mode = add_modes(model, input_data, modes_job, starts, ends, mode_hints)
+
+        # succession needs to be guaranteed
+        for job, job_data in input_data['jobs'].items():
+            for successor in job_data['successors']:
+                model.Add(starts[successor] >= ends[job])
+
+        # we set the objective as the makespan
+        # it cannot be shorter than the critical path
+        critical_path = max(earliest[job] + min(mode_durations[job], default=0) for job in jobs_data)
+        if options.get('lower_bound') is not None:
+            critical_path = max(critical_path, min(options['lower_bound'], horizon))
+        obj_var = model.NewIntVar(critical_path, horizon, 'makespan')
+        model.AddMaxEquality(obj_var, ends.values())
+        model.Minimize(obj_var)
+        if upper_bound is not None:
+            model.AddHint(obj_var, upper_bound)
+        return model, starts, job_mode
+
+    def build_model_arrays(self, options, hint=None, upper_bound=None):
+        """
+        Same model as build_model with the optional formulation (see add_modes_optional),
+        built straight from the InstanceArrays: lists instead of SuperDicts,
+        no variable names and the snake_case methods of CP-SAT, which skip
+        the deprecation wrapper of the CamelCase ones.
+
+        :return: the model, the start variable and the mode expression of each job
+        """
+        arrays = self.instance.arrays
+        earliest, latest, mode_mask, horizon = self.get_domains_arrays(options.get('preprocess', True), upper_bound)
+        durations = arrays.durations.tolist()
+        needs = arrays.needs.tolist()
+        renewable = arrays.renewable.tolist()
+        available = arrays.available.tolist()
+        model = cp_model.CpModel()
+        if hint:
+            hint_starts, hint_modes = (v.tolist() for v in hint.to_arrays(arrays))
+
+        # same order of variables and constraints as build_model: the search depends on it
+        job_modes = [[m for m, ok in enumerate(job_mask) if ok] for job_mask in mode_mask.tolist()]
+        first_ends = [earliest[job] + min((durations[job][m] for m in modes), default=0)
+                      for job, modes in enumerate(job_modes)]
+        critical_path = max(first_ends, default=0)
+        starts = [model.new_int_var(e, l, '') for e, l in zip(earliest, latest)]
+        ends = [model.new_int_var(e, horizon, '') for e in first_ends]
+        if hint:
+            for job, (start, end) in enumerate(zip(starts, ends)):
+                if hint_modes[job] >= 0:
+                    model.add_hint(start, hint_starts[job])
+                    model.add_hint(end, hint_starts[job] + durations[job][hint_modes[job]])
+
+        job_lits = []
+        # per resource: intervals and demands (renewable) or literals and needs (non-renewable)
+        res_items = [[] for _ in renewable]
+        res_needs = [[] for _ in renewable]
+        for job, modes in enumerate(job_modes):
+            start = starts[job]
+            end = ends[job]
+            lits = [model.new_bool_var('') for _ in modes]
+            for m, lit in zip(modes, lits):
+                duration = durations[job][m]
+                interval = model.new_optional_fixed_size_interval_var(start, duration, lit, '')
+                model.add(end == start + duration).only_enforce_if(lit)
+                for r, need in enumerate(needs[job][m]):
+                    if not need:
+                        continue
+                    res_items[r].append(interval if renewable[r] else lit)
+                    res_needs[r].append(need)
+            job_lits.append(lits)
+        if hint:
+            for job, (modes, lits) in enumerate(zip(job_modes, job_lits)):
+                for m, lit in zip(modes, lits):
+                    model.add_hint(lit, m == hint_modes[job])
+        for lits in job_lits:
+            model.add_exactly_one(lits)
+
+        for r, (items, demands) in enumerate(zip(res_items, res_needs)):
+            if renewable[r]:
+                model.add_cumulative(items, demands, available[r])
+            else:
+                model.add(cp_model.LinearExpr.weighted_sum(items, demands) <= available[r])
+
+        succ_ptr = arrays.succ_ptr.tolist()
+        succ_idx = arrays.succ_idx.tolist()
+        for job, end in enumerate(ends):
+            for successor in succ_idx[succ_ptr[job]:succ_ptr[job + 1]]:
+                model.add(starts[successor] >= end)
+
+        if options.get('lower_bound') is not None:
+            critical_path = max(critical_path, min(options['lower_bound'], horizon))
+        obj_var = model.new_int_var(critical_path, horizon, '')
+        model.add_max_equality(obj_var, ends)
+        model.minimize(obj_var)
+        if upper_bound is not None:
+            model.add_hint(obj_var, upper_bound)
+        jobs = arrays.jobs.tolist()
+        job_mode = [cp_model.LinearExpr.weighted_sum(lits, modes) for modes, lits in zip(job_modes, job_lits)]
+        return model, pt.SuperDict(zip(jobs, starts)), pt.SuperDict(zip(jobs, job_mode))
+
+    def solve(self, options):
+        start = timer()
+        if options.get('preprocess', True) and \
+                not preprocessing.feasible_mode_mask(self.instance.arrays).any(axis=1).all():
+            # a job has no modes left after preprocessing: there is no feasible solution
+            return cp_model.INFEASIBLE
+        with self.spans('warm_start'):
+            hint, upper_bound = self.get_warm_start(options)
+        builder = options.get('builder', 'arrays')
+        if options.get('formulation', 'optional') != 'optional':
+            # the other formulations are only in build_model
+            builder = 'data'
+        if builder not in self.builders:
+            raise ValueError('unknown builder {}, available: {}'.format(builder, ', '.join(self.builders)))
+        with self.spans('build'):
+            model, starts, job_mode = getattr(self, self.builders[builder])(options, hint, upper_bound)
+
+        solver = cp_model.CpSolver()
+        # the warm start is part of the time limit
+        solver.parameters.max_time_in_seconds = max(options.get('timeLimit', 10) - (timer() - start), 0)
+        parameters = dict(log_search_progress=False, log_to_stdout=False)
+        parameters.update({v: options[k] for k, v in self.solver_parameters.items() if k in options})
+        parameters.update(options.get('parameters', {}))
+        for k, v in parameters.items():
+            setattr(solver.parameters, k, v)
+        log_lines = []
+        solver.log_callback = log_lines.append
+        callback = None
+        if options.get('on_solution') is not None:
+            callback = SolutionCallback(options['on_solution'])
+        with self.spans('search'):
+            status = solver.Solve(model, callback)
+        if log_lines:
+            self.log = '\n'.join(log_lines) + '\n'
+        if status in [cp_model.OPTIMAL, cp_model.FEASIBLE, cp_model.UNKNOWN]:
+            self.best_bound = solver.BestObjectiveBound()
+        if status == cp_model.UNKNOWN and upper_bound is not None:
+            # out of time before the first solution: the hint is still a feasible one
+            self.solution = hint
+            return cp_model.FEASIBLE
+        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
+            return status
+        start_sol = starts.vapply(solver.Value)
+        mode_sol = job_mode.vapply(lambda v: solver.Value(v) + 1)
+        _func = lambda x, y: dict(period=x, mode=y)
+        solution = start_sol.sapply(func=_func, other=mode_sol)
+        self.solution = Solution(solution)
+        return status
+
+    # name of the option and method that adds the modes and resources to the model
+    formulations = dict(element='add_modes_element', optional='add_modes_optional')
+
+    def add_modes_element(self, model, input_data, modes_job, starts, ends, mode_hints=None):
+        """
+        One interval per job with a variable duration. The duration and the
+        consumption of each resource are linked to the mode with element constraints.
+
+        :param mode_hints: mode (starting in 0) to give as a hint for each job
+        :return: the mode variable (starting in 0) of each job
+        """
         jobs_data = input_data['jobs']
         durations_data = pt.SuperDict.from_dict(input_data['durations'])
         needs_data = pt.SuperDict.from_dict(input_data['needs'])
         mode_dictionary_to_values = lambda v: v.to_tuplist().sorted(key=lambda x: x[0]).take(1)
+        mode_durations = durations_data.kvapply(lambda k, v: [v[m + 1] for m in modes_job[k]])
 
-        # variable declaration:
-        starts = pt.SuperDict({job: model.NewIntVar(0, horizon, 'start_{}'.format(job)) for job in jobs_data})
-        ends = pt.SuperDict({job: model.NewIntVar(0, horizon, 'end_{}'.format(job)) for job in jobs_data})
-        job_mode = pt.SuperDict({job: model.NewIntVar(0, len(modes) - 1, 'mode_{}'.format(job))
-                                 for job, modes in durations_data.items()})
-        job_duration = pt.SuperDict({job: model.NewIntVar(min(modes.values()), max(modes.values()), 'duration_{}'.format(job))
-                                     for job, modes in durations_data.items()})
+        job_mode = pt.SuperDict({job: model.NewIntVarFromDomain(cp_model.Domain.FromValues(modes),
+                                                                'mode_{}'.format(job))
+                                 for job, modes in modes_job.items()})
+        job_duration = pt.SuperDict({job: model.NewIntVar(min(durations, default=0), max(durations, default=0),
+                                                          'duration_{}'.format(job))
+                                     for job, durations in mode_durations.items()})
         interval = pt.SuperDict({job: model.NewIntervalVar(starts[job], job_duration[job], ends[job], 'interval_{}'.format(job))
                                  for job in jobs_data})
         mode_duration_perjob = durations_data.vapply(mode_dictionary_to_values)
+        if mode_hints:
+            for job, mode in mode_hints.items():
+                model.AddHint(job_mode[job], mode)
+                model.AddHint(job_duration[job], mode_duration_perjob[job][mode])
         # definition of job duration
         [model.AddElement(job_mode[job], mode_duration_perjob[job], job_duration[job]) for job in jobs_data]
 
@@ -46,17 +382,14 @@ class CPModel1(Experiment):
         # for each job and resource:
         # a variable with the consumption
         job_consumption = needs_data_perjob.kvapply(
-            lambda k, v: model.NewIntVar(min(v), max(v), 'consumption_{}_{}'.format(*k))
+            lambda k, v: model.NewIntVar(min([v[m] for m in modes_job[k[0]]], default=0),
+                                         max([v[m] for m in modes_job[k[0]]], default=0),
+                                         'consumption_{}_{}'.format(*k))
         )
         # definition of job consumption
         for (job, res), needs in needs_data_perjob.items():
             model.AddElement(job_mode[job], needs, job_consumption[job, res])
 
-        # succession needs to be guaranteed
-        for job, job_data in input_data['jobs'].items():
-            for successor in job_data['successors']:
-                model.Add(starts[successor] >= ends[job])
-
         # resource usage
         job_consumption_per_res = job_consumption.to_tuplist().take([1, 0, 2]).to_dict(2, is_list=False).to_dictdict()
         for resource, res_data in input_data['resources'].items():
@@ -68,25 +401,48 @@ class CPModel1(Experiment):
                 model.AddCumulative(intervals=relevant_intervals, demands=consumptions, capacity=res_data['available'])
             else: # non renewable resources we sum all
                 model.Add(sum(consumptions) <= res_data['available'])
+        return job_mode
 
-        # we set the objective as the makespan
-        obj_var = model.NewIntVar(0, horizon, 'makespan')
-        model.AddMaxEquality(obj_var, ends.values())
-        model.Minimize(obj_var)
-
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = options.get('timeLimit', 10)
-        status = solver.Solve(model)
-        if status not in [cp_model.OPTIMAL, cp_model.FEASIBLE]:
-            return status
-        start_sol = starts.vapply(solver.Value)
-        mode_sol = job_mode.vapply(lambda v: solver.Value(v) + 1)
-        _func = lambda x, y: dict(period=x, mode=y)
-        solution = start_sol.sapply(func=_func, other=mode_sol)
-        self.solution = Solution(solution)
-        return status
-
+    def add_modes_optional(self, model, input_data, modes_job, starts, ends, mode_hints=None):
+        """
+        One optional interval of fixed duration per job and mode, with a literal
+        that says if the job is done in that mode. Exactly one literal per job is true.
+        Cumulative constraints get the fixed demand of each mode and non-renewable
+        resources are a weighted sum of the literals.
 
+        :param mode_hints: mode (starting in 0) to give as a hint for each job
+        :return: the mode expression (starting in 0) of each job
+        """
+        durations_data = input_data['durations']
+        needs_data = input_data['needs']
 
+        # job, mode => literal
+        job_mode_lit = pt.SuperDict({(job, m): model.NewBoolVar('mode_{}_{}'.format(job, m))
+                                     for job, modes in modes_job.items() for m in modes})
+        interval = pt.SuperDict()
+        for (job, m), lit in job_mode_lit.items():
+            duration = durations_data[job][m + 1]
+            interval[job, m] = model.NewOptionalFixedSizeIntervalVar(
+                starts[job], duration, lit, 'interval_{}_{}'.format(job, m))
+            model.Add(ends[job] == starts[job] + duration).OnlyEnforceIf(lit)
+        if mode_hints:
+            for (job, m), lit in job_mode_lit.items():
+                model.AddHint(lit, m == mode_hints.get(job))
+        for job, modes in modes_job.items():
+            # a job without modes left makes the model infeasible
+            model.AddExactlyOne([job_mode_lit[job, m] for m in modes])
 
+        # resource usage
+        renewable = self.instance.get_renewable_resources()
+        for resource, res_data in input_data['resources'].items():
+            # only the modes that consume the resource
+            keys = [(job, m) for job, m in job_mode_lit if needs_data[job][m + 1][resource]]
+            consumptions = [needs_data[job][m + 1][resource] for job, m in keys]
+            if resource in renewable:
+                model.AddCumulative(intervals=[interval[k] for k in keys], demands=consumptions,
+                                    capacity=res_data['available'])
+            else:
+                model.Add(sum(q * job_mode_lit[k] for k, q in zip(keys, consumptions)) <= res_data['available'])
 
+        return pt.SuperDict({job: sum(m * job_mode_lit[job, m] for m in modes)
+                             for job, modes in modes_job.items()})
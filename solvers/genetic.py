@@ -0,0 +1,225 @@
+from core import Experiment
+from .sgs import ScheduleGenerator, topological_order
+from concurrent.futures import ProcessPoolExecutor
+from timeit import default_timer as timer
+import multiprocessing
+import random
+
+# schedule generator of the process, see _init_worker
+_generator = None
+
+
+def _init_worker(arrays):
+    global _generator
+    _generator = ScheduleGenerator(arrays)
+
+
+def _fitness(individual):
+    # non-renewable excess first, then makespan
+    return individual[0]
+
+
+def _evaluate(activity_list, modes):
+    starts, makespan = _generator.serial(activity_list, modes)
+    return (_generator.nonrenewable_excess(modes), makespan), activity_list, modes, starts
+
+
+def _random_individual(rng, mode_options):
+    activity_list = topological_order(_generator.arrays, rng)
+    modes = [rng.choice(options) for options in mode_options]
+    return _evaluate(activity_list, modes)
+
+
+def _child(mother, father, rng, mode_options, successors, mutation):
+    _, mother_list, mother_modes, _ = mother
+    _, father_list, father_modes, _ = father
+    # one-point crossover keeps the activity list precedence-feasible
+    num_jobs = len(mother_list)
+    point = rng.randrange(1, num_jobs)
+    head = mother_list[:point]
+    taken = set(head)
+    activity_list = head + [j for j in father_list if j not in taken]
+    modes = [m if rng.random() < 0.5 else f for m, f in zip(mother_modes, father_modes)]
+    # mutation: swap neighbours that are not related and change modes
+    for pos in range(num_jobs - 1):
+        if rng.random() < mutation and activity_list[pos + 1] not in successors[activity_list[pos]]:
+            activity_list[pos], activity_list[pos + 1] = activity_list[pos + 1], activity_list[pos]
+    for job in range(num_jobs):
+        if rng.random() < mutation:
+            modes[job] = rng.choice(mode_options[job])
+    return _evaluate(activity_list, modes)
+
+
+def _reached(fitness, target):
+    # feasible and as short as the target
+    excess, makespan = fitness
+    return target is not None and not excess and makespan <= target
+
+
+def evolve_island(state, seconds, migrants, target=None):
+    """
+    Runs generations of one island until the time is over.
+    It runs in the worker processes, with the schedule generator built by _init_worker.
+
+    :param state: dictionary with the population, the random state and the mutation rate
+        or the island seed and population size if it is new. A new population is built
+        while there is time, with one individual at least, starting with the (activity list, modes)
+        pairs in state['initial'] if there are any.
+    :param seconds: time to run
+    :param migrants: individuals from other islands that replace the worst ones
+    :param target: if given, it stops when it finds a feasible individual with that makespan
+    :return: the new state
+    """
+    generator = _generator
+    mode_options = [[m for m, fits in enumerate(job_fits) if fits] for job_fits in generator.fits]
+    successors = [set(s) for s in generator.successors]
+    rng = random.Random()
+    end = timer() + seconds
+    if 'population' in state:
+        rng.setstate(state['random_state'])
+        population = state['population']
+    else:
+        rng.seed(state['seed'])
+        population = [_evaluate(list(activity_list), list(modes))
+                      for activity_list, modes in state.get('initial', [])]
+        population.append(_random_individual(rng, mode_options))
+        while len(population) < state['size'] and timer() < end:
+            population.append(_random_individual(rng, mode_options))
+        population.sort(key=_fitness)
+    size = len(population)
+    population = sorted(population[:max(size - len(migrants), 1)] + list(migrants), key=_fitness)[:size]
+    mutation = state['mutation']
+    generations = 0
+    while timer() < end and not _reached(_fitness(population[0]), target):
+        parents = population[:]
+        rng.shuffle(parents)
+        children = []
+        for mother, father in zip(parents[::2], parents[1::2]):
+            children.append(_child(mother, father, rng, mode_options, successors, mutation))
+            children.append(_child(father, mother, rng, mode_options, successors, mutation))
+        population = sorted(population + children, key=_fitness)[:size]
+        generations += 1
+    return dict(population=population, random_state=rng.getstate(), mutation=mutation,
+                generations=state.get('generations', 0) + generations)
+
+
+class GeneticAlgorithm(Experiment):
+    """
+    Genetic algorithm over activity lists and mode vectors, decoded with the serial SGS.
+    Individuals are compared by non-renewable excess first and makespan second.
+
+    Several islands evolve independently, each with its own seed, and exchange
+    their best individual (in a ring) every migration_interval seconds.
+    Islands run on a process pool of num_search_workers processes, except inside
+    another process (e.g. a worker of run_batch), where they run one after the other
+    so pools are never nested.
+
+    If the experiment has a solution, every island starts with it: its jobs in order of start
+    and its modes, if they fit in the renewable resources.
+
+    It returns Infeasible if a job has no mode that fits in the renewable resources and
+    Unknown, without a solution, if it finds no modes that fit in the non-renewable
+    ones or the time is over before having any individual.
+
+    options:
+        timeLimit: seconds (default 10)
+        seed: random seed (default 0)
+        num_search_workers: number of processes (default 1)
+        islands: number of islands (default num_search_workers)
+        population: individuals per island (default 40)
+        mutation: mutation probability per job (default 0.05)
+        migration_interval: seconds between exchanges (default 1)
+        lower_bound: a known lower bound of the makespan (see core.bounds).
+            The search stops as soon as it finds a feasible solution with that makespan.
+        on_solution: function called with the makespan and the seconds since the start
+            when, after a migration, there is a better feasible solution.
+    """
+
+    def __init__(self, instance, solution=None):
+        super().__init__(instance, solution)
+        return
+
+    def get_initial(self, generator):
+        """
+        :return: the solution of the experiment as a list of (activity list, modes),
+            empty if there is none or it does not fit the modes of the instance
+        """
+        if not self.solution:
+            return []
+        arrays = self.instance.arrays
+        starts, modes = self.solution.to_arrays(arrays)
+        modes = modes.tolist()
+        if not all(0 <= mode < len(job_fits) and job_fits[mode] for mode, job_fits in zip(modes, generator.fits)):
+            return []
+        # by start, successors of jobs without duration go after them
+        position = {job: pos for pos, job in enumerate(topological_order(arrays))}
+        activity_list = sorted(range(arrays.num_jobs), key=lambda job: (starts[job], position[job]))
+        return [(activity_list, modes)]
+
+    def solve(self, options):
+        start = timer()
+        time_limit = options.get('timeLimit', 10)
+        seed = options.get('seed', 0)
+        workers = options.get('num_search_workers', 1)
+        num_islands = options.get('islands', workers)
+        interval = options.get('migration_interval', 1)
+        target = options.get('lower_bound')
+        on_solution = options.get('on_solution')
+        incumbent = None
+        arrays = self.instance.arrays
+        generator = ScheduleGenerator(arrays)
+        initial = self.get_initial(generator)
+        self.solution = None
+        if not all(any(job_fits) for job_fits in generator.fits):
+            # a job needs more than the capacity of a renewable resource in all its modes
+            return 3
+        if time_limit <= 0:
+            return 0
+        if multiprocessing.parent_process() is not None:
+            workers = 1
+        states = [dict(seed='{}-{}'.format(seed, i), size=options.get('population', 40),
+                       mutation=options.get('mutation', 0.05), initial=initial)
+                  for i in range(num_islands)]
+        migrants = [[] for _ in states]
+
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(arrays,))
+        else:
+            _init_worker(arrays)
+        try:
+            while True:
+                seconds = min(interval, time_limit - (timer() - start))
+                if seconds <= 0:
+                    break
+                if executor is None:
+                    # one island after the other, sharing the time
+                    states = [evolve_island(state, seconds / len(states), island_migrants, target=target)
+                              for state, island_migrants in zip(states, migrants)]
+                else:
+                    states = list(executor.map(evolve_island, states, [seconds] * len(states), migrants,
+                                               [target] * len(states)))
+                # each island gets the best individual of the previous one
+                best = [state['population'][0] for state in states]
+                excess, makespan = min(_fitness(individual) for individual in best)
+                if on_solution is not None and not excess and (incumbent is None or makespan < incumbent):
+                    incumbent = makespan
+                    on_solution(makespan, timer() - start)
+                if any(_reached(_fitness(individual), target) for individual in best):
+                    break
+                migrants = [[best[i - 1]] for i in range(len(states))] if len(states) > 1 else [[]]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        best = [state['population'][0] for state in states if 'population' in state]
+        if not best:
+            return 0
+        (excess, makespan), activity_list, modes, starts = min(best, key=_fitness)
+        if excess:
+            # we could not find modes that fit in the non-renewable resources
+            return 0
+        self.solution = generator.to_solution(starts, modes)
+        if _reached((excess, makespan), target):
+            return 4
+        return 2
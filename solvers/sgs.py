@@ -0,0 +1,187 @@
+import heapq
+import numpy as np
+from core import Solution
+from core.preprocessing import topological_order
+
+
+class ScheduleGenerator(object):
+    """
+    Schedule generation schemes (SGS) for the multi-mode RCPSP.
+
+    A schedule is encoded as an activity list (a precedence-feasible list of job positions)
+    and a mode vector (mode - 1 for each job position). The serial and parallel schemes
+    decode it into start periods that respect precedences and renewable resources.
+    Non-renewable resources only depend on the modes, see nonrenewable_excess.
+
+    Everything that depends only on the instance is computed once, so the same
+    generator can decode many schedules.
+
+    Decoding is plain Python over lists, one period at a time. With 32 jobs, 3 modes
+    and 2 renewable resources (the size of j30) it decodes about 12k to 15k schedules
+    per second with the serial scheme and about 6k with the parallel one, on one core.
+    That is short of tens of thousands: most of the time goes into checking and updating
+    the renewable profiles, which needs a compiled loop to go faster.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        renewable = np.flatnonzero(arrays.renewable)
+        non_renewable = np.flatnonzero(~arrays.renewable)
+        capacity = arrays.available[renewable].tolist()
+        self.capacity = capacity
+        self.durations = arrays.durations.tolist()
+        # for each job and mode, only the renewable resources it uses
+        self.requests = [
+            [[(r, q) for r, q in enumerate(mode_needs) if q] for mode_needs in job_needs]
+            for job_needs in arrays.needs[:, :, renewable].tolist()
+        ]
+        # modes that exist and fit in the renewable capacity
+        self.fits = [
+            [valid and all(q <= capacity[r] for r, q in mode_requests)
+             for valid, mode_requests in zip(job_mask, job_requests)]
+            for job_mask, job_requests in zip(arrays.mode_mask.tolist(), self.requests)
+        ]
+        self.predecessors = [arrays.predecessors(j).tolist() for j in range(arrays.num_jobs)]
+        self.successors = [arrays.successors(j).tolist() for j in range(arrays.num_jobs)]
+        self.nr_needs = arrays.needs[:, :, non_renewable]
+        self.nr_capacity = arrays.available[non_renewable]
+        self._positions = np.arange(arrays.num_jobs)
+
+    def _check_modes(self, modes):
+        fits = self.fits
+        for job, mode in enumerate(modes):
+            if not fits[job][mode]:
+                raise ValueError('mode {} of job in position {} does not exist or needs more than the capacity'.
+                                 format(mode + 1, job))
+
+    def serial(self, activity_list, modes):
+        """
+        Schedules the jobs one by one, in the order of the activity list,
+        at the earliest period where precedences and renewable resources allow it.
+
+        :return: start period of each job position and makespan
+        """
+        durations = self.durations
+        requests = self.requests
+        predecessors = self.predecessors
+        mode_durations = [durations[j][m] for j, m in enumerate(modes)]
+        # no job can finish later than all of them one after the other
+        horizon = sum(mode_durations) + 1
+        free = [[c] * horizon for c in self.capacity]
+        finish = [0] * len(modes)
+        starts = [0] * len(modes)
+        earliest_fit = self._earliest_fit
+        try:
+            for job in activity_list:
+                duration = mode_durations[job]
+                start = 0
+                for p in predecessors[job]:
+                    if finish[p] > start:
+                        start = finish[p]
+                request = requests[job][modes[job]]
+                if duration and request:
+                    # move the start after the last conflicting period until it fits
+                    end = start + duration
+                    for r, q in request:
+                        if min(free[r][start:end]) < q:
+                            start = earliest_fit(free, request, start, duration)
+                            end = start + duration
+                            break
+                    # jobs are short: a loop is faster than rebuilding the slice
+                    for r, q in request:
+                        row = free[r]
+                        for t in range(start, end):
+                            row[t] -= q
+                starts[job] = start
+                finish[job] = start + duration
+        except (ValueError, IndexError):
+            # the job went past the horizon: it does not fit in the capacity
+            self._check_modes(modes)
+            raise
+        return starts, max(finish)
+
+    @staticmethod
+    def _earliest_fit(free, request, start, duration):
+        while True:
+            end = start + duration
+            for r, q in request:
+                row = free[r]
+                if min(row[start:end]) < q:
+                    period = end - 1
+                    while row[period] >= q:
+                        period -= 1
+                    start = period + 1
+                    break
+            else:
+                return start
+
+    def parallel(self, activity_list, modes):
+        """
+        Goes forward in time. At each decision point (the start or the end of a job),
+        it schedules, in the order of the activity list, every job whose predecessors
+        have finished and that fits in the renewable resources.
+
+        :return: start period of each job position and makespan
+        """
+        self._check_modes(modes)
+        durations = self.durations
+        requests = self.requests
+        successors = self.successors
+        mode_durations = [durations[j][m] for j, m in enumerate(modes)]
+        horizon = sum(mode_durations) + 1
+        free = [[c] * horizon for c in self.capacity]
+        num_preds = [len(p) for p in self.predecessors]
+        priority = {job: pos for pos, job in enumerate(activity_list)}
+        # earliest start allowed by the predecessors scheduled so far
+        ready = [0] * len(modes)
+        finish = [0] * len(modes)
+        starts = [0] * len(modes)
+        pending = [j for j in activity_list if not num_preds[j]]
+        events = [0]
+        time = 0
+        while pending:
+            time = heapq.heappop(events)
+            while events and events[0] == time:
+                heapq.heappop(events)
+            not_scheduled = []
+            for job in pending:
+                if ready[job] > time:
+                    not_scheduled.append(job)
+                    continue
+                duration = mode_durations[job]
+                end = time + duration
+                request = requests[job][modes[job]]
+                if duration and not all(min(free[r][time:end]) >= q for r, q in request):
+                    not_scheduled.append(job)
+                    continue
+                for r, q in request:
+                    row = free[r]
+                    for t in range(time, end):
+                        row[t] -= q
+                starts[job] = time
+                finish[job] = end
+                heapq.heappush(events, end)
+                for succ in successors[job]:
+                    num_preds[succ] -= 1
+                    ready[succ] = max(ready[succ], end)
+                    if not num_preds[succ]:
+                        not_scheduled.append(succ)
+                        heapq.heappush(events, ready[succ])
+            # keep the order of the activity list among the jobs that are left
+            not_scheduled.sort(key=priority.__getitem__)
+            pending = not_scheduled
+            if pending and not events:
+                heapq.heappush(events, time + 1)
+        return starts, max(finish)
+
+    def nonrenewable_excess(self, modes):
+        """
+        :return: total consumption over the capacity of the non-renewable resources
+        """
+        consumption = self.nr_needs[self._positions, modes].sum(axis=0)
+        return int(np.maximum(consumption - self.nr_capacity, 0).sum())
+
+    def to_solution(self, starts, modes):
+        jobs = self.arrays.jobs.tolist()
+        return Solution({job: dict(period=start, mode=mode + 1)
+                         for job, start, mode in zip(jobs, starts, modes)})
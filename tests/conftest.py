@@ -0,0 +1,42 @@
+import os
+import sys
+import zipfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, 'data')
+# the c15 scenario, unzipped
+SCENARIO_DIR = os.path.join(DATA, 'c15.mm')
+sys.path.insert(0, ROOT)
+
+from core import Instance
+
+
+@pytest.fixture(scope='session')
+def contents():
+    """
+    {filename: content} of the first instances of the c15 scenario
+    """
+    names = sorted(f for f in os.listdir(SCENARIO_DIR) if f.endswith('.mm'))[:20]
+    result = {}
+    for name in names:
+        with open(os.path.join(SCENARIO_DIR, name), 'rb') as f:
+            result[name] = f.read()
+    return result
+
+
+@pytest.fixture(scope='session')
+def instances(contents):
+    return {name: Instance.from_mm(None, content) for name, content in contents.items()}
+
+
+@pytest.fixture(scope='session')
+def path_in(tmp_path_factory, contents):
+    """
+    directory with c15.mm.zip, a scenario zip with the first 5 instances
+    """
+    path = tmp_path_factory.mktemp('data')
+    with zipfile.ZipFile(str(path / 'c15.mm.zip'), 'w') as zip_obj:
+        for name in list(contents)[:5]:
+            zip_obj.writestr(name, contents[name])
+    return str(path)
@@ -0,0 +1,38 @@
+import pytest
+from core.batch import ZipBatch
+from execution.run_batch import solve_instance
+from execution.writers import ZipWriter
+
+
+@pytest.fixture(scope='module')
+def batch_path(tmp_path_factory, contents):
+    path = str(tmp_path_factory.mktemp('batch') / 'default.zip')
+    with ZipWriter(path, 'default') as writer:
+        for name in list(contents)[:3]:
+            writer.write_experiment('c15.mm/' + name, solve_instance(contents[name], 'default', {}))
+    return path
+
+
+def test_zip_batch_paths(batch_path, contents):
+    names = list(contents)[:3]
+    with ZipBatch(batch_path) as batch:
+        paths = batch.get_instances_paths()
+        assert paths == {('c15.mm', name): 'default/c15.mm/' + name for name in names}
+        assert batch.get_errors().values_l() == [0] * 3
+    with ZipBatch(batch_path, scenarios=['other']) as batch:
+        assert not batch.get_instances_paths()
+
+
+def test_zip_batch_cache(batch_path, contents):
+    keys = [('c15.mm', name) for name in list(contents)[:3]]
+    with ZipBatch(batch_path, cache_size=2) as batch:
+        first = batch.get_case(keys[0])
+        assert first.get_objective() > 0
+        assert batch.get_case(keys[0]) is first
+        batch.get_case(keys[1])
+        # keys[0] was used last, so keys[1] is the one dropped
+        batch.get_case(keys[0])
+        batch.get_case(keys[2])
+        assert list(batch._case_cache) == [keys[0], keys[2]]
+        assert batch.get_case(keys[0]) is first
+        assert batch.get_case(keys[1]) is not None
@@ -0,0 +1,30 @@
+from ortools.sat.python import cp_model
+from core import bounds
+from execution.run_batch import solve_instance
+from solvers import CPModel1
+
+
+def test_lower_bounds_are_not_above_optimum(instances):
+    for instance in list(instances.values())[:5]:
+        algo = CPModel1(instance)
+        assert algo.solve(dict(timeLimit=20, num_search_workers=1, warm_start=None)) == cp_model.OPTIMAL
+        makespan = algo.get_objective()
+        instance_bounds = bounds.lower_bounds(instance, cp_time=1, cp_options=dict(num_search_workers=1))
+        assert all(bound <= makespan for bound in instance_bounds.values() if bound is not None)
+        assert instance_bounds['lower_bound'] == max(instance_bounds['critical_path'], instance_bounds['energy'],
+                                                     instance_bounds['cp'])
+
+
+def test_bound_gets_the_threads(monkeypatch, contents):
+    calls = []
+
+    def cp_bound(instance, time_limit, options=None):
+        calls.append(options)
+        return None
+
+    monkeypatch.setattr(bounds, 'cp_bound', cp_bound)
+    content = next(iter(contents.values()))
+    result = solve_instance(content, 'default', dict(num_search_workers=2), bound_time=1)
+    assert result['error'] is None
+    solve_instance(content, 'default', {}, bound_time=1)
+    assert calls == [dict(num_search_workers=2), None]
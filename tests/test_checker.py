@@ -0,0 +1,92 @@
+import random
+from core import Experiment, Solution
+from solvers import Algorithm
+
+
+def reference_errors(instance, solution):
+    """
+    The checks of Experiment.check_solution written with loops over the data, as they were
+    before the arrays.
+    """
+    data = instance.data
+    durations = data['durations']
+    needs = data['needs']
+    available = {r: v['available'] for r, v in data['resources'].items()}
+    renewable = [r for r in available if r[0] == 'R']
+    starts = {job: v['period'] for job, v in solution.items()}
+    modes = {job: v['mode'] for job, v in solution.items()}
+    finished = {job: starts[job] + durations[job][modes[job]] for job in solution}
+    errors = {}
+
+    successors = {}
+    for job, job_data in data['jobs'].items():
+        for successor in job_data['successors']:
+            if job in solution and successor in solution and finished[job] > starts[successor]:
+                successors[job, successor] = finished[job] - starts[successor]
+    errors['successors'] = successors
+
+    consumption = {r: sum(needs[job][modes[job]][r] for job in solution) for r in available if r not in renewable}
+    errors['resources_nr'] = {r: available[r] - v for r, v in consumption.items() if v > available[r]}
+
+    usage = {}
+    for job in solution:
+        for period in range(starts[job], finished[job]):
+            for r in renewable:
+                usage[r, period] = usage.get((r, period), 0) + needs[job][modes[job]][r]
+    errors['resources_r'] = {k: available[k[0]] - v for k, v in usage.items() if v > available[k[0]]}
+
+    errors['all_jobs_once'] = {job: 1 for job in data['jobs'] if job not in solution}
+    return {k: v for k, v in errors.items() if v}
+
+
+def random_solution(instance, rng, missing=0):
+    data = instance.data
+    jobs = [job for job in data['jobs'] if rng.random() >= missing]
+    return Solution({job: dict(period=rng.randrange(40), mode=rng.choice(list(data['durations'][job])))
+                     for job in jobs})
+
+
+def as_dicts(errors):
+    return {k: dict(v) for k, v in errors.items()}
+
+
+def test_feasible_solutions_have_no_errors(instances):
+    for instance in instances.values():
+        algo = Algorithm(instance)
+        assert algo.solve({}) == 2
+        assert algo.check_solution() == {}
+        assert reference_errors(instance, algo.solution.data) == {}
+
+
+def test_checker_matches_reference(instances):
+    rng = random.Random(0)
+    for instance in instances.values():
+        for missing in [0, 0.1]:
+            solution = random_solution(instance, rng, missing)
+            errors = Experiment(instance, solution).check_solution()
+            assert as_dicts(errors) == reference_errors(instance, solution.data)
+
+
+def test_check_many_solutions(instances):
+    rng = random.Random(1)
+    instance = next(iter(instances.values()))
+    solutions = [random_solution(instance, rng) for _ in range(10)]
+    experiment = Experiment(instance, None)
+    many = experiment.check_many_solutions(solutions)
+    assert many == [Experiment(instance, solution).check_solution() for solution in solutions]
+
+
+def test_modes_the_jobs_do_not_have(instances):
+    instance = instances['c1510_1.mm']
+    algo = Algorithm(instance)
+    algo.solve({})
+    data = algo.solution.data
+    max_modes = instance.arrays.durations.shape[1]
+    # job 1 only has one mode: mode 3 is in the padding of the arrays and 99 is past it
+    for mode in [3, max_modes + 1, 99]:
+        solution = Solution({job: dict(v, mode=mode) if job == 1 else v for job, v in data.items()})
+        errors = Experiment(instance, solution).check_solution()
+        assert errors['modes'] == {1: mode}
+        assert Experiment(instance, None).check_many_solutions([solution]) == [errors]
+    solution = Solution({job: v for job, v in data.items() if job != 1})
+    assert Experiment(instance, solution).check_solution() == {'all_jobs_once': {1: 1}}
@@ -0,0 +1,74 @@
+from ortools.sat.python import cp_model
+from core import Instance, InstanceArrays
+from solvers import CPModel1
+
+CP_OPTIONS = dict(timeLimit=20, num_search_workers=1, warm_start=None)
+
+
+def optimum(instance, **options):
+    algo = CPModel1(instance)
+    status = algo.solve(dict(CP_OPTIONS, **options))
+    assert status == cp_model.OPTIMAL
+    assert algo.check_solution() == {}
+    return algo.get_objective()
+
+
+def test_domains_keep_the_optimum(instances):
+    for instance in list(instances.values())[:5]:
+        makespan = optimum(instance)
+        assert optimum(instance, preprocess=False) == makespan
+        earliest, latest, mode_mask, horizon = CPModel1(instance).get_domains_arrays()
+        assert all(e <= l for e, l in zip(earliest, latest)) and mode_mask.any(axis=1).all()
+        assert max(latest) <= horizon and makespan <= horizon
+
+
+def test_formulations_agree(instances):
+    for instance in list(instances.values())[:5]:
+        makespan = optimum(instance)
+        assert optimum(instance, formulation='element') == makespan
+        assert optimum(instance, formulation='element', preprocess=False) == makespan
+
+
+def test_builders_agree(instances):
+    for instance in list(instances.values())[:5]:
+        makespan = optimum(instance)
+        assert optimum(instance, builder='data') == makespan
+        assert optimum(instance, builder='data', preprocess=False) == makespan
+
+
+def test_upper_bound_below_critical_path(instances):
+    instance = next(iter(instances.values()))
+    algo = CPModel1(instance)
+    for builder in CPModel1.builders.values():
+        for preprocess in [True, False]:
+            # a bogus bound: no schedule is that short
+            model, _, _ = getattr(algo, builder)(dict(CP_OPTIONS, preprocess=preprocess), upper_bound=1)
+            assert model.Validate() == ''
+            solver = cp_model.CpSolver()
+            solver.parameters.num_workers = 1
+            # whether a schedule as short as the critical path exists or not
+            assert solver.Solve(model) in [cp_model.OPTIMAL, cp_model.INFEASIBLE]
+
+
+def test_out_of_time_keeps_the_hint(instances):
+    instance = instances['c1510_1.mm']
+    algo = CPModel1(instance)
+    # usually too short for CP-SAT to find a solution, not for the warm start
+    assert algo.solve(dict(timeLimit=0.02)) in [cp_model.FEASIBLE, cp_model.OPTIMAL]
+    assert algo.check_solution() == {}
+    hint = CPModel1(instance).get_warm_start(dict(timeLimit=0.02))[0]
+    algo = CPModel1(instance, hint)
+    assert algo.solve(dict(timeLimit=0)) == cp_model.FEASIBLE
+    assert algo.solution is hint
+
+
+def test_infeasible_instance():
+    # the second job needs more than the capacity in its only mode
+    arrays = InstanceArrays(jobs=[1, 2, 3], resources=['R 1', 'N 1'], available=[2, 5],
+                            durations=[[0], [3], [0]], needs=[[[0, 0]], [[3, 1]], [[0, 0]]],
+                            num_modes=[1, 1, 1], succ_ptr=[0, 1, 2, 2], succ_idx=[1, 2])
+    instance = Instance.from_arrays(arrays)
+    for preprocess in [True, False]:
+        for formulation in ['optional', 'element']:
+            options = dict(CP_OPTIONS, preprocess=preprocess, formulation=formulation)
+            assert CPModel1(instance).solve(options) == cp_model.INFEASIBLE
@@ -0,0 +1,37 @@
+import random
+from core import Experiment, ScheduleEvaluator
+from solvers.sgs import ScheduleGenerator, topological_order
+
+ATTRIBUTES = ['makespan', 'renewable_excess', 'overloaded_periods', 'nonrenewable_excess',
+              'precedence_overlap', 'violated_precedences']
+
+
+def test_random_moves(instances):
+    rng = random.Random(0)
+    for instance in list(instances.values())[:5]:
+        arrays = instance.arrays
+        generator = ScheduleGenerator(arrays)
+        mode_options = [[m for m, fits in enumerate(job_fits) if fits] for job_fits in generator.fits]
+        modes = [rng.choice(options) for options in mode_options]
+        starts, makespan = generator.serial(topological_order(arrays, rng), modes)
+        evaluator = ScheduleEvaluator(arrays, starts, modes)
+        assert evaluator.makespan == makespan
+        assert not evaluator.precedence_overlap and not evaluator.renewable_excess
+        for step in range(500):
+            job = rng.randrange(arrays.num_jobs)
+            move = rng.random()
+            if move < 0.5:
+                evaluator.move(job, rng.randrange(0, makespan))
+            elif move < 0.8:
+                evaluator.change_mode(job, rng.choice(mode_options[job]))
+            else:
+                evaluator.swap(job, rng.randrange(arrays.num_jobs))
+            if step % 50:
+                continue
+            fresh = ScheduleEvaluator(arrays, evaluator.starts, evaluator.modes)
+            assert [getattr(evaluator, a) for a in ATTRIBUTES] == [getattr(fresh, a) for a in ATTRIBUTES]
+            experiment = Experiment(instance, evaluator.to_solution())
+            errors = experiment.check_solution()
+            assert evaluator.num_errors == sum(len(v) for v in errors.values())
+            assert evaluator.is_feasible() == (errors == {})
+            assert evaluator.makespan == experiment.get_objective()
@@ -0,0 +1,34 @@
+from execution.events import ProgressAggregator, format_progress
+from execution.run_batch import solve_zip_budget
+
+
+def test_progress():
+    with ProgressAggregator() as aggregator:
+        scenario = aggregator.sender.for_instance('c15.mm')
+        scenario.emit('scheduled', count=3)
+        scenario.emit('skipped', count=1)
+        for name in ['a.mm', 'b.mm']:
+            events = aggregator.sender.for_instance('c15.mm', name)
+            # started again, counted once
+            events.emit('started')
+            events.emit('started')
+            events.emit('incumbent', objective=20)
+        aggregator.sender.for_instance('c15.mm', 'a.mm').emit('finished', row=dict(name='a.mm', gap=0.1))
+        aggregator.sender.for_instance('c15.mm', 'b.mm').emit('errored', row=dict(name='b.mm', gap=None),
+                                                              error='failed')
+    progress = aggregator.get_progress()
+    assert progress['scheduled'] == 2 and progress['started'] == 2
+    assert progress['finished'] == 2 and progress['errored'] == 1 and progress['with_incumbent'] == 2
+    assert progress['eta'] is not None and abs(progress['mean_gap'] - 0.1) < 1e-9
+    assert len(aggregator.get_table()) == 2
+    assert '2/2 finished (1 errors), 2 started' in format_progress(progress)
+
+
+def test_budget_progress(tmp_path, path_in):
+    with ProgressAggregator() as aggregator:
+        solve_zip_budget('c15.mm.zip', str(tmp_path / 'budget'), 3, path_in=path_in,
+                         options=dict(num_search_workers=1), events=aggregator.sender)
+    progress = aggregator.get_progress()
+    assert progress['scheduled'] == 5 and progress['started'] == 5 and progress['finished'] == 5
+    # instances only finish at the end of the budget
+    assert progress['eta'] is None and 'ETA' not in format_progress(progress)
@@ -0,0 +1,33 @@
+from core import Instance, InstanceArrays
+from solvers import GeneticAlgorithm
+from solvers.sgs import ScheduleGenerator
+
+
+def test_genetic_algorithm_is_feasible(instances):
+    for instance in list(instances.values())[:5]:
+        algo = GeneticAlgorithm(instance)
+        assert algo.solve(dict(timeLimit=0.2, population=10)) in [2, 4]
+        assert algo.check_solution() == {}
+
+
+def test_warm_start(instances):
+    instance = next(iter(instances.values()))
+    algo = GeneticAlgorithm(instance)
+    algo.solve(dict(timeLimit=0.2, population=10))
+    solution = algo.solution
+    makespan = algo.get_objective()
+    algo = GeneticAlgorithm(instance, solution)
+    assert len(algo.get_initial(ScheduleGenerator(instance.arrays))) == 1
+    # the individual of the solution is as good as the solution
+    assert algo.solve(dict(timeLimit=0.2, population=10, lower_bound=makespan)) == 4
+    assert algo.get_objective() == makespan and algo.check_solution() == {}
+
+
+def test_no_mode_fits():
+    # the second job needs more than the capacity in its only mode
+    arrays = InstanceArrays(jobs=[1, 2, 3], resources=['R 1', 'N 1'], available=[2, 5],
+                            durations=[[0], [3], [0]], needs=[[[0, 0]], [[3, 1]], [[0, 0]]],
+                            num_modes=[1, 1, 1], succ_ptr=[0, 1, 2, 2], succ_idx=[1, 2])
+    algo = GeneticAlgorithm(Instance.from_arrays(arrays))
+    assert algo.solve(dict(timeLimit=0.2)) == 3
+    assert algo.solution is None
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from core import Instance, InstanceArrays
+
+FIELDS = ['jobs', 'resources', 'available', 'renewable', 'durations', 'needs', 'num_modes', 'mode_mask',
+          'succ_ptr', 'succ_idx', 'pred_ptr', 'pred_idx', 'edge_src', 'edge_dst']
+
+
+def assert_same_arrays(arrays, other):
+    for field in FIELDS:
+        assert np.array_equal(getattr(arrays, field), getattr(other, field)), field
+
+
+def test_data_round_trip(instances):
+    for instance in instances.values():
+        arrays = instance.arrays
+        assert_same_arrays(InstanceArrays.from_data(arrays.to_data()), arrays)
+        assert_same_arrays(Instance.from_dict(instance.to_dict()).arrays, arrays)
+
+
+def test_successors_and_predecessors(instances):
+    for instance in instances.values():
+        arrays = instance.arrays
+        jobs = arrays.jobs.tolist()
+        for pos, job in enumerate(jobs):
+            successors = [jobs[s] for s in arrays.successors(pos)]
+            assert successors == list(instance.data['jobs'][job]['successors'])
+            for successor in arrays.successors(pos):
+                assert pos in arrays.predecessors(successor)
+
+
+def test_arrays_are_read_only(instances):
+    arrays = next(iter(instances.values())).arrays
+    with pytest.raises(AttributeError):
+        arrays.durations = None
+    with pytest.raises(ValueError):
+        arrays.durations[0, 0] = 1
@@ -0,0 +1,41 @@
+import os
+import pytest
+from core import tools
+from core.instance_cache import InstanceCache, FORMAT_VERSION
+from test_instance_arrays import assert_same_arrays
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return InstanceCache(str(tmp_path / 'cache'))
+
+
+def test_cached_arrays(cache, contents, instances):
+    name = next(iter(contents))
+    content_hash = tools.hash_content(contents[name])
+    assert content_hash not in cache
+    cache.from_mm(contents[name], content_hash)
+    assert os.path.basename(cache.path_for(content_hash)) == '{}.v{}.pkl'.format(content_hash, FORMAT_VERSION)
+    instance = cache.from_mm(contents[name])
+    assert_same_arrays(instance.arrays, instances[name].arrays)
+    with pytest.raises(ValueError):
+        instance.arrays.durations[0, 0] = 1
+    reference = cache.reference(content_hash)
+    assert_same_arrays(InstanceCache.from_reference(reference).arrays, instance.arrays)
+
+
+def test_cached_reduced_and_bounds(cache, contents, instances):
+    name = next(iter(contents))
+    content_hash = tools.hash_content(contents[name])
+    instance = instances[name]
+    data = instance.data
+    reduced = cache.get_reduced(content_hash, instance)
+    cached = cache.get_reduced(content_hash, instance)
+    assert cached is not reduced
+    assert_same_arrays(cached.arrays, reduced.arrays)
+    assert cached.data is data
+    bounds = cache.get_bounds(content_hash, instance)
+    assert cache.get_bounds(content_hash, instance) == bounds
+    # no temporary files left
+    names = [os.path.basename(cache.path_for(content_hash, suffix)) for suffix in ['.bounds.json', '.reduced.pkl']]
+    assert sorted(os.listdir(cache.path)) == names
@@ -0,0 +1,49 @@
+import json
+import os
+from core import tools
+from execution.events import ProgressAggregator
+from execution.manifest import Manifest, SOLVED, FAILED
+from execution.run_batch import solve_zip
+
+
+def test_last_update_counts(tmp_path):
+    path = str(tmp_path / 'batch.manifest.jsonl')
+    manifest = Manifest(path)
+    manifest.update('c15/a.mm', 'h1', 'default', dict(timeLimit=1), FAILED)
+    manifest.update('c15/a.mm', 'h1', 'default', dict(timeLimit=1), SOLVED)
+    manifest.update('c15/b.mm', 'h2', 'default', {}, SOLVED)
+    with open(path, 'a') as f:
+        # interrupted while writing a line
+        f.write('{"key": "c15/c.mm", "ha')
+    manifest = Manifest(path)
+    assert manifest.is_solved('c15/a.mm', 'h1', 'default', dict(timeLimit=1))
+    assert not manifest.is_solved('c15/a.mm', 'h1', 'default', dict(timeLimit=2))
+    assert not manifest.is_solved('c15/b.mm', 'h3', 'default', {})
+    assert not manifest.is_solved('c15/c.mm', 'h1', 'default', {})
+    # the broken line and the replaced one are gone
+    with open(path) as f:
+        assert len(f.readlines()) == 2
+
+
+def test_old_manifest(tmp_path):
+    entries = {'c15/a.mm': dict(hash='h1', solver='default', options={}, status=SOLVED)}
+    with open(str(tmp_path / 'batch.manifest.json'), 'w') as f:
+        json.dump(entries, f)
+    manifest = Manifest.for_batch(str(tmp_path / 'batch'))
+    assert manifest.is_solved('c15/a.mm', 'h1', 'default', {})
+    assert os.path.exists(str(tmp_path / 'batch.manifest.jsonl'))
+
+
+def test_resume(tmp_path, path_in, contents):
+    path_out = str(tmp_path / 'default')
+
+    def run(force=False):
+        with ProgressAggregator() as aggregator:
+            solve_zip('c15.mm.zip', path_out, path_in=path_in, force=force, events=aggregator.sender)
+        return aggregator.get_progress()
+
+    assert run()['finished'] == 5
+    name = list(contents)[0]
+    assert Manifest.for_batch(path_out).is_solved('c15.mm/' + name, tools.hash_content(contents[name]), 'default', {})
+    assert run()['scheduled'] == 0
+    assert run(force=True)['finished'] == 5
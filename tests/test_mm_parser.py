@@ -0,0 +1,16 @@
+from core import Instance
+from test_instance_arrays import assert_same_arrays
+
+
+def test_parser_matches_regex_parser(contents):
+    for name, content in contents.items():
+        lines = content.decode().splitlines(keepends=True)
+        reference = Instance.from_mm_regex(None, lines)
+        instance = Instance.from_mm(None, content)
+        assert_same_arrays(instance.arrays, reference.arrays)
+        assert instance.to_dict() == reference.to_dict(), name
+
+
+def test_parser_takes_text_and_bytes(contents):
+    content = next(iter(contents.values()))
+    assert_same_arrays(Instance.from_mm(None, content.decode()).arrays, Instance.from_mm(None, content).arrays)
@@ -0,0 +1,52 @@
+import random
+import numpy as np
+from ortools.sat.python import cp_model
+from core import preprocessing
+from solvers import CPModel1
+
+CP_OPTIONS = dict(timeLimit=20, num_search_workers=1, warm_start=None, preprocess=False)
+
+
+def fits(arrays, modes):
+    renewable = arrays.renewable
+    consumption = arrays.needs[np.arange(arrays.num_jobs), modes][:, ~renewable].sum(axis=0)
+    return (consumption <= arrays.available[~renewable]).all()
+
+
+def test_modes_fit(instances):
+    for instance in instances.values():
+        arrays = instance.arrays
+        mode_mask = preprocessing.reduced_mode_mask(arrays)
+        assert (mode_mask <= preprocessing.feasible_mode_mask(arrays)).all()
+        assert (preprocessing.feasible_mode_mask(arrays) <= arrays.mode_mask).all()
+        for mask, modes in [(arrays.mode_mask, preprocessing.feasible_modes(arrays)),
+                            (mode_mask, preprocessing.feasible_modes(arrays, mode_mask)),
+                            (mode_mask, preprocessing.greedy_modes(arrays, mode_mask))]:
+            if modes is None:
+                continue
+            assert mask[np.arange(arrays.num_jobs), modes].all()
+            assert fits(arrays, modes)
+        # c15 instances have a feasible solution
+        assert preprocessing.feasible_modes(arrays, mode_mask) is not None
+
+def test_topological_order(instances):
+    rng = random.Random(0)
+    for instance in instances.values():
+        arrays = instance.arrays
+        for order in [preprocessing.topological_order(arrays), preprocessing.topological_order(arrays, rng)]:
+            position = {job: pos for pos, job in enumerate(order)}
+            assert sorted(order) == list(range(arrays.num_jobs))
+            assert all(position[job] < position[succ] for job in range(arrays.num_jobs)
+                       for succ in arrays.successors(job).tolist())
+
+
+def test_reduced_instance_keeps_the_optimum(instances):
+    for instance in list(instances.values())[:5]:
+        reduced = instance.get_reduced()
+        assert reduced.arrays.mode_mask.sum() <= instance.arrays.mode_mask.sum()
+        makespans = []
+        for inst in [instance, reduced]:
+            algo = CPModel1(inst)
+            assert algo.solve(CP_OPTIONS) == cp_model.OPTIMAL
+            makespans.append(algo.get_objective())
+        assert makespans[0] == makespans[1]
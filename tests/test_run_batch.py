@@ -0,0 +1,123 @@
+import os
+import shutil
+import time
+import pytest
+from execution.run_batch import WorkerPool, solve_instance, solve_scenarios_and_zip, get_table, cpu_budget
+from execution.writers import ZipWriter
+
+
+def _crash_on_one(task):
+    if task == 1:
+        os._exit(1)
+    start = time.time()
+    time.sleep(0.1)
+    return task, (start, time.time())
+
+
+def test_solve_instance_never_raises(contents):
+    content = next(iter(contents.values()))
+    result = solve_instance(content[:200], 'default', {})
+    assert result['error'] is not None
+    assert result['output'] is None and result['summary']['objective'] is None
+    assert 'time_total' in result['options']
+    result = solve_instance(content, 'default', {})
+    assert result['error'] is None and result['summary']['errors'] == 0
+
+
+def test_worker_pool_survives_crash():
+    pool = WorkerPool(3)
+    try:
+        tasks = list(range(20))
+        results = list(pool.map(_crash_on_one, tasks, lambda task, error: (task, None)))
+    finally:
+        pool.shutdown()
+    assert [task for task, _ in results] == tasks
+    assert results[1][1] is None
+    assert all(span is not None for task, span in results if task != 1)
+    # after the crash, the tasks that were not running still run in parallel
+    spans = sorted(span for _, span in results[6:])
+    assert any(start < end for (_, end), (start, _) in zip(spans, spans[1:]))
+
+
+def test_worker_pool_broken_before_submit():
+    pool = WorkerPool(2)
+    try:
+        # the pool breaks before the tasks are submitted
+        assert pool.executor.submit(os._exit, 1).exception() is not None
+        tasks = [0, 2, 3, 4, 5]
+        results = list(pool.map(_crash_on_one, tasks, lambda task, error: (task, None)))
+    finally:
+        pool.shutdown()
+    assert [task for task, _ in results] == tasks
+    assert all(span is not None for _, span in results)
+
+
+def test_get_table(tmp_path, path_in, contents):
+    path = str(tmp_path / 'default')
+    solve_scenarios_and_zip(['c15.mm.zip'], path, 'default', stream_zip=True, path_in=path_in)
+    table = get_table(path + '.zip')
+    assert len(table) == 5 and table.time_write.notna().all()
+    # a rerun killed after replacing an experiment, the summary is stale
+    name = list(contents)[0]
+    with ZipWriter(path + '.zip', 'default') as writer:
+        writer.write_experiment('c15.mm/' + name, solve_instance(contents[name], 'default', {}))
+    stale = get_table(path + '.zip')
+    assert stale.time_write.isna().all()
+    assert list(stale.columns) == list(table.columns)
+    objectives = lambda t: t.set_index('name').objective.sort_index()
+    assert objectives(stale).equals(objectives(table))
+    shutil.rmtree(path + '.summary')
+    assert get_table(path + '.zip').time_write.isna().all()
+
+
+def test_cpu_budget():
+    # each solver gets a share of the cores
+    assert cpu_budget(4, {}, 'ortools', cores=8) == (4, dict(num_search_workers=2))
+    assert cpu_budget(1, {}, 'ortools', cores=8) == (1, {})
+    assert cpu_budget(16, {}, 'ortools', cores=8) == (16, dict(num_search_workers=1))
+    # or fewer workers if the threads are given
+    with pytest.warns(UserWarning):
+        assert cpu_budget(4, dict(num_search_workers=4), 'ortools', cores=8) == (2, dict(num_search_workers=4))
+    assert cpu_budget(2, dict(num_search_workers=4), 'ortools', cores=8) == (2, dict(num_search_workers=4))
+    # solvers without threads keep their options
+    assert cpu_budget(4, dict(seed=1), 'default', cores=8) == (4, dict(seed=1))
+
+
+def test_solve_instance_spans(contents):
+    content = next(iter(contents.values()))
+    result = solve_instance(content, 'ortools', dict(timeLimit=5, num_search_workers=1), profile=True)
+    options = result['options']
+    spans = [name for name in options if name.startswith('time_')]
+    for name in ['time_parse', 'time_bound', 'time_reduce', 'time_check', 'time_serialize',
+                 'time_build', 'time_search', 'time_total']:
+        assert name in spans
+    assert sum(options[name] for name in spans if name != 'time_total') <= options['time_total']
+    assert result['profile'] is not None
+
+
+def test_solve_zip_in_chunks(tmp_path, path_in, contents):
+    tables = []
+    for chunk_size in [1, 3]:
+        path = str(tmp_path / 'chunks{}'.format(chunk_size))
+        solve_scenarios_and_zip(['c15.mm.zip'], path, 'ortools', stream_zip=True, path_in=path_in,
+                                chunk_size=chunk_size, options=dict(num_search_workers=1), timeout=5)
+        tables.append(get_table(path + '.zip').set_index('name').sort_index())
+    for table in tables:
+        assert len(table) == 5 and (table.errors == 0).all()
+    assert tables[0].objective.equals(tables[1].objective)
+
+
+def test_solve_zip_budget(tmp_path, path_in):
+    path = str(tmp_path / 'budget')
+    start = time.time()
+    solve_scenarios_and_zip(['c15.mm.zip'], path, 'ortools', stream_zip=True, path_in=path_in, budget=3,
+                            options=dict(num_search_workers=1))
+    assert time.time() - start < 3 + 1
+    table = get_table(path + '.zip')
+    assert len(table) == 5 and (table.errors == 0).all() and (table.runs >= 1).all()
+    # no time for any run: the instances are written as failed
+    path = str(tmp_path / 'spent')
+    solve_scenarios_and_zip(['c15.mm.zip'], path, 'ortools', stream_zip=True, path_in=path_in, budget=1,
+                            options=dict(num_search_workers=1))
+    table = get_table(path + '.zip')
+    assert len(table) == 5 and table.objective.isna().all() and (table.runs == 0).all()
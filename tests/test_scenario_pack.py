@@ -0,0 +1,25 @@
+import os
+from core import tools
+from core.scenario_pack import pack_scenario, open_pack, PackedInstance
+from test_instance_arrays import assert_same_arrays
+
+
+def test_read_mm_files(tmp_path, path_in, contents):
+    from_zip = tools.read_mm_files(os.path.join(path_in, 'c15.mm.zip'))
+    assert list(from_zip) == list(contents)[:5]
+    for name, content in from_zip.items():
+        (tmp_path / name).write_bytes(content)
+    (tmp_path / 'notes.txt').write_text('not an instance')
+    assert tools.read_mm_files(str(tmp_path)) == from_zip
+
+
+def test_pack_round_trip(tmp_path, path_in, contents, instances):
+    path = pack_scenario(os.path.join(path_in, 'c15.mm.zip'), str(tmp_path / 'c15.mm.pack'))
+    pack = open_pack(path)
+    assert open_pack(path) is pack
+    names = list(contents)[:5]
+    assert pack.names == names and len(pack) == 5 and names[0] in pack
+    for name in names:
+        assert pack.get_hash(name) == tools.hash_content(contents[name])
+        assert_same_arrays(pack.get_arrays(name), instances[name].arrays)
+    assert_same_arrays(PackedInstance(path, names[0]).load().arrays, instances[names[0]].arrays)
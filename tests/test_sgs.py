@@ -0,0 +1,30 @@
+import random
+import pytest
+from core import Experiment, preprocessing
+from solvers.sgs import ScheduleGenerator, topological_order
+
+
+def test_sgs_schedules_are_feasible(instances):
+    rng = random.Random(0)
+    for instance in instances.values():
+        arrays = instance.arrays
+        generator = ScheduleGenerator(arrays)
+        modes = preprocessing.feasible_modes(arrays)
+        for _ in range(5):
+            activity_list = topological_order(arrays, rng)
+            for schedule in [generator.serial, generator.parallel]:
+                starts, makespan = schedule(activity_list, modes)
+                experiment = Experiment(instance, generator.to_solution(starts, modes))
+                assert experiment.check_solution() == {}
+                assert experiment.get_objective() == makespan
+
+
+def test_modes_that_do_not_fit(instances):
+    arrays = next(iter(instances.values())).arrays
+    generator = ScheduleGenerator(arrays)
+    modes = [0] * arrays.num_jobs
+    modes[1] = arrays.num_modes[1]
+    activity_list = topological_order(arrays)
+    for schedule in [generator.serial, generator.parallel]:
+        with pytest.raises((ValueError, IndexError)):
+            schedule(activity_list, modes)
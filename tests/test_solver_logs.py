@@ -0,0 +1,29 @@
+from core.solver_logs import get_cpsat_progress, get_info_cpsat
+from solvers import CPModel1
+
+LOG = """
+#Bound   0.01s best:inf   next:[12,40]    initial_domain
+#1       0.02s best:30    next:[12,29]    quick_restart
+#Bound   0.03s best:30    next:[15,29]    max_lp
+#2       0.05s best:20    next:[15,19]    core
+#Done    0.06s best:20    next:[]         core
+"""
+
+
+def test_cpsat_progress():
+    progress = get_cpsat_progress(LOG)
+    assert progress.Time.tolist() == [0.01, 0.02, 0.03, 0.05, 0.06]
+    assert progress.CutsBestBound.tolist() == [12, 12, 15, 15, 20]
+    assert progress.BestInteger.isna().tolist() == [True, False, False, False, False]
+    assert progress.Gap.iloc[1] == 60 and progress.Gap.iloc[-1] == 0
+
+
+def test_cpsat_log(instances):
+    algo = CPModel1(instances['c1510_1.mm'])
+    algo.solve(dict(timeLimit=5, num_search_workers=1, warm_start=None, log_search_progress=True))
+    info = get_info_cpsat(algo.log, get_progress=True)
+    assert info['best_solution'] == algo.get_objective()
+    progress = info['progress']
+    assert len(progress) and progress.BestInteger.iloc[-1] == algo.get_objective()
+    assert info['first_solution']['BestInteger'] >= algo.get_objective()
+    assert info['time_to_incumbent'] <= progress.Time.iloc[-1]
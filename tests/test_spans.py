@@ -0,0 +1,17 @@
+import time
+from core.spans import Spans
+
+
+def test_spans():
+    spans = Spans()
+    for _ in range(2):
+        with spans('sleep'):
+            time.sleep(0.01)
+    spans.add('other', 1)
+    other = Spans()
+    other.add('other', 2)
+    spans.update(other)
+    times = spans.to_dict()
+    assert sorted(times) == ['time_other', 'time_sleep']
+    assert times['time_other'] == 3 and times['time_sleep'] >= 0.02
+    assert spans.to_dict('') == spans.times
@@ -0,0 +1,55 @@
+import zipfile
+import pytest
+from execution.run_batch import solve_instance
+from execution.writers import ZipWriter, DirectoryWriter
+
+
+@pytest.fixture(scope='module')
+def results(contents):
+    names = list(contents)[:3]
+    return {'c15.mm/' + name: solve_instance(contents[name], 'default', {}) for name in names}
+
+
+def namelist(path):
+    with zipfile.ZipFile(path) as zip_obj:
+        return zip_obj.namelist()
+
+
+def test_zip_writer_commit(tmp_path, results):
+    path = str(tmp_path / 'default.zip')
+    writer = ZipWriter(path, 'default', commit_interval=1000)
+    name, result = next(iter(results.items()))
+    writer.write_experiment(name, result)
+    assert writer.has_experiment(name)
+    writer.commit()
+    assert 'default/{}/output.json'.format(name) in namelist(path)
+    writer.close()
+
+
+def test_zip_writer_replaces_experiments(tmp_path, results):
+    path = str(tmp_path / 'default.zip')
+    with ZipWriter(path, 'default') as writer:
+        for name, result in results.items():
+            writer.write_experiment(name, result)
+    first = sorted(namelist(path))
+    name = list(results)[0]
+    with ZipWriter(path, 'default') as writer:
+        assert all(writer.has_experiment(name) for name in results)
+        assert not writer.has_experiment('c15.mm/other.mm')
+        writer.write_experiment(name, results[name])
+        writer.write_experiment('c15.mm/other.mm', results[name])
+    names = namelist(path)
+    # one copy of each file, the new version of the replaced experiment last
+    assert len(names) == len(set(names))
+    assert sorted(n for n in names if '/other.mm/' not in n) == first
+    assert names[-1].startswith('default/c15.mm/other.mm/')
+    assert names.index('default/{}/output.json'.format(name)) > names.index('default/{}/output.json'.format(list(results)[1]))
+
+
+def test_directory_writer(tmp_path, results):
+    name, result = next(iter(results.items()))
+    with DirectoryWriter(str(tmp_path)) as writer:
+        assert not writer.has_experiment(name)
+        writer.write_experiment(name, result)
+        assert writer.has_experiment(name)
+    assert (tmp_path / name / 'options.json').exists()